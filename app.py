@@ -1,61 +1,229 @@
 import decimal
+import json
+import os
+import time
 import typing
 import uuid
 
-from flask import Flask, Response, jsonify, request
+from flask import (Blueprint, Flask, Response, current_app, g, jsonify,
+                   request, url_for)
 from typeguard import typechecked
 
-from uaena.block_chain import MINING_REWARD, MINING_REWARD_SENDER, BlockChain
+from uaena.block import (BLOCK_VERSION_JSON, BLOCK_VERSION_MERKLE,
+                         BLOCK_VERSIONS, Block)
+from uaena.block_chain import (BLOCK_ACCEPTED, CHECKPOINT_INTERVAL, BlockChain,
+                               ChainVerifier, InvalidChainError)
+from uaena.checkpoint import CheckpointStore
+from uaena.gossip import Gossip
+from uaena.metrics import HTTP_REQUEST_SECONDS, METRICS_MIMETYPE, REGISTRY
+from uaena.mining import Miner, MiningJobs
+from uaena.storage import FSYNC_ALWAYS, BlockStore
+from uaena.transaction import Transaction
+from uaena.wire import (BLOCKS_MIMETYPE, CHAIN_MIMETYPE, decode_blocks,
+                        encode_blocks, encode_chain)
+
+#: Most transactions accepted by a single ``/transactions/batch/`` request.
+MAX_TRANSACTION_BATCH = 10000
+#: Transactions per page of an address's history, by default and at most.
+HISTORY_PAGE = 100
+MAX_HISTORY_PAGE = 1000
+#: Seconds a node has to bootstrap from a checkpoint when it starts.
+BOOTSTRAP_DEADLINE = 10 * 60
+
+blueprint = Blueprint('uaena', __name__)
 
-app = Flask(__name__)
 
-node_identifier = str(uuid.uuid4()).replace('-', '')
-
-block_chain = BlockChain()
+@typechecked
+def get_block_chain() -> BlockChain:
+    return current_app.config['BLOCK_CHAIN']
 
 
-@app.route('/mine/')
 @typechecked
-def mine() -> Response:
-    last_block = block_chain.last_block
-    last_proof = last_block.proof
-    proof = block_chain.proof_of_work(last_proof)
-
-    block_chain.new_transaction(
-        sender=MINING_REWARD_SENDER,
-        recipient=node_identifier,
-        amount=MINING_REWARD,
-    )
+def get_int_arg(name: str, default: typing.Optional[int]=None) -> int:
+    """Reads a non-negative integer query argument, raising
+    :exc:`ValueError` if it is missing or malformed.
 
-    previous_hash = last_block.hash
-    block = block_chain.new_block(proof, previous_hash)
+    """
+    value = request.args.get(name)
+    if value is None:
+        if default is None:
+            raise ValueError(f'{name} is required')
+        return default
+    if not value.isdigit():
+        raise ValueError(f'{name} must be a non-negative integer')
+    return int(value)
 
-    response = {
-        'message': 'New Block Forged',
-        **block.serialize(),
-    }
 
-    return jsonify(response)
+@typechecked
+def pruned(position: int) -> typing.Tuple[str, int]:
+    """The response for a block a pruned chain only has the header of."""
+    return f'Block at {position} is pruned', 404
 
 
-@app.route('/transactions/new/', methods=['POST'])
 @typechecked
-def new_transaction() -> typing.Tuple[typing.Union[Response, str], int]:
-    values = request.get_json()
-
+def parse_transaction(values: typing.Any) -> Transaction:
+    """Reads a transaction submitted as JSON, raising :exc:`ValueError`
+    if it is malformed: an address is not hex or too long, or the amount is
+    not a finite, positive number.
+
+    """
+    if not isinstance(values, dict):
+        raise ValueError('transaction must be an object')
     required = ['sender', 'recipient', 'amount']
     for key in required:
-        return f'{key} is required', 400
+        if key not in values:
+            raise ValueError(f'{key} is required')
 
-    sender = values['sender']
-    recipient = values['recipient']
+    try:
+        sender = bytes.fromhex(values['sender'])
+        recipient = bytes.fromhex(values['recipient'])
+    except (TypeError, ValueError):
+        raise ValueError('sender and recipient must be hex-encoded addresses')
 
     try:
         amount = decimal.Decimal(values['amount'])
-    except TypeError:
-        return f'{values["amount"]} cannot be converted to decimal', 400
+    except (TypeError, decimal.InvalidOperation):
+        raise ValueError(f'{values["amount"]} cannot be converted to decimal')
+    # Checked for finiteness first, as comparing NaN raises.
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f'{values["amount"]} is not a positive amount')
+    return Transaction(sender=sender, recipient=recipient, amount=amount)
+
+
+@typechecked
+def read_batch() -> typing.Iterator[typing.Any]:
+    """Reads the items of a batch submitted either as a JSON array, or as
+    newline-delimited JSON (``application/x-ndjson``), which is read line by
+    line as it arrives.  An NDJSON line that is not JSON gives ``None``, so
+    it is reported along with the others.
+
+    """
+    if request.mimetype == 'application/x-ndjson':
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+        return
+    values = request.get_json(silent=True)
+    if not isinstance(values, list):
+        raise ValueError('Expected a JSON array or NDJSON of transactions')
+    yield from values
+
+
+@typechecked
+def stream_blocks(
+    fields: typing.Mapping[str, typing.Any],
+    key: str,
+    blocks: typing.Iterable[Block],
+) -> Response:
+    """Streams a JSON object of ``fields`` with the serialized ``blocks``
+    under ``key``, serializing one block at a time.
+
+    """
+    def generate() -> typing.Iterator[str]:
+        yield '{'
+        for name, value in fields.items():
+            yield f'{json.dumps(name)}:{json.dumps(value)},'
+        yield f'{json.dumps(key)}:['
+        for i, block in enumerate(blocks):
+            yield (',' if i else '') + json.dumps(block.serialize())
+        yield ']}'
+
+    return Response(generate(), mimetype='application/json')
+
+
+@typechecked
+def prefers(mimetype: str) -> bool:
+    """Whether the client asked for ``mimetype`` over JSON.  Clients that do
+    not say what they accept get JSON.
+
+    """
+    return request.accept_mimetypes.best_match(
+        ['application/json', mimetype],
+    ) == mimetype
+
+
+@typechecked
+def get_mining_jobs() -> MiningJobs:
+    return current_app.config['MINING_JOBS']
+
+
+@blueprint.before_app_request
+@typechecked
+def start_timer() -> None:
+    g.started_at = time.perf_counter()
 
-    index = block_chain.new_transaction(sender, recipient, amount)
+
+@blueprint.after_app_request
+@typechecked
+def record_latency(response: Response) -> Response:
+    """Records the latency of every request by its route rather than its
+    path, so the number of series stays bounded.
+
+    """
+    started_at = g.get('started_at')
+    if started_at is not None:
+        rule = request.url_rule
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started_at,
+            request.method,
+            rule.rule if rule is not None else '<unmatched>',
+            str(response.status_code),
+        )
+    return response
+
+
+@blueprint.route('/metrics')
+@typechecked
+def metrics() -> Response:
+    return Response(REGISTRY.render(), content_type=METRICS_MIMETYPE)
+
+
+@blueprint.route('/mine/', methods=['POST'])
+@typechecked
+def mine() -> typing.Tuple[Response, int]:
+    """Starts mining the next block in the background, or returns the job
+    already doing so.  Poll the job's ``Location`` for its status.
+
+    """
+    job = get_mining_jobs().start()
+    response = jsonify(job.serialize())
+    response.headers['Location'] = url_for('.mining_job', job_id=job.id)
+    return response, 202
+
+
+@blueprint.route('/mine/<job_id>/')
+@typechecked
+def mining_job(job_id: str) -> typing.Tuple[typing.Union[Response, str], int]:
+    job = get_mining_jobs().get(job_id)
+    if job is None:
+        return f'No mining job {job_id}', 404
+    return jsonify(job.serialize()), 200
+
+
+@blueprint.route('/mine/<job_id>/cancel/', methods=['POST'])
+@typechecked
+def cancel_mining_job(
+    job_id: str,
+) -> typing.Tuple[typing.Union[Response, str], int]:
+    job = get_mining_jobs().cancel(job_id)
+    if job is None:
+        return f'No mining job {job_id}', 404
+    return jsonify(job.serialize()), 202
+
+
+@blueprint.route('/transactions/new/', methods=['POST'])
+@typechecked
+def new_transaction() -> typing.Tuple[typing.Union[Response, str], int]:
+    block_chain = get_block_chain()
+    try:
+        transaction = parse_transaction(request.get_json())
+        index = block_chain.append_transaction(transaction)
+    except ValueError as e:
+        return str(e), 400
 
     response = {
         'message': f'Transaction will be added to Block {index}',
@@ -64,19 +232,357 @@ def new_transaction() -> typing.Tuple[typing.Union[Response, str], int]:
     return jsonify(response), 201
 
 
-@app.route('/chain/')
+@blueprint.route('/transactions/batch/', methods=['POST'])
 @typechecked
-def full_chain() -> Response:
+def new_transactions() -> typing.Tuple[typing.Union[Response, str], int]:
+    """Submits many transactions at once, as a JSON array or as NDJSON.
+    Every transaction is validated in order, against the balances left by
+    the ones before it, and gets its own status in ``results``.
+
+    """
+    block_chain = get_block_chain()
+    # Every item is parsed before any of them is pooled, so a malformed item
+    # is reported in its place rather than failing the request halfway.
+    errors = []
+    transactions = []
+    try:
+        for values in read_batch():
+            if len(errors) >= MAX_TRANSACTION_BATCH:
+                return (f'At most {MAX_TRANSACTION_BATCH} transactions can be '
+                        f'submitted at once'), 413
+            try:
+                transactions.append(parse_transaction(values))
+            except ValueError as e:
+                errors.append(str(e))
+            else:
+                errors.append(None)
+    except ValueError as e:
+        return str(e), 400
+    appended = iter(block_chain.append_transactions(transactions))
+    results = []
+    for error in errors:
+        if error is None:
+            error = next(appended)
+        if error is None:
+            results.append({'status': 'accepted'})
+        else:
+            results.append({'status': 'rejected', 'error': error})
+    accepted = sum(1 for result in results if result['status'] == 'accepted')
+    last_block = block_chain.last_block
     response = {
-        'chain': [block.serialize() for block in block_chain.chain],
-        'length': len(block_chain.chain),
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'block': last_block.index + 1 if last_block else 1,
+        'results': results,
+    }
+    return jsonify(response), 200
+
+
+@blueprint.route('/chain/')
+@typechecked
+def full_chain() -> typing.Tuple[typing.Union[Response, str], int]:
+    """The blocks from position ``from`` (defaults to the first block kept
+    by a pruned chain, or the start), at most
+    ``limit`` of them (defaults to all, and must be at least 1, so paging
+    always moves forward).  ``next`` is the position to continue from, or
+    ``null`` at the end of the chain.
+
+    Responses are tagged with the hash of the tip, so peers polling a chain
+    that has not changed get a ``304 Not Modified``.
+
+    Clients that accept :const:`~uaena.wire.CHAIN_MIMETYPE` over JSON get
+    the blocks in binary instead.
+
+    """
+    block_chain = get_block_chain()
+    # Reading the blocks out of this list while streaming is fine: blocks are
+    # only ever appended to it, and replacing the chain assigns a new list.
+    # They are read by position, so a chain kept in a block store only reads
+    # the requested ones.
+    chain = block_chain.chain
+    length = len(chain)
+    pruned_height = block_chain.pruned_height
+    try:
+        start = min(get_int_arg('from', pruned_height), length)
+        limit = get_int_arg('limit', max(length, 1))
+    except ValueError as e:
+        return str(e), 400
+    if limit < 1:
+        return 'limit must be at least 1', 400
+    if start < pruned_height:
+        return pruned(start)
+    stop = min(start + limit, length)
+    binary = prefers(CHAIN_MIMETYPE)
+    tip = chain[-1].hash.hex() if chain else 'empty'
+    etag = f'{tip}-{start}-{stop}' + ('-binary' if binary else '')
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        response.vary.add('Accept')
+        return response, 304
+    next_position = stop if stop < length else None
+    blocks = (chain[position] for position in range(start, stop))
+    if binary:
+        response = Response(
+            encode_chain(length, next_position, blocks),
+            mimetype=CHAIN_MIMETYPE,
+        )
+    else:
+        response = stream_blocks(
+            {'length': length, 'next': next_position}, 'chain', blocks,
+        )
+    response.set_etag(etag)
+    response.vary.add('Accept')
+    return response, 200
+
+
+@blueprint.route('/chain/length/')
+@typechecked
+def chain_length() -> Response:
+    block_chain = get_block_chain()
+    return jsonify({'length': len(block_chain.chain)})
+
+
+@blueprint.route('/chain/headers/')
+@typechecked
+def chain_headers() -> typing.Tuple[typing.Union[Response, str], int]:
+    """Headers of the blocks at positions ``from`` (inclusive) to ``to``
+    (exclusive, defaults to the end of the chain).
+
+    """
+    block_chain = get_block_chain()
+    try:
+        start = get_int_arg('from')
+        stop = get_int_arg('to', len(block_chain.chain))
+    except ValueError as e:
+        return str(e), 400
+    response = {
+        'headers': [
+            block.header().serialize()
+            for block in block_chain.chain[start:stop]
+        ],
+    }
+    return jsonify(response), 200
+
+
+@blueprint.route('/chain/blocks/')
+@typechecked
+def chain_blocks() -> typing.Tuple[typing.Union[Response, str], int]:
+    """Blocks from position ``from``, at most ``limit`` of them, in binary
+    for clients that accept :const:`~uaena.wire.BLOCKS_MIMETYPE` over JSON.
+
+    """
+    block_chain = get_block_chain()
+    try:
+        start = get_int_arg('from')
+        limit = get_int_arg('limit', len(block_chain.chain))
+    except ValueError as e:
+        return str(e), 400
+    if start < block_chain.pruned_height:
+        return pruned(start)
+    blocks = block_chain.chain[start:start + limit]
+    if prefers(BLOCKS_MIMETYPE):
+        response = Response(
+            b''.join(encode_blocks(blocks)), mimetype=BLOCKS_MIMETYPE,
+        )
+        response.vary.add('Accept')
+        return response, 200
+    response = jsonify({'blocks': [block.serialize() for block in blocks]})
+    response.vary.add('Accept')
+    return response, 200
+
+
+@typechecked
+def block_response(position: int, block: Block) -> Response:
+    return jsonify({
+        'position': position,
+        'hash': block.hash.hex(),
+        'block': block.serialize(),
+    })
+
+
+@blueprint.route('/chain/blocks/<int:position>/')
+@typechecked
+def get_block(position: int) -> typing.Tuple[typing.Union[Response, str], int]:
+    """The block at ``position`` of the chain."""
+    chain = get_block_chain().chain
+    if position >= len(chain):
+        return f'No block at position {position}', 404
+    block = chain[position]
+    if not isinstance(block, Block):
+        return pruned(position)
+    return block_response(position, block), 200
+
+
+@blueprint.route('/chain/blocks/hash/<block_hash>/')
+@typechecked
+def get_block_by_hash(
+    block_hash: str,
+) -> typing.Tuple[typing.Union[Response, str], int]:
+    """The block of the chain with the given hash."""
+    try:
+        found = get_block_chain().find_block(bytes.fromhex(block_hash))
+    except ValueError:
+        return 'Malformed block hash', 400
+    if found is None:
+        return f'No block {block_hash}', 404
+    position, block = found
+    if not isinstance(block, Block):
+        return pruned(position)
+    return block_response(position, block), 200
+
+
+@blueprint.route('/addresses/<address>/transactions/')
+@typechecked
+def address_history(
+    address: str,
+) -> typing.Tuple[typing.Union[Response, str], int]:
+    """The confirmed transactions touching ``address``, oldest first: at
+    most ``limit`` (defaults to :const:`HISTORY_PAGE`) of them from the
+    ``from``-th on.  ``next`` is where the next page starts, or ``null``
+    after the last one.
+
+    """
+    try:
+        address_bytes = bytes.fromhex(address)
+    except ValueError:
+        return 'Malformed address', 400
+    try:
+        start = get_int_arg('from', 0)
+        limit = get_int_arg('limit', HISTORY_PAGE)
+    except ValueError as e:
+        return str(e), 400
+    if not 0 < limit <= MAX_HISTORY_PAGE:
+        return f'limit must be between 1 and {MAX_HISTORY_PAGE}', 400
+    total, found = get_block_chain().history(address_bytes, start, limit)
+    stop = start + len(found)
+    response = {
+        'address': address,
+        'total': total,
+        'next': stop if stop < total else None,
+        'transactions': [
+            {
+                'block': block_position,
+                'block_hash': block.hash.hex(),
+                'timestamp': block.timestamp,
+                'position': position,
+                'transaction': block.transactions[position].serialize(),
+            }
+            for (block_position, position), block in found
+        ],
+    }
+    return jsonify(response), 200
+
+
+@blueprint.route('/chain/proof/')
+@typechecked
+def transaction_proof() -> typing.Tuple[typing.Union[Response, str], int]:
+    """Merkle proof that the transaction at position ``transaction`` is in
+    the block at position ``block``, which can be checked against the block
+    hash with :func:`uaena.block.verify_inclusion` and the returned
+    ``header``.
+
+    """
+    block_chain = get_block_chain()
+    try:
+        position = get_int_arg('block')
+        transaction_position = get_int_arg('transaction')
+    except ValueError as e:
+        return str(e), 400
+    chain = block_chain.chain
+    if position >= len(chain):
+        return f'No block at position {position}', 404
+    block = chain[position]
+    if not isinstance(block, Block):
+        return pruned(position)
+    if block.version != BLOCK_VERSION_MERKLE:
+        return f'Block {block.index} does not commit to a Merkle root', 400
+    try:
+        proof = block.prove(transaction_position)
+    except ValueError as e:
+        return str(e), 404
+    response = {
+        'hash': block.hash.hex(),
+        'header': block.encode_header().hex(),
+        'transaction': block.transactions[transaction_position].serialize(),
+        'proof': proof.serialize(),
+    }
+    return jsonify(response), 200
+
+
+@blueprint.route('/checkpoints/')
+@typechecked
+def list_checkpoints() -> Response:
+    """The stored checkpoints of our chain, latest first, without their
+    balances.
+
+    """
+    block_chain = get_block_chain()
+    chain = block_chain.chain
+    response = {
+        'checkpoints': [
+            {
+                'height': checkpoint.height,
+                'block_hash': checkpoint.block_hash.hex(),
+                'hash': checkpoint.hash.hex(),
+            }
+            for checkpoint in block_chain.checkpoints or []
+            if 0 < checkpoint.height <= len(chain) and
+            chain[checkpoint.height - 1].hash == checkpoint.block_hash
+        ],
     }
     return jsonify(response)
 
 
-@app.route('/nodes/register/', methods=['POST'])
+@blueprint.route('/checkpoints/<checkpoint_hash>/')
+@typechecked
+def get_checkpoint(
+    checkpoint_hash: str,
+) -> typing.Tuple[typing.Union[Response, str], int]:
+    block_chain = get_block_chain()
+    for stored in block_chain.checkpoints or []:
+        if stored.hash.hex() == checkpoint_hash:
+            return jsonify(stored.serialize()), 200
+    return f'No checkpoint {checkpoint_hash}', 404
+
+
+@blueprint.route('/chain/announce/', methods=['POST'])
+@typechecked
+def announce_block() -> typing.Tuple[typing.Union[Response, str], int]:
+    """Takes in a block a peer pushes, in binary or as JSON.  The block is
+    attached if it follows a block we know, switching to its branch if that
+    has the most work, and a sync with the peers is run if it leaves a gap.
+
+    """
+    try:
+        if request.mimetype == BLOCKS_MIMETYPE:
+            blocks = decode_blocks(request.get_data())
+            if len(blocks) != 1:
+                raise ValueError('Expected a single block')
+            block, = blocks
+        else:
+            values = request.get_json(silent=True)
+            if not isinstance(values, dict):
+                raise ValueError('Expected a JSON object')
+            block = Block.deserialize(values)
+        # Blocks of later versions are hashed over their binary encoding,
+        # which does not take every field.
+        block_hash = block.hash
+    except (KeyError, TypeError, ValueError) as e:
+        return f'Malformed block: {e}', 400
+    gossip: Gossip = current_app.config['GOSSIP']
+    try:
+        outcome = gossip.receive(block)
+    except InvalidChainError as e:
+        return str(e), 400
+    response = {'outcome': outcome, 'hash': block_hash.hex()}
+    return jsonify(response), 201 if outcome == BLOCK_ACCEPTED else 200
+
+
+@blueprint.route('/nodes/register/', methods=['POST'])
 @typechecked
 def register_nodes() -> typing.Tuple[typing.Union[Response, str], int]:
+    block_chain = get_block_chain()
     values = request.get_json()
 
     nodes = values.get('nodes')
@@ -94,23 +600,124 @@ def register_nodes() -> typing.Tuple[typing.Union[Response, str], int]:
     return jsonify(response), 201
 
 
-@app.route('/nodes/resolve/')
+@blueprint.route('/nodes/resolve/')
 @typechecked
 def consensus() -> Response:
+    block_chain = get_block_chain()
     replaced = block_chain.resolve_conflicts()
+    chain = block_chain.chain
+    # A pruned chain only has the blocks from its checkpoint on.
+    blocks = (
+        chain[position]
+        for position in range(block_chain.pruned_height, len(chain))
+    )
 
     if replaced:
-        response = {
-            'message': 'Our chain was replaced',
-            'new_chain': [block.serialize() for block in block_chain.chain],
-        }
-    else:
-        response = {
-            'message': 'Our chain is authoritative',
-            'chain': [block.serialize() for block in block_chain.chain],
-        }
+        return stream_blocks(
+            {'message': 'Our chain was replaced'},
+            'new_chain',
+            blocks,
+        )
+    return stream_blocks(
+        {'message': 'Our chain is authoritative'},
+        'chain',
+        blocks,
+    )
 
-    return jsonify(response)
+
+@typechecked
+def create_app(
+    block_chain: typing.Optional[BlockChain]=None,
+    node_identifier: typing.Optional[str]=None,
+) -> Flask:
+    """Creates a node serving ``block_chain``.  By default the node keeps
+    its chain in memory, or in the block store at ``UAENA_STORE_PATH`` if
+    that environment variable is set (flushed according to
+    ``UAENA_STORE_FSYNC``).  Checkpoints of the balances are kept under
+    ``UAENA_CHECKPOINT_PATH`` if set, every ``UAENA_CHECKPOINT_INTERVAL``
+    blocks.  A node starting with an empty chain bootstraps from the node
+    at ``UAENA_BOOTSTRAP_NODE`` (``host:port``) if set, trusting its
+    checkpoint of the hash ``UAENA_BOOTSTRAP_CHECKPOINT``, and keeps only the
+    headers of the blocks before it.  Blocks are mined in the version
+    ``UAENA_BLOCK_VERSION`` (:const:`~uaena.block.BLOCK_VERSION_JSON` by
+    default; :const:`~uaena.block.BLOCK_VERSION_MERKLE` makes them provable
+    to light clients), and their transactions are kept in columnar batches
+    if ``UAENA_COMPACT`` is ``1``.  Long runs of peers' blocks are
+    validated by ``UAENA_VERIFY_WORKERS`` processes if set, and in the
+    node's own process by default.  Mining uses ``UAENA_MINING_WORKERS``
+    processes, one per CPU by default.  Every new tip of the chain is
+    announced to the registered nodes.  The node's metrics are served at
+    ``/metrics``.
+
+    """
+    if block_chain is None:
+        store = None
+        store_path = os.environ.get('UAENA_STORE_PATH')
+        if store_path:
+            store = BlockStore(
+                store_path,
+                fsync=os.environ.get('UAENA_STORE_FSYNC', FSYNC_ALWAYS),
+            )
+        checkpoints = None
+        checkpoint_path = os.environ.get('UAENA_CHECKPOINT_PATH')
+        if checkpoint_path:
+            checkpoints = CheckpointStore(checkpoint_path)
+        block_version = int(
+            os.environ.get('UAENA_BLOCK_VERSION', BLOCK_VERSION_JSON),
+        )
+        if block_version not in BLOCK_VERSIONS:
+            raise ValueError(
+                f'UAENA_BLOCK_VERSION must be one of '
+                f'{sorted(BLOCK_VERSIONS)}, not {block_version}',
+            )
+        verify_workers = os.environ.get('UAENA_VERIFY_WORKERS')
+        block_chain = BlockChain(
+            block_version=block_version,
+            compact=bool(int(os.environ.get('UAENA_COMPACT', 0))),
+            store=store,
+            checkpoints=checkpoints,
+            verifier=ChainVerifier(workers=int(verify_workers))
+            if verify_workers else ChainVerifier(),
+            checkpoint_interval=int(
+                os.environ.get(
+                    'UAENA_CHECKPOINT_INTERVAL', CHECKPOINT_INTERVAL,
+                ),
+            ),
+        )
+        bootstrap_node = os.environ.get('UAENA_BOOTSTRAP_NODE')
+        if bootstrap_node and not block_chain.chain:
+            checkpoint_hash = bytes.fromhex(
+                os.environ['UAENA_BOOTSTRAP_CHECKPOINT'],
+            )
+            if not block_chain.bootstrap(
+                bootstrap_node,
+                checkpoint_hash,
+                time.monotonic() + BOOTSTRAP_DEADLINE,
+            ):
+                raise RuntimeError(
+                    f'Failed to bootstrap from {bootstrap_node} at checkpoint '
+                    f'{checkpoint_hash.hex()}'
+                )
+            block_chain.register_node(f'http://{bootstrap_node}/')
+    app = Flask(__name__)
+    app.config['BLOCK_CHAIN'] = block_chain
+    app.config['NODE_IDENTIFIER'] = node_identifier or \
+        str(uuid.uuid4()).replace('-', '')
+    workers = os.environ.get('UAENA_MINING_WORKERS')
+    app.config['MINING_JOBS'] = MiningJobs(
+        block_chain,
+        reward_recipient=bytes.fromhex(app.config['NODE_IDENTIFIER']),
+        miner=Miner(workers=int(workers)) if workers else Miner(),
+    )
+    app.config['GOSSIP'] = Gossip(block_chain)
+    app.register_blueprint(blueprint)
+    return app
+
+
+if __name__ != '__mp_main__':
+    # The workers of a ChainVerifier import the main module under this name
+    # when it is this one, and must not start a node of their own.
+    app = create_app()
 
 
 if __name__ == '__main__':
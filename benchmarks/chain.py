@@ -0,0 +1,128 @@
+"""Synthetic chain generator for the benchmarks."""
+import dataclasses
+import decimal
+import json
+import pathlib
+import random
+import typing
+
+from uaena.block_chain import MINING_REWARD, BlockChain
+from uaena.difficulty import TARGET_BLOCK_INTERVAL
+from uaena.mining import Miner
+from uaena.transaction import Transaction
+
+#: Proofs of work only depend on the previous proof and the block's target,
+#: which only depends on the timestamps, so every chain that starts from the
+#: genesis proof shares them.  They are mined once and cached here, along
+#: with the targets they were mined for.
+PROOFS_CACHE = pathlib.Path(__file__).parent / 'proofs.json'
+GENESIS_PROOF = 1
+GENESIS_TIMESTAMP = 737511503930
+#: Blocks come exactly as often as retargeting aims for, so the target stays
+#: put and long chains take no longer to mine per block.
+BLOCK_INTERVAL = TARGET_BLOCK_INTERVAL
+
+
+@dataclasses.dataclass
+class ProofCache:
+    """Proofs of the first blocks of any chain, and the targets they were
+    mined for, read from and written back to :const:`PROOFS_CACHE`.
+
+    """
+
+    proofs: typing.List[typing.Tuple[int, int]] = dataclasses.field(
+        default_factory=list,
+    )
+    changed: bool = False
+    miner: Miner = dataclasses.field(default_factory=Miner)
+
+    @staticmethod
+    def load() -> 'ProofCache':
+        try:
+            proofs = [
+                (int(proof), int(target, 16))
+                for proof, target in json.loads(PROOFS_CACHE.read_text())
+            ]
+        except (OSError, TypeError, ValueError):
+            proofs = []
+        return ProofCache(proofs)
+
+    def proof(self, position: int, last_proof: int, target: int) -> int:
+        """The proof of the block at ``position``, which has ``target``, and
+        follows a block of ``last_proof``.  Proofs are asked for in order.
+
+        """
+        if position < len(self.proofs) and \
+                self.proofs[position][1] == target:
+            return self.proofs[position][0]
+        # The proofs after this one followed another proof.
+        del self.proofs[position:]
+        proof = GENESIS_PROOF if not position else \
+            self.miner.mine(last_proof, target=target)
+        self.proofs.append((proof, target))
+        self.changed = True
+        return proof
+
+    def save(self) -> None:
+        if self.changed:
+            PROOFS_CACHE.write_text(json.dumps([
+                [proof, format(target, 'x')] for proof, target in self.proofs
+            ]))
+            self.changed = False
+
+
+def generate_addresses(count: int, rng: random.Random) -> typing.List[bytes]:
+    return [rng.getrandbits(128).to_bytes(16, 'big') for _ in range(count)]
+
+
+def generate_chain(
+    length: int,
+    transactions_per_block: int,
+    addresses: int,
+    seed: int=0,
+) -> BlockChain:
+    """Generates a valid chain of ``length`` blocks, each with up to
+    ``transactions_per_block`` transfers between ``addresses`` addresses
+    besides its mining reward.
+
+    """
+    rng = random.Random(seed)
+    wallets = generate_addresses(addresses, rng)
+    balances = dict.fromkeys(wallets, decimal.Decimal())
+    block_chain = BlockChain()
+    cache = ProofCache.load()
+    for position in range(length):
+        funded = [address for address in wallets if balances[address] > 0]
+        for _ in range(transactions_per_block if funded else 0):
+            sender = rng.choice(funded)
+            recipient = rng.choice(wallets)
+            amount = (
+                balances[sender] * decimal.Decimal(rng.randint(1, 100)) /
+                100
+            ).quantize(decimal.Decimal('0.00000001'), decimal.ROUND_DOWN)
+            if not amount:
+                continue
+            block_chain.append_transaction(
+                Transaction(sender=sender, recipient=recipient, amount=amount),
+            )
+            balances[sender] -= amount
+            balances[recipient] += amount
+        miner = rng.choice(wallets)
+        timestamp = GENESIS_TIMESTAMP + position * BLOCK_INTERVAL
+        last_block = block_chain.last_block
+        proof = cache.proof(
+            position,
+            last_block.proof if last_block else 0,
+            block_chain.next_target(),
+        )
+        if position:
+            block_chain.create_block(
+                proof=proof, reward_recipient=miner, timestamp=timestamp,
+            )
+        else:
+            block_chain.create_genesis_block(
+                reward_recipient=miner, timestamp=timestamp,
+            )
+        balances[miner] += MINING_REWARD
+    cache.save()
+    return block_chain
@@ -0,0 +1,58 @@
+"""Compares two result files of :mod:`benchmarks.suite`::
+
+    python -m benchmarks.compare before.json after.json --threshold 0.1
+
+Exits with status 1 if any workload got slower by more than the threshold.
+
+"""
+import argparse
+import json
+import sys
+import typing
+
+
+def compare(
+    before: typing.Mapping[str, typing.Any],
+    after: typing.Mapping[str, typing.Any],
+    threshold: float,
+) -> typing.List[typing.Tuple[str, float, float, float, bool]]:
+    """Compares the median timings of the workloads both runs have, as
+    ``(name, before, after, ratio, regressed)`` rows.
+
+    """
+    rows = []
+    for name, timing in before['results'].items():
+        if name not in after['results']:
+            continue
+        old = timing['median']
+        new = after['results'][name]['median']
+        ratio = new / old if old else float('inf')
+        rows.append((name, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv: typing.Optional[typing.Sequence[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('before', type=argparse.FileType())
+    parser.add_argument('after', type=argparse.FileType())
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='slowdown tolerated before flagging, e.g. 0.1 '
+                             'for 10%%')
+    args = parser.parse_args(argv)
+    before = json.load(args.before)
+    after = json.load(args.after)
+    if before['meta']['parameters'] != after['meta']['parameters']:
+        print('warning: the runs used different parameters', file=sys.stderr)
+    rows = compare(before, after, args.threshold)
+    width = max([len(row[0]) for row in rows] + [8])
+    print(f'{"workload":<{width}}  {"before":>10}  {"after":>10}  ratio')
+    for name, old, new, ratio, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<{width}}  {old:>9.6f}s  {new:>9.6f}s  {ratio:.2f}x'
+              f'{flag}')
+    if any(row[4] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
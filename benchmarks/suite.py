@@ -0,0 +1,231 @@
+"""Benchmark suite for the hot paths of a node.
+
+Times mining, chain validation, balance lookups, block hashing and
+serialization and the busiest HTTP endpoints over a synthetic chain, and
+writes the results as JSON so they can be compared across commits with
+:mod:`benchmarks.compare`::
+
+    python -m benchmarks.suite --length 200 --output before.json
+    python -m benchmarks.suite --length 200 --output after.json
+    python -m benchmarks.compare before.json after.json
+
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import typing
+
+from uaena.block import Block
+from uaena.block_chain import BlockChain
+from uaena.typecheck import TYPECHECK
+from uaena.wire import CHAIN_MIMETYPE, decode_blocks, encode_blocks
+
+from .chain import generate_chain
+
+Workload = typing.Callable[[], typing.Any]
+
+
+def time_workload(
+    workload: Workload,
+    repeat: int,
+    setup: typing.Optional[Workload]=None,
+) -> typing.Mapping[str, typing.Any]:
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        workload()
+        timings.append(time.perf_counter() - started)
+    return {
+        'repeat': repeat,
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'max': max(timings),
+    }
+
+
+def git_commit() -> typing.Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def workloads(
+    block_chain: BlockChain,
+    lookups: int,
+    seed: int,
+) -> typing.Mapping[str, typing.Tuple[Workload, typing.Optional[Workload]]]:
+    """The workloads to time, each with an optional setup step that is not
+    timed.
+
+    """
+    from app import create_app
+
+    rng = random.Random(seed)
+    chain = block_chain.chain
+    addresses = list({
+        address
+        for block in chain
+        for transaction in block.transactions
+        for address in (transaction.sender, transaction.recipient)
+    })
+    lookup_addresses = [rng.choice(addresses) for _ in range(lookups)]
+    serialized = [block.serialize() for block in chain]
+    encoded = b''.join(encode_blocks(chain))
+    client = create_app(block_chain).test_client()
+    transfer = next(
+        t for block in reversed(chain) for t in block.transactions
+        if t.sender != bytes(16)
+    )
+
+    def clear_hashes():
+        for block in chain:
+            block._hash = None
+
+    def post_transactions():
+        # Distinct amounts, as the mempool turns duplicates away.
+        for i in range(1, lookups + 1):
+            client.post('/transactions/new/', json={
+                'sender': transfer.recipient.hex(),
+                'recipient': transfer.sender.hex(),
+                'amount': f'{i}E-8',
+            })
+
+    def post_batch():
+        client.post('/transactions/batch/', json=[
+            {
+                'sender': transfer.recipient.hex(),
+                'recipient': transfer.sender.hex(),
+                'amount': f'{i}E-8',
+            }
+            for i in range(1, lookups + 1)
+        ])
+
+    def clear_pending():
+        block_chain.mempool.clear()
+
+    return {
+        'proof_of_work': (lambda: BlockChain.proof_of_work(chain[-1].proof),
+                          None),
+        'valid_chain': (lambda: BlockChain.valid_chain(chain), clear_hashes),
+        'balance_of': (
+            lambda: [block_chain.balance_of(a) for a in lookup_addresses],
+            None,
+        ),
+        'history': (
+            lambda: [
+                block_chain.history(a, 0, 100) for a in lookup_addresses
+            ],
+            None,
+        ),
+        'Block.hash': (lambda: [block.hash for block in chain], clear_hashes),
+        'Block.serialize': (
+            lambda: [block.serialize() for block in chain], None,
+        ),
+        'Block.deserialize': (
+            lambda: [Block.deserialize(data) for data in serialized], None,
+        ),
+        'wire encode': (lambda: b''.join(encode_blocks(chain)), None),
+        'wire decode': (lambda: decode_blocks(encoded), None),
+        'GET /chain/': (lambda: client.get('/chain/').data, None),
+        'GET /chain/ (binary)': (
+            lambda: client.get(
+                '/chain/', headers={'Accept': CHAIN_MIMETYPE},
+            ).data,
+            None,
+        ),
+        'POST /transactions/new/': (post_transactions, clear_pending),
+        'POST /transactions/batch/': (post_batch, clear_pending),
+    }
+
+
+def run(
+    length: int,
+    transactions: int,
+    addresses: int,
+    repeat: int,
+    lookups: int,
+    seed: int,
+    only: typing.Optional[typing.Sequence[str]]=None,
+) -> typing.Mapping[str, typing.Any]:
+    block_chain = generate_chain(length, transactions, addresses, seed)
+    # Timing a chain that gets rejected would time the rejection instead.
+    if not BlockChain.valid_chain(block_chain.chain):
+        raise RuntimeError('The generated chain is not valid')
+    results = {}
+    for name, (workload, setup) in workloads(
+        block_chain, lookups, seed,
+    ).items():
+        if only and name not in only:
+            continue
+        results[name] = time_workload(workload, repeat, setup)
+    return {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.datetime.now(
+                datetime.timezone.utc,
+            ).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'typecheck': TYPECHECK,
+            'parameters': {
+                'length': length,
+                'transactions': transactions,
+                'addresses': addresses,
+                'repeat': repeat,
+                'lookups': lookups,
+                'seed': seed,
+            },
+            'transactions_total': sum(
+                len(block.transactions) for block in block_chain.chain
+            ),
+        },
+        'results': results,
+    }
+
+
+def main(argv: typing.Optional[typing.Sequence[str]]=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--length', type=int, default=100,
+                        help='blocks in the synthetic chain')
+    parser.add_argument('--transactions', type=int, default=20,
+                        help='transfers per block')
+    parser.add_argument('--addresses', type=int, default=100,
+                        help='distinct addresses in the chain')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='times each workload is run')
+    parser.add_argument('--lookups', type=int, default=1000,
+                        help='balance lookups and transactions per run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', action='append',
+                        help='run only this workload (may be repeated)')
+    parser.add_argument('--output', '-o', type=argparse.FileType('w'),
+                        default=sys.stdout)
+    args = parser.parse_args(argv)
+    result = run(
+        args.length, args.transactions, args.addresses, args.repeat,
+        args.lookups, args.seed, args.only,
+    )
+    json.dump(result, args.output, indent=2)
+    args.output.write('\n')
+    if args.output is not sys.stdout:
+        width = max(map(len, itertools.chain(result['results'], [''])))
+        for name, timing in result['results'].items():
+            print(f'{name:<{width}}  {timing["median"]:.6f}s', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Measures the overhead of runtime type checking on hot paths.
+
+Runs the same workload with ``UAENA_TYPECHECK=all`` and
+``UAENA_TYPECHECK=boundary`` in fresh interpreters, since the mode is fixed
+when :mod:`uaena` is imported::
+
+    python -m benchmarks.typecheck_overhead
+
+"""
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+from uaena.typecheck import TYPECHECK, TYPECHECK_ALL, TYPECHECK_BOUNDARY
+
+REPEAT = 5
+
+
+def measure() -> dict:
+    """Times the hot paths in the current interpreter, in seconds."""
+    import decimal
+
+    from uaena.block import Block
+    from uaena.block_chain import BlockChain
+    from uaena.transaction import Transaction
+
+    block = Block(
+        index=1,
+        timestamp=737511503930,
+        proof=1,
+        previous_hash=bytes(32),
+        transactions=[
+            Transaction(
+                sender=bytes(16),
+                recipient=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+                amount=decimal.Decimal('1'),
+            ),
+        ] * 10,
+    )
+    block_chain = BlockChain(chain=[block])
+    address = bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4')
+
+    def block_hash():
+        block._hash = None
+        return block.hash
+
+    workloads = {
+        'valid_proof x 10000': (
+            lambda: [BlockChain.valid_proof(1234, p) for p in range(10000)]
+        ),
+        'Block.hash x 1000': lambda: [block_hash() for _ in range(1000)],
+        'Block.serialize x 1000': (
+            lambda: [block.serialize() for _ in range(1000)]
+        ),
+        'balance_of x 10000': (
+            lambda: [block_chain.balance_of(address) for _ in range(10000)]
+        ),
+    }
+    return {
+        name: min(timeit.repeat(workload, number=1, repeat=REPEAT))
+        for name, workload in workloads.items()
+    }
+
+
+def main() -> None:
+    if os.environ.get('UAENA_TYPECHECK_BENCHMARK_CHILD'):
+        json.dump({'mode': TYPECHECK, 'timings': measure()}, sys.stdout)
+        return
+    results = {}
+    for mode in (TYPECHECK_ALL, TYPECHECK_BOUNDARY):
+        env = dict(
+            os.environ,
+            UAENA_TYPECHECK=mode,
+            UAENA_TYPECHECK_BENCHMARK_CHILD='1',
+        )
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.typecheck_overhead'],
+            env=env, check=True, capture_output=True, text=True,
+        ).stdout
+        results[mode] = json.loads(output)['timings']
+    print(f'{"workload":<24} {"all":>10} {"boundary":>10} {"speedup":>8}')
+    for name, checked in results[TYPECHECK_ALL].items():
+        unchecked = results[TYPECHECK_BOUNDARY][name]
+        print(
+            f'{name:<24} {checked:>9.4f}s {unchecked:>9.4f}s '
+            f'{checked / unchecked:>7.1f}x'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+import json
+import pathlib
+import time
+
+from flask import Flask
+from pytest import MonkeyPatch, mark, raises
+from typeguard import typechecked
+
+from app import create_app
+from uaena.block import (BLOCK_VERSION_BINARY, BLOCK_VERSION_MERKLE,
+                         verify_inclusion)
+from uaena.checkpoint import Checkpoint, CheckpointStore
+from uaena.merkle import MerkleProof
+from uaena.mining import Miner
+from uaena.transaction import Transaction
+from uaena.wire import (BLOCKS_MIMETYPE, CHAIN_MIMETYPE, decode_blocks,
+                        decode_chain)
+
+
+@typechecked
+def test_mine(fx_app: Flask):
+    fx_app.config['MINING_JOBS'].miner = Miner(workers=1, chunk_size=5000)
+    client = fx_app.test_client()
+    response = client.post('/mine/')
+    assert response.status_code == 202
+    job = response.get_json()
+    assert job['state'] == 'running'
+    assert job['index'] == 4
+    location = response.headers['Location']
+    assert location.endswith(f'/mine/{job["id"]}/')
+    deadline = time.monotonic() + 10
+    while job['state'] == 'running' and time.monotonic() < deadline:
+        time.sleep(0.01)
+        job = client.get(location).get_json()
+    assert job['state'] == 'done'
+    assert job['block']['proof'] == 183745  # BlockChain.proof_of_work(24348)
+    assert job['block']['transactions'][-1]['recipient'] == (
+        '619b9000222b457b978efbca2815d38a'
+    )
+
+    job = client.post('/mine/').get_json()
+    response = client.post(f'/mine/{job["id"]}/cancel/')
+    assert response.status_code == 202
+    assert response.get_json()['id'] == job['id']
+    assert client.get('/mine/unknown/').status_code == 404
+    assert client.post('/mine/unknown/cancel/').status_code == 404
+
+
+@typechecked
+def test_new_transaction(fx_app: Flask):
+    client = fx_app.test_client()
+    response = client.post('/transactions/new/', json={
+        'sender': '33ee49f83681417e82660cb9585d13b1',
+        'recipient': 'a9596e7414064c778bdc36b76bb2dc2c',
+        'amount': '0.25',
+    })
+    assert response.status_code == 201
+    assert response.get_json() == {
+        'message': 'Transaction will be added to Block 4',
+    }
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    assert block_chain.balance_of(
+        bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+    ) == 0.25
+
+    response = client.post('/transactions/new/', json={
+        'sender': '33ee49f83681417e82660cb9585d13b1',
+        'recipient': 'a9596e7414064c778bdc36b76bb2dc2c',
+    })
+    assert response.status_code == 400
+    assert response.text == 'amount is required'
+    response = client.post('/transactions/new/', json={
+        'sender': 'a9596e7414064c778bdc36b76bb2dc2c',
+        'recipient': '33ee49f83681417e82660cb9585d13b1',
+        'amount': '1',
+    })
+    assert response.status_code == 400
+    assert response.text == (
+        'Sender a9596e7414064c778bdc36b76bb2dc2c does not have '
+        'sufficient balance: 1 (have 0.25)'
+    )
+
+
+@typechecked
+def test_new_transactions(fx_app: Flask):
+    client = fx_app.test_client()
+    transfers = [
+        {
+            'sender': '33ee49f83681417e82660cb9585d13b1',
+            'recipient': 'a9596e7414064c778bdc36b76bb2dc2c',
+            'amount': '0.25',
+        },
+        # Spends what the transfer before it brought in.
+        {
+            'sender': 'a9596e7414064c778bdc36b76bb2dc2c',
+            'recipient': '5ca60de0575441718094ea0ffcb02aa4',
+            'amount': '0.25',
+        },
+        {
+            'sender': 'a9596e7414064c778bdc36b76bb2dc2c',
+            'recipient': '5ca60de0575441718094ea0ffcb02aa4',
+        },
+        {
+            'sender': 'a9596e7414064c778bdc36b76bb2dc2c',
+            'recipient': '5ca60de0575441718094ea0ffcb02aa4',
+            'amount': '0.1',
+        },
+    ]
+    response = client.post('/transactions/batch/', json=transfers)
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'accepted': 2,
+        'rejected': 2,
+        'block': 4,
+        'results': [
+            {'status': 'accepted'},
+            {'status': 'accepted'},
+            {'status': 'rejected', 'error': 'amount is required'},
+            {
+                'status': 'rejected',
+                'error': 'Sender a9596e7414064c778bdc36b76bb2dc2c does not '
+                         'have sufficient balance: 0.1 (have 0.00)',
+            },
+        ],
+    }
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    assert len(block_chain.current_transactions) == 2
+
+    response = client.post(
+        '/transactions/batch/',
+        data='\n'.join([
+            json.dumps(transfers[0]),
+            'not json',
+            json.dumps({**transfers[0], 'amount': '0.125'}),
+            '',
+        ]),
+        content_type='application/x-ndjson',
+    )
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['results']] == [
+        'rejected', 'rejected', 'accepted',
+    ]
+    assert response.get_json()['results'][1]['error'] == (
+        'transaction must be an object'
+    )
+
+    response = client.post('/transactions/batch/', json=transfers[0])
+    assert response.status_code == 400
+
+    pooled = len(block_chain.current_transactions)
+    response = client.post('/transactions/batch/', json=[
+        {**transfers[0], 'amount': '0.0625'},
+        {**transfers[0], 'amount': 'NaN'},
+        {**transfers[0], 'sender': 'ab' * 300},
+    ])
+    assert response.status_code == 200
+    assert [r['status'] for r in response.get_json()['results']] == [
+        'accepted', 'rejected', 'rejected',
+    ]
+    assert len(block_chain.current_transactions) == pooled + 1
+
+
+@mark.parametrize('amount', ['NaN', 'sNaN', 'Infinity', '-1', '0'])
+@typechecked
+def test_new_transaction_invalid_amount(fx_app: Flask, amount: str):
+    response = fx_app.test_client().post('/transactions/new/', json={
+        'sender': '33ee49f83681417e82660cb9585d13b1',
+        'recipient': 'a9596e7414064c778bdc36b76bb2dc2c',
+        'amount': amount,
+    })
+    assert response.status_code == 400
+    assert response.text == f'{amount} is not a positive amount'
+
+
+@typechecked
+def test_new_transaction_long_address(fx_app: Flask):
+    response = fx_app.test_client().post('/transactions/new/', json={
+        'sender': '33ee49f83681417e82660cb9585d13b1',
+        'recipient': 'ab' * 300,
+        'amount': '0.25',
+    })
+    assert response.status_code == 400
+
+
+@typechecked
+def test_transaction_proof(fx_app: Flask):
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    client = fx_app.test_client()
+    response = client.get('/chain/proof/?block=0&transaction=0')
+    assert response.status_code == 400
+
+    block_chain.block_version = BLOCK_VERSION_MERKLE
+    block = block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=block_chain.last_block.timestamp + 15000,
+    )
+    response = client.get('/chain/proof/?block=3&transaction=0')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['hash'] == block.hash.hex()
+    assert verify_inclusion(
+        block.hash,
+        bytes.fromhex(data['header']),
+        Transaction.deserialize(data['transaction']),
+        MerkleProof.deserialize(data['proof']),
+    )
+    assert client.get(
+        '/chain/proof/?block=3&transaction=1',
+    ).status_code == 404
+    assert client.get(
+        '/chain/proof/?block=4&transaction=0',
+    ).status_code == 404
+
+
+@typechecked
+def test_chain_length(fx_app: Flask):
+    response = fx_app.test_client().get('/chain/length/')
+    assert response.get_json() == {'length': 3}
+
+
+@typechecked
+def test_metrics(fx_app: Flask):
+    client = fx_app.test_client()
+    assert client.get('/chain/length/').status_code == 200
+    assert client.get('/chain/blocks/99/').status_code == 404
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert '# TYPE uaena_http_request_seconds histogram' in body
+    assert 'uaena_http_request_seconds_count{method="GET",' \
+        'route="/chain/length/",status="200"}' in body
+    # Requests are counted by their route, not their path.
+    assert 'route="/chain/blocks/<int:position>/",status="404"' in body
+    assert '# TYPE uaena_mining_hashes_total counter' in body
+
+
+@typechecked
+def test_chain_headers(fx_app: Flask):
+    chain = fx_app.config['BLOCK_CHAIN'].chain
+    client = fx_app.test_client()
+    response = client.get('/chain/headers/?from=1&to=2')
+    assert response.status_code == 200
+    assert response.get_json() == {
+        'headers': [chain[1].header().serialize()],
+    }
+    header = response.get_json()['headers'][0]
+    assert header['hash'] == chain[1].hash.hex()
+    assert header['previous_hash'] == chain[0].hash.hex()
+    response = client.get('/chain/headers/?from=1')
+    assert len(response.get_json()['headers']) == 2
+    assert client.get('/chain/headers/').status_code == 400
+    assert client.get('/chain/headers/?from=-1').status_code == 400
+
+
+@typechecked
+def test_chain_blocks(fx_app: Flask):
+    chain = fx_app.config['BLOCK_CHAIN'].chain
+    client = fx_app.test_client()
+    response = client.get('/chain/blocks/?from=1')
+    assert response.get_json() == {
+        'blocks': [block.serialize() for block in chain[1:]],
+    }
+    response = client.get('/chain/blocks/?from=0&limit=1')
+    assert response.get_json() == {'blocks': [chain[0].serialize()]}
+    assert client.get('/chain/blocks/?from=x').status_code == 400
+    response = client.get(
+        '/chain/blocks/?from=1', headers={'Accept': BLOCKS_MIMETYPE},
+    )
+    assert response.mimetype == BLOCKS_MIMETYPE
+    assert decode_blocks(response.data) == chain[1:]
+
+
+@typechecked
+def test_get_block(fx_app: Flask):
+    chain = fx_app.config['BLOCK_CHAIN'].chain
+    client = fx_app.test_client()
+    expected = {
+        'position': 1,
+        'hash': chain[1].hash.hex(),
+        'block': chain[1].serialize(),
+    }
+    assert client.get('/chain/blocks/1/').get_json() == expected
+    response = client.get(f'/chain/blocks/hash/{chain[1].hash.hex()}/')
+    assert response.get_json() == expected
+    assert client.get('/chain/blocks/3/').status_code == 404
+    assert client.get(f'/chain/blocks/hash/{"00" * 32}/').status_code == 404
+    assert client.get('/chain/blocks/hash/xyz/').status_code == 400
+
+
+@typechecked
+def test_address_history(fx_app: Flask):
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    chain = block_chain.chain
+    client = fx_app.test_client()
+    address = '33ee49f83681417e82660cb9585d13b1'
+    response = client.get(f'/addresses/{address}/transactions/?limit=2')
+    assert response.get_json() == {
+        'address': address,
+        'total': 3,
+        'next': 2,
+        'transactions': [
+            {
+                'block': 1,
+                'block_hash': chain[1].hash.hex(),
+                'timestamp': chain[1].timestamp,
+                'position': position,
+                'transaction': chain[1].transactions[position].serialize(),
+            }
+            for position in (0, 1)
+        ],
+    }
+    response = client.get(f'/addresses/{address}/transactions/?from=2')
+    data = response.get_json()
+    assert data['next'] is None
+    assert [(t['block'], t['position']) for t in data['transactions']] == [
+        (2, 0),
+    ]
+
+    # New blocks are indexed as they are created.
+    block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex(address),
+        timestamp=block_chain.last_block.timestamp + 15000,
+    )
+    response = client.get(f'/addresses/{address}/transactions/?from=2')
+    data = response.get_json()
+    assert data['total'] == 4
+    assert [(t['block'], t['position']) for t in data['transactions']] == [
+        (2, 0), (3, 0),
+    ]
+    response = client.get(f'/addresses/{"ff" * 16}/transactions/')
+    assert response.get_json()['transactions'] == []
+    for query in ('?limit=0', '?limit=100000', '?from=x'):
+        response = client.get(f'/addresses/{address}/transactions/{query}')
+        assert response.status_code == 400
+    assert client.get('/addresses/xyz/transactions/').status_code == 400
+
+
+@typechecked
+def test_full_chain(fx_app: Flask):
+    chain = fx_app.config['BLOCK_CHAIN'].chain
+    client = fx_app.test_client()
+    response = client.get('/chain/')
+    assert response.get_json() == {
+        'chain': [block.serialize() for block in chain],
+        'length': 3,
+        'next': None,
+    }
+
+    response = client.get('/chain/?from=1&limit=1')
+    assert response.get_json() == {
+        'chain': [chain[1].serialize()],
+        'length': 3,
+        'next': 2,
+    }
+    assert client.get('/chain/?limit=-1').status_code == 400
+    assert client.get('/chain/?from=0&limit=0').status_code == 400
+
+    # Clients preferring the binary format get it; others get JSON.
+    response = client.get(
+        '/chain/?from=1&limit=1',
+        headers={'Accept': f'{CHAIN_MIMETYPE}, application/json;q=0.5'},
+    )
+    assert response.mimetype == CHAIN_MIMETYPE
+    assert decode_chain(response.data) == (3, 2, [chain[1]])
+    response = client.get(
+        '/chain/',
+        headers={'Accept': f'{CHAIN_MIMETYPE};q=0.5, application/json'},
+    )
+    assert response.mimetype == 'application/json'
+    assert 'Accept' in response.vary
+
+
+@typechecked
+def test_full_chain_etag(fx_app: Flask):
+    client = fx_app.test_client()
+    etag = client.get('/chain/').headers['ETag']
+    response = client.get('/chain/', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert not response.data
+    response = client.get(
+        '/chain/?from=1', headers={'If-None-Match': etag},
+    )
+    assert response.status_code == 200
+    # Nor does the same chain in another format.
+    response = client.get(
+        '/chain/', headers={'If-None-Match': etag, 'Accept': CHAIN_MIMETYPE},
+    )
+    assert response.status_code == 200
+
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=block_chain.last_block.timestamp + 15000,
+    )
+    response = client.get('/chain/', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['length'] == 4
+
+
+@typechecked
+def test_checkpoints(fx_app: Flask, tmp_path: pathlib.Path):
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    client = fx_app.test_client()
+    assert client.get('/checkpoints/').get_json() == {'checkpoints': []}
+
+    block_chain.checkpoints = CheckpointStore(tmp_path)
+    block_chain.checkpoint_interval = 3
+    checkpoint = block_chain.write_checkpoint()
+    assert client.get('/checkpoints/').get_json() == {
+        'checkpoints': [
+            {
+                'height': 3,
+                'block_hash': block_chain.chain[-1].hash.hex(),
+                'hash': checkpoint.hash.hex(),
+            },
+        ],
+    }
+    response = client.get(f'/checkpoints/{checkpoint.hash.hex()}/')
+    assert response.status_code == 200
+    assert Checkpoint.deserialize(response.get_json()) == checkpoint
+    assert client.get(f'/checkpoints/{"00" * 32}/').status_code == 404
+
+
+@typechecked
+def test_announce_block_malformed(fx_app: Flask):
+    block_chain = fx_app.config['BLOCK_CHAIN']
+    last_block = block_chain.last_block
+    response = fx_app.test_client().post('/chain/announce/', json={
+        'index': last_block.index + 1,
+        'timestamp': last_block.timestamp + 15000,
+        'proof': -1,
+        'previous_hash': last_block.hash.hex(),
+        'transactions': [],
+        'version': BLOCK_VERSION_BINARY,
+    })
+    assert response.status_code == 400
+    response = fx_app.test_client().post(
+        '/chain/announce/', json=[last_block.serialize()],
+    )
+    assert response.status_code == 400
+    assert len(block_chain.chain) == 3
+
+
+@typechecked
+def test_create_app_block_version(monkeypatch: MonkeyPatch):
+    monkeypatch.setenv('UAENA_BLOCK_VERSION', str(BLOCK_VERSION_MERKLE))
+    monkeypatch.setenv('UAENA_COMPACT', '1')
+    block_chain = create_app().config['BLOCK_CHAIN']
+    assert block_chain.block_version == BLOCK_VERSION_MERKLE
+    assert block_chain.compact
+    monkeypatch.setenv('UAENA_BLOCK_VERSION', '255')
+    with raises(ValueError):
+        create_app()
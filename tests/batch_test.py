@@ -0,0 +1,81 @@
+import decimal
+import pickle
+
+from pytest import mark, raises
+from typeguard import typechecked
+
+from uaena.batch import TransactionBatch, from_fixed_point, to_fixed_point
+from uaena.block import Block
+from uaena.transaction import Transaction
+
+
+@mark.parametrize('amount', ['1', '0.5', '0.50', '0.00000001', '1E+2', '0'])
+@typechecked
+def test_fixed_point(amount: str):
+    units, exponent = to_fixed_point(decimal.Decimal(amount))
+    assert str(from_fixed_point(units, exponent)) == \
+        str(decimal.Decimal(amount))
+
+
+@mark.parametrize('amount', ['0.000000001', 'NaN', '-0', '1E+20'])
+@typechecked
+def test_fixed_point_invalid(amount: str):
+    with raises(ValueError):
+        to_fixed_point(decimal.Decimal(amount))
+
+
+@typechecked
+def test_transaction_batch(fx_block: Block, fx_transaction: Transaction):
+    transactions = [fx_transaction, *fx_block.transactions]
+    batch = TransactionBatch.from_transactions(transactions)
+    assert len(batch) == 2
+    assert batch == transactions
+    assert list(batch) == transactions
+    assert batch[1] == transactions[1]
+    assert batch[-1] == transactions[1]
+    assert batch[:1] == transactions[:1]
+    assert fx_transaction in batch
+
+    batch.insert(0, transactions[1])
+    del batch[2]
+    assert batch == transactions[::-1]
+    batch[0] = fx_transaction
+    assert batch == [fx_transaction, fx_transaction]
+    with raises(ValueError):
+        batch.append(
+            Transaction(
+                sender=fx_transaction.sender,
+                recipient=fx_transaction.recipient,
+                amount=decimal.Decimal('0.000000001'),
+            ),
+        )
+    assert len(batch) == 2
+
+
+@typechecked
+def test_transaction_batch_addresses(fx_transaction: Transaction):
+    copy = Transaction.deserialize(fx_transaction.serialize())
+    assert copy.sender is not fx_transaction.sender
+    batch = TransactionBatch.from_transactions([fx_transaction, copy])
+    assert batch.addresses.addresses == [
+        fx_transaction.sender, fx_transaction.recipient,
+    ]
+    assert batch[0].sender is batch[1].sender
+    assert pickle.loads(pickle.dumps(batch)) == batch
+
+    # Batches numbering the same addresses differently are still equal.
+    reordered = TransactionBatch()
+    reordered.addresses.number(fx_transaction.recipient)
+    reordered.extend(batch)
+    assert reordered.senders != batch.senders
+    assert reordered == batch
+
+
+@typechecked
+def test_block_compact(fx_block: Block):
+    compact = fx_block.compact()
+    assert isinstance(compact.transactions, TransactionBatch)
+    assert compact == fx_block
+    assert compact.serialize() == fx_block.serialize()
+    assert compact.hash == fx_block.hash
+    assert Block.deserialize(compact.serialize()) == fx_block
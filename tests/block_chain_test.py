@@ -1,10 +1,27 @@
+import dataclasses
 import decimal
+import itertools
+import pathlib
+import random
+import sys
+import threading
+import typing
 
 from pytest import raises
 from typeguard import typechecked
 
-from uaena.block import Block
-from uaena.block_chain import BlockChain
+from app import create_app
+from benchmarks.chain import GENESIS_TIMESTAMP, ProofCache
+from uaena.block import (BLOCK_VERSION_BINARY, BLOCK_VERSION_JSON,
+                         BLOCK_VERSION_MERKLE, Block)
+from uaena.block_chain import (BLOCK_ACCEPTED, BLOCK_FORK, BLOCK_GAP,
+                               BLOCK_KNOWN, MINING_REWARD_SENDER, BlockChain,
+                               ChainVerifier, HeaderChainValidator,
+                               InvalidChainError, check_frames,
+                               check_links)
+from uaena.checkpoint import CheckpointStore
+from uaena.difficulty import INITIAL_TARGET, MAX_TARGET, RETARGET_INTERVAL
+from uaena.ledger import Ledger
 from uaena.transaction import Transaction
 
 
@@ -20,6 +37,17 @@ def test_block_chain_balance_of(fx_block_chain: BlockChain):
     assert balance_of('a9596e7414064c778bdc36b76bb2dc2c') == 0.25
 
 
+@typechecked
+def test_block_chain_balance_of_confirmed(fx_block_chain: BlockChain):
+    address = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    assert fx_block_chain.balance_of(address) == 1.25
+    assert fx_block_chain.balance_of(address, include_pending=False) == 1.5
+
+    fx_block_chain.chain = fx_block_chain.chain[:1]
+    assert fx_block_chain.balance_of(address, include_pending=False) == 0
+    assert fx_block_chain.balance_of(address) == -0.25
+
+
 @typechecked
 def test_block_chain_create_genesis_block():
     block_chain = BlockChain()
@@ -84,6 +112,25 @@ def test_block_chain_append_transaction(fx_block_chain: BlockChain):
     assert fx_block_chain.append_transaction(transaction) == 3
     assert len(fx_block_chain.current_transactions) == 2
     assert transaction in fx_block_chain.current_transactions
+    with raises(ValueError):
+        fx_block_chain.append_transaction(transaction)
+    # The pending 0.125 leaves too little for another 0.25.
+    double_spend = Transaction(
+        sender=bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+        recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        amount=decimal.Decimal('0.25'),
+    )
+    with raises(ValueError):
+        fx_block_chain.append_transaction(double_spend)
+    assert len(fx_block_chain.current_transactions) == 2
+
+    reward = Transaction(
+        sender=bytes.fromhex('00000000000000000000000000000000'),
+        recipient=bytes.fromhex('619b9000222b457b978efbca2815d38a'),
+        amount=decimal.Decimal('1'),
+    )
+    with raises(ValueError):
+        fx_block_chain.append_transaction(reward)
 
     invalid_transaction = Transaction(
         sender=bytes.fromhex('00000000000000000000000000000000'),
@@ -140,8 +187,450 @@ def test_block_chain_valid_proof():
     assert not BlockChain.valid_proof(1234, 62593)
     assert BlockChain.valid_proof(1234, 62594)
     assert not BlockChain.valid_proof(1234, 62595)
+    # A proof is valid if its hash is below the target.
+    assert BlockChain.valid_proof(1234, 62593, MAX_TARGET)
+    assert not BlockChain.valid_proof(1234, 62594, 1)
 
 
 @typechecked
 def test_block_chain_proof_of_work():
     assert True
+
+
+@typechecked
+def test_block_chain_valid_chain(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    assert BlockChain.valid_chain(chain)
+    assert not BlockChain.valid_chain([])
+
+    ledger = BlockChain.verify_chain(chain)
+    assert ledger.height == 3
+    assert ledger.confirmed_balance(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    ) == decimal.Decimal('2.5')
+
+    chain[2].proof += 1
+    with raises(InvalidChainError) as e:
+        BlockChain.verify_chain(chain)
+    assert e.value.index == 2
+    assert e.value.reason == 'invalid proof'
+    assert not BlockChain.valid_chain(chain)
+    chain[2].proof -= 1
+
+    # Blocks cannot pick an easier target than the chain expects.
+    chain[2].target = chain[1].target * 2
+    with raises(InvalidChainError) as e:
+        BlockChain.verify_chain(chain)
+    assert e.value.index == 2
+    assert e.value.reason == 'unexpected target'
+
+
+@typechecked
+def test_block_chain_valid_chain_block_version(
+    fx_valid_block_chain: BlockChain,
+):
+    # Blocks hashed over their binary encoding can follow blocks hashed over
+    # JSON.
+    fx_valid_block_chain.block_version = BLOCK_VERSION_BINARY
+    block = fx_valid_block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=fx_valid_block_chain.last_block.timestamp + 15000,
+    )
+    assert block.version == BLOCK_VERSION_BINARY
+    assert BlockChain.valid_chain(fx_valid_block_chain.chain)
+
+    block.version = 255
+    assert not BlockChain.valid_chain(fx_valid_block_chain.chain)
+
+
+@typechecked
+def test_block_chain_accept_block_out_of_range(
+    fx_valid_block_chain: BlockChain,
+):
+    chain = list(fx_valid_block_chain.chain)
+    last = chain[-1]
+    for version, proof in [
+        (BLOCK_VERSION_JSON, 1 << 64),
+        (BLOCK_VERSION_BINARY, -1),
+    ]:
+        block = Block(
+            index=last.index + 1,
+            timestamp=last.timestamp + 15000,
+            proof=proof,
+            previous_hash=last.hash,
+            version=version,
+        )
+        with raises(InvalidChainError) as e:
+            fx_valid_block_chain.accept_block(block)
+        assert e.value.reason == 'field out of range'
+        assert not BlockChain.valid_chain([*chain, block])
+    assert fx_valid_block_chain.chain == chain
+
+
+@typechecked
+def test_block_chain_valid_chain_untargeted():
+    # A chain made before targets were recorded, with blocks a quarter of
+    # the retargeting interval apart, all at the initial target.
+    cache = ProofCache.load()
+    chain = []
+    for position in range(RETARGET_INTERVAL + 2):
+        chain.append(Block(
+            index=position + 1,
+            timestamp=GENESIS_TIMESTAMP + position * 15000,
+            proof=cache.proof(
+                position, chain[-1].proof if chain else 0, INITIAL_TARGET,
+            ),
+            previous_hash=chain[-1].hash if chain else bytes(32),
+        ))
+    assert BlockChain.valid_chain(chain)
+
+    # Blocks that record anything newer are retargeted.
+    chain[RETARGET_INTERVAL].version = BLOCK_VERSION_BINARY
+    chain[RETARGET_INTERVAL + 1].previous_hash = chain[RETARGET_INTERVAL].hash
+    with raises(InvalidChainError) as e:
+        BlockChain.verify_chain(chain)
+    assert e.value.index == RETARGET_INTERVAL
+    assert e.value.reason == 'unexpected target'
+
+
+@typechecked
+def test_block_chain_valid_chain_ordering(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    # Spending the genesis reward before it is mined must fail, even though
+    # the chain as a whole credits the sender enough.
+    transfer = chain[1].transactions[0]
+    chain[0].transactions.insert(0, transfer)
+    del chain[1].transactions[0]
+    with raises(InvalidChainError) as e:
+        BlockChain.verify_chain(chain)
+    assert e.value.index == 0
+    assert e.value.reason == (
+        'sender 5ca60de0575441718094ea0ffcb02aa4 '
+        'does not have sufficient balance'
+    )
+
+
+@typechecked
+def test_chain_verifier(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    hashes, durations, failure = check_links(
+        1, chain[0], None, chain[1:], [chain[0].timestamp],
+    )
+    assert hashes == [block.hash for block in chain[1:]]
+    assert len(durations) == len(chain) - 1
+    assert failure is None
+    hashes, _, failure = check_frames(
+        2, chain[1].encode(), None, [block.encode() for block in chain[2:]],
+        [block.timestamp for block in chain[:2]],
+    )
+    assert hashes == [block.hash for block in chain[2:]]
+    assert failure is None
+
+    verifier = ChainVerifier(workers=2, chunk_size=1, min_pool_length=1)
+    try:
+        ledger = BlockChain.verify_chain(chain, verifier)
+        assert ledger == BlockChain.verify_chain(chain)
+        # The pool is started once, and kept for the runs after.
+        assert verifier.pool() is verifier.pool()
+
+        chain[2].proof += 1
+        with raises(InvalidChainError) as e:
+            BlockChain.verify_chain(chain, verifier)
+        assert e.value.index == 2
+        assert e.value.reason == 'invalid proof'
+        chain[2].proof -= 1
+
+        # The balances are checked in chain order, so an overdraft is
+        # reported before the invalid link a later chunk finds.
+        chain[1] = dataclasses.replace(chain[1], transactions=[
+            dataclasses.replace(
+                chain[1].transactions[0], amount=decimal.Decimal(1000),
+            ),
+            *chain[1].transactions[1:],
+        ])
+        with raises(InvalidChainError) as e:
+            BlockChain.verify_chain(chain, verifier)
+        assert e.value.index == 1
+        assert e.value.reason.endswith('does not have sufficient balance')
+    finally:
+        verifier.close()
+
+
+@typechecked
+def test_block_chain_reorganize(fx_valid_block_chain: BlockChain):
+    ours = fx_valid_block_chain
+    chain = list(ours.chain)
+    bob = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    carol = bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c')
+
+    def branch(length: int, proofs: typing.List[int], recipient: bytes):
+        block_chain = BlockChain(chain=[
+            Block.deserialize(block.serialize()) for block in chain[:length]
+        ])
+        for proof in proofs:
+            block_chain.create_block(
+                proof=proof,
+                reward_recipient=recipient,
+                timestamp=block_chain.last_block.timestamp + 15000,
+            )
+        return block_chain.chain
+
+    def fresh_ledger(chain: typing.List[Block]) -> Ledger:
+        ledger = Ledger()
+        ledger.sync(chain)
+        return ledger
+
+    def nonzero(ledger: Ledger) -> typing.Dict[bytes, decimal.Decimal]:
+        return {a: b for a, b in ledger.confirmed.items() if b}
+
+    # Bob spends the reward of our third block, which a branch of Carol's
+    # mining forks off.
+    ours.append_transaction(
+        Transaction(sender=bob, recipient=carol, amount=decimal.Decimal(2)),
+    )
+    theirs = branch(2, [34234, 114545], carol)
+    # A block whose parent is unknown waits as an orphan.
+    assert ours.accept_block(theirs[3]) == BLOCK_GAP
+    assert ours.chain == chain
+    # Its parent has no more work than our chain, so it goes on a side
+    # branch, and the orphan then gives that branch more work.
+    assert ours.accept_block(theirs[2]) == BLOCK_FORK
+    assert ours.chain == theirs
+    assert not ours.tree.orphans
+    assert list(ours.tree.side) == [chain[2].hash]
+    assert nonzero(ours.ledger) == nonzero(fresh_ledger(theirs))
+    assert ours.balance_of(bob, include_pending=False) == decimal.Decimal(
+        '1.5',
+    )
+    # Bob can no longer afford his spend.
+    assert ours.current_transactions == []
+    assert ours.find_block(chain[2].hash) is None
+
+    # Our old branch overtakes theirs again.
+    ours.append_transaction(
+        Transaction(sender=carol, recipient=bob, amount=decimal.Decimal(1)),
+    )
+    old = branch(3, [183745, 259167], bob)
+    assert ours.accept_block(old[3]) == BLOCK_FORK
+    assert ours.accept_block(old[3]) == BLOCK_KNOWN
+    assert ours.accept_block(old[4]) == BLOCK_ACCEPTED
+    assert ours.chain == old
+    assert set(ours.tree.side) == {theirs[2].hash, theirs[3].hash}
+    assert nonzero(ours.ledger) == nonzero(fresh_ledger(old))
+    assert ours.history(carol) == (0, [])
+    assert ours.current_transactions == []
+    assert BlockChain.valid_chain(ours.chain)
+
+    # A side block that does not link up to its parent is rejected.
+    bogus = dataclasses.replace(theirs[3], proof=theirs[3].proof + 1)
+    with raises(InvalidChainError):
+        ours.accept_block(bogus)
+
+
+@typechecked
+def test_block_chain_reorganize_dropped_reward(
+    fx_valid_block_chain: BlockChain,
+):
+    ours = fx_valid_block_chain
+    chain = list(ours.chain)
+    bob = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    carol = bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c')
+    dave = bytes.fromhex('d8e0dbb8fb8b4a13a1fb0cd62c8b8d3f')
+
+    def mine(block_chain: BlockChain, recipient: bytes) -> None:
+        block_chain.create_block(
+            proof=BlockChain.proof_of_work(block_chain.last_block.proof),
+            reward_recipient=recipient,
+            timestamp=block_chain.last_block.timestamp + 15000,
+        )
+
+    # Dave spends the reward of our fourth block before Bob pays him back.
+    mine(ours, dave)
+    spend = Transaction(sender=dave, recipient=bob, amount=decimal.Decimal(1))
+    refund = Transaction(
+        sender=bob, recipient=dave, amount=decimal.Decimal(1),
+    )
+    ours.append_transaction(spend)
+    ours.append_transaction(refund)
+    theirs = BlockChain(chain=[
+        Block.deserialize(block.serialize()) for block in chain
+    ])
+    mine(theirs, carol)
+    mine(theirs, carol)
+    for block in theirs.chain[3:]:
+        ours.accept_block(block)
+    assert ours.chain == theirs.chain
+    # Dave's spend came before the refund, which cannot cover it.
+    assert ours.balance_of(dave) == 1
+    assert ours.current_transactions == [refund]
+    mine(ours, carol)
+    assert BlockChain.valid_chain(ours.chain)
+
+
+@typechecked
+def test_header_chain_validator(fx_valid_block_chain: BlockChain):
+    headers = [block.header() for block in fx_valid_block_chain.chain]
+    validator = HeaderChainValidator()
+    for header in headers:
+        validator.validate(header)
+    assert validator.position == 3
+    assert validator.last_header == headers[-1]
+
+    for header, reason in [
+        (dataclasses.replace(headers[1], proof=0), 'invalid proof'),
+        (dataclasses.replace(headers[1], index=3), 'index is not sequential'),
+        (
+            dataclasses.replace(headers[1], previous_hash=bytes(32)),
+            'previous_hash does not match',
+        ),
+        (
+            dataclasses.replace(headers[1], version=BLOCK_VERSION_MERKLE),
+            'hash does not match header',
+        ),
+    ]:
+        validator = HeaderChainValidator(position=1, last_header=headers[0])
+        with raises(InvalidChainError) as e:
+            validator.validate(header)
+        assert e.value.index == 1
+        assert e.value.reason == reason
+
+
+@typechecked
+def test_block_chain_checkpoint(
+    tmp_path: pathlib.Path, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    checkpoints = CheckpointStore(tmp_path)
+    block_chain = BlockChain(
+        chain=chain, checkpoints=checkpoints, checkpoint_interval=2,
+    )
+    checkpoint = block_chain.write_checkpoint()
+    assert checkpoint.height == 3
+    assert checkpoint.block_hash == chain[-1].hash
+    assert checkpoints.heights() == [3]
+    block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    )
+    assert block_chain.write_checkpoint() is None
+    assert block_chain.latest_checkpoint() == checkpoint
+
+    # A node restarting from the checkpoint takes the balances from it, and
+    # only replays the blocks after it.
+    recipient = bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c')
+    checkpoints.save(
+        dataclasses.replace(
+            checkpoint,
+            balances={**checkpoint.balances, recipient: decimal.Decimal(7)},
+        ),
+    )
+    restarted = BlockChain(chain=list(chain), checkpoints=checkpoints)
+    assert restarted.balance_of(recipient) == 7
+    assert restarted.ledger.height == 4
+    assert restarted.checkpoint_height == 3
+    # Checkpoints of another chain are ignored.
+    assert BlockChain(
+        chain=list(chain[:2]), checkpoints=checkpoints,
+    ).latest_checkpoint() is None
+
+
+def test_block_chain_concurrent(fx_block: Block):
+    """Writers admitting transactions and creating blocks, and readers
+    streaming the chain and reading balances, all at once.
+
+    """
+    addresses = [
+        bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+        bytes.fromhex('619b9000222b457b978efbca2815d38a'),
+    ]
+    block_chain = BlockChain(chain=[fx_block])
+    client = create_app(block_chain).test_client()
+    amounts = itertools.count(1)
+    accepted = []
+    errors = []
+    done = threading.Event()
+
+    def submit(seed: int):
+        rng = random.Random(seed)
+        for _ in range(500):
+            transaction = Transaction(
+                sender=rng.choice(addresses),
+                recipient=rng.choice(addresses),
+                amount=decimal.Decimal(next(amounts)).scaleb(-8),
+            )
+            try:
+                block_chain.append_transaction(transaction)
+            except ValueError:
+                continue
+            accepted.append(transaction)
+
+    def mine():
+        for i in range(50):
+            block_chain.create_block(
+                proof=i, reward_recipient=addresses[i % len(addresses)],
+            )
+
+    def read():
+        while not done.is_set():
+            data = client.get('/chain/').get_json()
+            chain = [Block.deserialize(block) for block in data['chain']]
+            if len(chain) != data['length'] or any(
+                block.previous_hash != previous.hash
+                for previous, block in zip(chain, chain[1:])
+            ):
+                errors.append(data)
+            for address in addresses:
+                block_chain.balance_of(address)
+
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        threads = [
+            threading.Thread(target=submit, args=(seed,))
+            for seed in range(4)
+        ] + [threading.Thread(target=read) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        mine()
+        for thread in threads[:4]:
+            thread.join()
+        mine()
+        done.set()
+        for thread in threads[4:]:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    assert not errors
+    assert accepted
+    chain = block_chain.chain
+    assert len(chain) == 101
+    # No sender ever spent more than it had, and the ledger and mempool
+    # agree with what they were built from.
+    ledger = Ledger()
+    for block in chain:
+        ledger.apply_block(block)
+        assert all(
+            balance >= 0
+            for address, balance in ledger.confirmed.items()
+            if address != MINING_REWARD_SENDER
+        )
+    assert block_chain.ledger.confirmed == ledger.confirmed
+    pending = {}
+    for transaction in block_chain.current_transactions:
+        Ledger.apply(pending, transaction)
+    assert {a: b for a, b in pending.items() if b} == {
+        a: b for a, b in block_chain.mempool.pending.items() if b
+    }
+    mined = [
+        transaction
+        for block in chain[1:]
+        for transaction in block.transactions
+        if transaction.sender != MINING_REWARD_SENDER
+    ]
+    assert sorted(mined + block_chain.current_transactions,
+                  key=lambda t: t.amount) == \
+        sorted(accepted, key=lambda t: t.amount)
@@ -1,6 +1,13 @@
+import dataclasses
+import hashlib
+
+from pytest import raises
 from typeguard import typechecked
 
-from uaena.block import Block
+from uaena.block import (BLOCK_VERSION_BINARY, BLOCK_VERSION_MERKLE, Block,
+                         BlockHeader, verify_inclusion)
+from uaena.difficulty import INITIAL_TARGET
+from uaena.transaction import Transaction
 
 
 @typechecked
@@ -41,3 +48,100 @@ def test_block_deserialize(fx_block: Block):
 def test_block_hash(fx_block: Block):
     fx_block.timestamp = 737511503930
     assert fx_block.hash == bytes.fromhex('d9e66af21d6df26348b872c52ed4b7d054148aa5ce10d070c2463e4d59bd41bc')  # noqa
+
+
+@typechecked
+def test_block_hash_cached(fx_block: Block):
+    block_hash = fx_block.hash
+    assert fx_block._hash == block_hash
+    fx_block.proof = 2
+    assert fx_block._hash is None
+    assert fx_block.hash != block_hash
+
+
+@typechecked
+def test_block_version(fx_block: Block):
+    json_hash = fx_block.hash
+    fx_block.version = BLOCK_VERSION_BINARY
+    assert fx_block.serialize()['version'] == BLOCK_VERSION_BINARY
+    assert Block.deserialize(fx_block.serialize()) == fx_block
+    assert fx_block.hash == hashlib.sha256(fx_block.encode()).digest()
+    assert fx_block.hash != json_hash
+
+    fx_block.version = 255
+    with raises(ValueError):
+        fx_block.hash
+
+
+@typechecked
+def test_block_merkle(fx_block: Block, fx_transaction: Transaction):
+    fx_block.transactions.append(fx_transaction)
+    fx_block.version = BLOCK_VERSION_MERKLE
+    header = fx_block.encode_header()
+    assert fx_block.hash == hashlib.sha256(header).digest()
+    assert header.endswith(fx_block.merkle_root)
+
+    proof = fx_block.prove(1)
+    assert verify_inclusion(fx_block.hash, header, fx_transaction, proof)
+    assert not verify_inclusion(
+        fx_block.hash, header, fx_block.transactions[0], proof,
+    )
+    assert not verify_inclusion(bytes(32), header, fx_transaction, proof)
+    # A header of another version does not commit to the transactions.
+    header = bytes([BLOCK_VERSION_BINARY]) + header[1:]
+    assert not verify_inclusion(
+        hashlib.sha256(header).digest(), header, fx_transaction, proof,
+    )
+
+
+@typechecked
+def test_block_header(fx_block: Block):
+    header = fx_block.header()
+    assert header.hash == fx_block.hash
+    assert header.transactions_digest == fx_block.merkle_root
+    assert header.transaction_count == 1
+    assert BlockHeader.deserialize(header.serialize()) == header
+    # Only headers of blocks hashed over their header prove their hash.
+    assert header.valid_hash()
+    fx_block.version = BLOCK_VERSION_MERKLE
+    header = fx_block.header()
+    assert header.valid_hash()
+    assert not dataclasses.replace(header, proof=2).valid_hash()
+
+
+@typechecked
+def test_block_encode(fx_block: Block):
+    assert fx_block.encode() == bytes.fromhex(
+        '01'
+        '0000000000000001'
+        '000000abb71c783a'
+        '0000000000000001'
+        '20' + '00' * 32 +
+        '00000001'
+        '10' '00000000000000000000000000000000'
+        '10' '5ca60de0575441718094ea0ffcb02aa4'
+        '01' '31'
+    )
+    for field, value in [('index', -1), ('proof', 1 << 64)]:
+        block = dataclasses.replace(
+            fx_block, version=BLOCK_VERSION_BINARY, **{field: value},
+        )
+        with raises(ValueError):
+            block.encode()
+        with raises(ValueError):
+            block.hash
+
+
+@typechecked
+def test_block_target(fx_block: Block):
+    # Blocks of the initial target hash and serialize as before targets.
+    initial_hash = fx_block.hash
+    assert 'target' not in fx_block.serialize()
+    fx_block.target = INITIAL_TARGET // 2
+    assert fx_block.hash != initial_hash
+    assert fx_block.serialize()['target'] == '000080' + '00' * 29
+    assert fx_block.encode().endswith(b'\x00\x00\x80' + bytes(29))
+    block = Block.deserialize(fx_block.serialize())
+    assert block.target == INITIAL_TARGET // 2
+    assert block.hash == fx_block.hash
+    assert fx_block.header().target == INITIAL_TARGET // 2
@@ -0,0 +1,62 @@
+import decimal
+import json
+import pathlib
+
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.checkpoint import Checkpoint, CheckpointStore
+
+
+@typechecked
+def test_checkpoint(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    checkpoint = Checkpoint(
+        height=3,
+        block_hash=chain[-1].hash,
+        balances=dict(fx_valid_block_chain.ledger.confirmed),
+    )
+    data = checkpoint.serialize()
+    assert Checkpoint.deserialize(data) == Checkpoint(
+        height=3,
+        block_hash=chain[-1].hash,
+        balances={
+            address: balance
+            for address, balance in checkpoint.balances.items() if balance
+        },
+    )
+    # Zero balances do not change the hash.
+    assert Checkpoint(
+        height=3,
+        block_hash=chain[-1].hash,
+        balances={**checkpoint.balances, bytes(16 * [1]): decimal.Decimal()},
+    ).hash == checkpoint.hash
+
+    tampered = json.loads(json.dumps(data))
+    tampered['balances']['5ca60de0575441718094ea0ffcb02aa4'] = '100'
+    with raises(ValueError):
+        Checkpoint.deserialize(tampered)
+    with raises(ValueError):
+        Checkpoint.deserialize({'height': 3})
+
+
+@typechecked
+def test_checkpoint_store(tmp_path: pathlib.Path):
+    store = CheckpointStore(tmp_path, keep=2)
+    checkpoints = [
+        Checkpoint(
+            height=height,
+            block_hash=bytes([height]) * 32,
+            balances={bytes(16): decimal.Decimal(height)},
+        )
+        for height in (10, 20, 30)
+    ]
+    for checkpoint in checkpoints:
+        store.save(checkpoint)
+    assert store.heights() == [30, 20]
+    assert list(store) == checkpoints[:0:-1]
+    assert store.load(10) is None
+
+    store.checkpoint_path(30).write_text('{"height": 30')
+    assert list(CheckpointStore(tmp_path)) == [checkpoints[1]]
@@ -1,9 +1,14 @@
 import datetime
 import decimal
+import threading
+import typing
 
+from flask import Flask
 from pytest import fixture
 from typeguard import typechecked
+from werkzeug.serving import make_server
 
+from app import create_app
 from uaena.block import Block
 from uaena.block_chain import BlockChain
 from uaena.transaction import Transaction
@@ -73,3 +78,57 @@ def fx_block_chain(
         ),
     )
     return block_chain
+
+
+@fixture
+@typechecked
+def fx_valid_block_chain(fx_block: Block) -> BlockChain:
+    """A chain of three blocks with real proofs of work."""
+    block_chain = BlockChain()
+    block_chain.create_genesis_block(
+        reward_recipient=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+        timestamp=fx_block.timestamp,
+    )
+    block_chain.append_transaction(
+        Transaction(
+            sender=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+            recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+            amount=decimal.Decimal('0.5'),
+        ),
+    )
+    # BlockChain.proof_of_work(1) and BlockChain.proof_of_work(72608)
+    for proof in (72608, 24348):
+        block_chain.create_block(
+            proof=proof,
+            reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+            timestamp=block_chain.last_block.timestamp + 15000,
+        )
+    return block_chain
+
+
+@fixture
+def fx_serve() -> typing.Iterator[typing.Callable[[Flask], str]]:
+    """Serves Flask apps on local ports, returning their ``host:port``
+    node addresses.
+
+    """
+    servers = []
+
+    def serve(app: Flask) -> str:
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f'127.0.0.1:{server.server_port}'
+
+    yield serve
+    for server in servers:
+        server.shutdown()
+
+
+@fixture
+@typechecked
+def fx_app(fx_valid_block_chain: BlockChain) -> Flask:
+    return create_app(
+        fx_valid_block_chain,
+        node_identifier='619b9000222b457b978efbca2815d38a',
+    )
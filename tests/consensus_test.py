@@ -0,0 +1,269 @@
+import decimal
+import pathlib
+import time
+import typing
+
+from flask import Flask, jsonify, request
+from pytest import mark, raises
+from typeguard import typechecked
+
+from app import create_app
+from uaena.block import Block
+from uaena.block_chain import (SYNC_BLOCKS, SYNC_HEADERS_FIRST, BlockChain,
+                               InvalidChainError)
+from uaena.checkpoint import CheckpointStore
+from uaena.consensus import PeerClient
+from uaena.storage import BlockStore
+from uaena.transaction import Transaction
+
+
+def stand_in_node(
+    chain: typing.List[Block],
+    delay: float=0,
+    failures: int=0,
+) -> Flask:
+    """A node that advertises the length of ``chain`` after ``delay``
+    seconds and ``failures`` server errors.
+
+    """
+    app = Flask(__name__)
+    hits = []
+
+    @app.route('/chain/length/')
+    def chain_length():
+        hits.append(request.path)
+        time.sleep(delay)
+        if len(hits) <= failures:
+            return 'Service Unavailable', 503
+        return jsonify({'length': len(chain)})
+
+    return app
+
+
+def copy_chain(chain: typing.List[Block]) -> typing.List[Block]:
+    return [Block.deserialize(block.serialize()) for block in chain]
+
+
+@typechecked
+def test_peer_client_fetch_lengths(
+    fx_serve, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    fast = fx_serve(stand_in_node(chain))
+    slow = fx_serve(stand_in_node(chain, delay=1))
+    flaky = fx_serve(stand_in_node(chain, failures=1))
+    client = PeerClient(timeout=0.5, deadline=0.8, backoff=0.01)
+    started = time.monotonic()
+    lengths = client.fetch_lengths(
+        [fast, slow, flaky, '127.0.0.1:1'], time.monotonic() + client.deadline,
+    )
+    assert time.monotonic() - started < 1
+    assert lengths == {fast: 3, flaky: 3}
+
+
+@mark.parametrize('binary', [True, False])
+@typechecked
+def test_peer_client_fetch_blocks(
+    fx_serve, fx_valid_block_chain: BlockChain, binary: bool,
+):
+    chain = fx_valid_block_chain.chain
+    node = fx_serve(create_app(BlockChain(chain=copy_chain(chain))))
+    client = PeerClient(binary=binary)
+    deadline_at = time.monotonic() + 5
+    assert client.fetch_blocks(node, 1, deadline_at) == chain[1:]
+    assert client.fetch_blocks(node, 0, deadline_at, limit=1) == chain[:1]
+
+
+@typechecked
+def test_block_chain_resolve_conflicts(
+    fx_serve, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    block_chain = BlockChain(chain=copy_chain(chain[:2]))
+    short_app = create_app(BlockChain(chain=copy_chain(chain[:1])))
+    short_paths = []
+    short_app.before_request(lambda: short_paths.append(request.path))
+    short = fx_serve(short_app)
+    invalid_chain = copy_chain(chain) + copy_chain(chain[2:])
+    lying = fx_serve(create_app(BlockChain(chain=invalid_chain)))
+    longest = fx_serve(create_app(BlockChain(chain=copy_chain(chain))))
+    block_chain.nodes = {short, lying, longest}
+
+    assert block_chain.resolve_conflicts()
+    assert block_chain.chain == chain
+    assert block_chain.balance_of(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    ) == 2.5
+    # The peer with a shorter chain is never asked for its blocks.
+    assert short_paths == ['/chain/length/']
+
+    assert not block_chain.resolve_conflicts()
+
+
+@mark.parametrize('sync_mode, sync_paths', [
+    (
+        SYNC_HEADERS_FIRST,
+        ['/chain/headers/?from=2&to=4', '/chain/blocks/?from=2&limit=2'],
+    ),
+    (SYNC_BLOCKS, ['/chain/blocks/?from=2']),
+])
+@typechecked
+def test_block_chain_sync_with(
+    fx_serve,
+    fx_valid_block_chain: BlockChain,
+    sync_mode: str,
+    sync_paths: typing.List[str],
+):
+    chain = fx_valid_block_chain.chain
+    reward_recipient = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    # Our chain forks from the peer's after the second block.
+    ours = BlockChain(chain=copy_chain(chain[:2]), sync_mode=sync_mode)
+    mined = Transaction(
+        sender=reward_recipient,
+        recipient=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+        amount=decimal.Decimal('0.25'),
+    )
+    ours.append_transaction(mined)
+    ours.create_block(
+        proof=24348,
+        reward_recipient=bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+        timestamp=chain[2].timestamp + 1,
+    )
+    # Spends the reward of the block the peer's chain replaces.
+    ours.append_transaction(
+        Transaction(
+            sender=bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+            recipient=reward_recipient,
+            amount=decimal.Decimal('1'),
+        ),
+    )
+    theirs = BlockChain(chain=copy_chain(chain))
+    theirs.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=reward_recipient,
+        timestamp=chain[2].timestamp + 15000,
+    )
+    paths = []
+    app = create_app(theirs)
+    app.before_request(lambda: paths.append(request.full_path))
+    node = fx_serve(app)
+    deadline_at = time.monotonic() + 5
+
+    assert ours.common_prefix_length(node, 4, deadline_at) == 2
+    paths.clear()
+    assert ours.sync_with(node, 4, deadline_at)
+    assert ours.chain == theirs.chain
+    assert paths == ['/chain/headers/?from=0&to=3', *sync_paths]
+    # The transaction of our dropped block is pending again, and the spend
+    # of its reward is gone.
+    assert ours.current_transactions == [mined]
+    assert ours.balance_of(reward_recipient, include_pending=False) == 3.5
+    assert ours.balance_of(
+        bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c'),
+    ) == 0
+    assert ours.ledger.height == 4
+    # The block we dropped is no longer indexed; the peer's blocks are.
+    assert ours.find_block(theirs.chain[3].hash) == (3, ours.chain[3])
+    assert ours.history(bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c')) \
+        == (0, [])
+
+    # Nothing to fetch from a peer that is not ahead of us.
+    assert not ours.sync_with(node, 4, deadline_at)
+
+
+@typechecked
+def test_block_chain_sync_with_bogus_headers(
+    fx_serve, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    ours = BlockChain(chain=copy_chain(chain))
+    # A long chain whose fourth block does not carry a valid proof.
+    bogus = copy_chain(chain)
+    for i in range(100):
+        bogus.append(
+            Block(
+                index=len(bogus) + 1,
+                timestamp=bogus[-1].timestamp + 15000,
+                proof=i,
+                previous_hash=bogus[-1].hash,
+                transactions=[fx_valid_block_chain.chain[0].transactions[0]],
+            ),
+        )
+    paths = []
+    app = create_app(BlockChain(chain=bogus))
+    app.before_request(lambda: paths.append(request.path))
+    node = fx_serve(app)
+
+    assert not ours.sync_with(node, len(bogus), time.monotonic() + 5)
+    # The headers gave the chain away; no block was downloaded.
+    assert '/chain/blocks/' not in paths
+    assert ours.chain == chain
+
+
+@typechecked
+def test_block_chain_bootstrap(
+    fx_serve, monkeypatch, tmp_path: pathlib.Path,
+    fx_valid_block_chain: BlockChain,
+):
+    theirs = BlockChain(
+        chain=copy_chain(fx_valid_block_chain.chain),
+        checkpoints=CheckpointStore(tmp_path / 'theirs'),
+        checkpoint_interval=3,
+    )
+    checkpoint = theirs.write_checkpoint()
+    theirs.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=theirs.last_block.timestamp + 15000,
+    )
+    node = fx_serve(create_app(theirs))
+    deadline_at = time.monotonic() + 5
+
+    ours = BlockChain()
+    assert not ours.bootstrap(node, bytes(32), deadline_at)
+    assert ours.bootstrap(node, checkpoint.hash, deadline_at)
+    # Only the headers of the blocks before the checkpoint are kept.
+    assert ours.pruned_height == 2
+    assert ours.chain[:2] == [block.header() for block in theirs.chain[:2]]
+    assert ours.chain[2:] == theirs.chain[2:]
+    assert ours.ledger.height == 4
+    assert ours.ledger.confirmed == {
+        address: balance
+        for address, balance in theirs.ledger.confirmed.items() if balance
+    }
+    with raises(ValueError):
+        ours.bootstrap(node, checkpoint.hash, deadline_at)
+    # Nothing before the checkpoint can be reorganized.
+    with ours.chain_lock, raises(InvalidChainError):
+        ours.reorganize(ours.chain, 1, copy_chain(theirs.chain[1:]))
+
+    client = create_app(ours).test_client()
+    assert client.get('/chain/blocks/?from=1').status_code == 404
+    assert client.get('/chain/blocks/0/').status_code == 404
+    response = client.get('/chain/')
+    assert response.status_code == 200
+    assert [block['index'] for block in response.get_json()['chain']] == [
+        3, 4,
+    ]
+    response = client.get('/chain/headers/?from=0')
+    assert len(response.get_json()['headers']) == 4
+
+    # A node is bootstrapped when it starts, and restarts from its store.
+    monkeypatch.setenv('UAENA_BOOTSTRAP_NODE', node)
+    monkeypatch.setenv('UAENA_BOOTSTRAP_CHECKPOINT', checkpoint.hash.hex())
+    monkeypatch.setenv('UAENA_STORE_PATH', str(tmp_path / 'store'))
+    monkeypatch.setenv('UAENA_CHECKPOINT_PATH', str(tmp_path / 'ours'))
+    started = create_app().config['BLOCK_CHAIN']
+    assert started.chain == ours.chain
+    assert node in started.nodes
+    restarted = BlockChain(
+        store=BlockStore(tmp_path / 'store'),
+        checkpoints=CheckpointStore(tmp_path / 'ours'),
+    )
+    assert restarted.pruned_height == 2
+    assert restarted.chain == ours.chain
+    assert restarted.balance_of(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    ) == ours.balance_of(bytes.fromhex('33ee49f83681417e82660cb9585d13b1'))
+    with raises(ValueError):
+        BlockChain(store=BlockStore(tmp_path / 'store'))
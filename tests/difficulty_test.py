@@ -0,0 +1,55 @@
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.difficulty import (INITIAL_TARGET, MAX_ADJUSTMENT, MAX_TARGET,
+                              RETARGET_INTERVAL, TARGET_BLOCK_INTERVAL,
+                              expected_target, target_bytes)
+
+
+def timestamps(interval: int) -> list:
+    return [i * interval for i in range(RETARGET_INTERVAL)]
+
+
+@typechecked
+def test_target_bytes():
+    assert target_bytes(INITIAL_TARGET) == b'\x00\x01' + bytes(30)
+    assert target_bytes(MAX_TARGET) == b'\xff' * 32
+    assert target_bytes(1) == bytes(31) + b'\x01'
+
+
+@typechecked
+def test_expected_target():
+    assert expected_target(0, 12345, []) == INITIAL_TARGET
+    # The target is kept between retargets, whatever the timestamps.
+    assert expected_target(1, 12345, []) == 12345
+    assert expected_target(RETARGET_INTERVAL - 1, 12345, [0, 1]) == 12345
+    # Blocks that came on time keep it at a retarget too.
+    assert expected_target(
+        RETARGET_INTERVAL, INITIAL_TARGET, timestamps(TARGET_BLOCK_INTERVAL),
+    ) == INITIAL_TARGET
+    # Blocks that came twice as fast halve it, and twice as slow double it.
+    assert expected_target(
+        RETARGET_INTERVAL * 3, INITIAL_TARGET,
+        timestamps(TARGET_BLOCK_INTERVAL // 2),
+    ) == INITIAL_TARGET // 2
+    assert expected_target(
+        RETARGET_INTERVAL, INITIAL_TARGET,
+        timestamps(TARGET_BLOCK_INTERVAL * 2),
+    ) == INITIAL_TARGET * 2
+    with raises(ValueError):
+        expected_target(RETARGET_INTERVAL, INITIAL_TARGET, [0, 1])
+
+
+@typechecked
+def test_expected_target_clamped():
+    assert expected_target(
+        RETARGET_INTERVAL, INITIAL_TARGET, [0] * RETARGET_INTERVAL,
+    ) == INITIAL_TARGET // MAX_ADJUSTMENT
+    assert expected_target(
+        RETARGET_INTERVAL, INITIAL_TARGET,
+        timestamps(TARGET_BLOCK_INTERVAL * 100),
+    ) == INITIAL_TARGET * MAX_ADJUSTMENT
+    assert expected_target(
+        RETARGET_INTERVAL, MAX_TARGET, timestamps(TARGET_BLOCK_INTERVAL * 2),
+    ) == MAX_TARGET
+    assert expected_target(RETARGET_INTERVAL, 1, [0] * RETARGET_INTERVAL) == 1
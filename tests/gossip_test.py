@@ -0,0 +1,163 @@
+import dataclasses
+import threading
+import time
+import typing
+
+from flask import Flask, jsonify, request
+from pytest import raises
+from typeguard import typechecked
+
+from app import create_app
+from uaena.block_chain import (BLOCK_ACCEPTED, BLOCK_FORK, BLOCK_GAP,
+                               BLOCK_KNOWN, BlockChain, InvalidChainError)
+from uaena.gossip import Gossip
+
+from .consensus_test import copy_chain
+
+
+def wait_until(condition: typing.Callable[[], bool], timeout: float=5) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def mine_next(block_chain: BlockChain) -> None:
+    block_chain.create_block(
+        proof=183745,  # BlockChain.proof_of_work(24348)
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=block_chain.last_block.timestamp + 15000,
+    )
+
+
+@typechecked
+def test_gossip_relay(fx_serve, fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    block_chains = [BlockChain(chain=copy_chain(chain)) for _ in range(3)]
+    paths = []
+    nodes = []
+    for block_chain in block_chains:
+        app = create_app(block_chain)
+        app.before_request(lambda: paths.append(request.path))
+        nodes.append(fx_serve(app))
+    # A ring: every node only knows the next one.
+    for block_chain, node in zip(block_chains, nodes[1:] + nodes[:1]):
+        block_chain.nodes = {node}
+
+    mine_next(block_chains[0])
+    assert wait_until(
+        lambda: all(len(bc.chain) == 4 for bc in block_chains),
+    )
+    assert all(bc.chain == block_chains[0].chain for bc in block_chains)
+    # The block went around the ring once, and no node had to sync.
+    assert wait_until(lambda: len(paths) == 3)
+    assert paths == ['/chain/announce/'] * 3
+
+
+@typechecked
+def test_gossip_gap(fx_serve, fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    ahead = BlockChain(chain=copy_chain(chain))
+    behind = BlockChain(chain=copy_chain(chain[:2]))
+    ahead_node = fx_serve(create_app(ahead))
+    behind_node = fx_serve(create_app(behind))
+    ahead.nodes = {behind_node}
+    behind.nodes = {ahead_node}
+
+    mine_next(ahead)
+    # The node behind cannot append the block, and syncs with its peers.
+    assert wait_until(lambda: len(behind.chain) == 4)
+    assert behind.chain == ahead.chain
+
+
+@typechecked
+def test_gossip_receive(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    theirs = BlockChain(chain=copy_chain(chain))
+    mine_next(theirs)
+    ours = BlockChain(chain=copy_chain(chain))
+    gossip = Gossip(ours)
+
+    block = theirs.chain[-1]
+    assert gossip.receive(block) == BLOCK_ACCEPTED
+    assert ours.chain == theirs.chain
+    assert ours.balance_of(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    ) == theirs.balance_of(bytes.fromhex('33ee49f83681417e82660cb9585d13b1'))
+    # Repeated announcements are dropped before they reach the chain.
+    assert gossip.receive(block) == BLOCK_KNOWN
+    assert ours.accept_block(block) == BLOCK_KNOWN
+
+    mine_next(theirs)
+    mine_next(theirs)
+    assert ours.accept_block(theirs.chain[-1]) == BLOCK_GAP
+    rival = dataclasses.replace(block, timestamp=block.timestamp + 1)
+    assert ours.accept_block(rival) == BLOCK_FORK
+    bogus = copy_chain(theirs.chain[-2:-1])[0]
+    bogus.proof += 1
+    with raises(InvalidChainError):
+        gossip.receive(bogus)
+    assert len(ours.chain) == 4
+
+
+@typechecked
+def test_gossip_resolve(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    theirs = BlockChain(chain=copy_chain(chain))
+    for _ in range(3):
+        mine_next(theirs)
+    ours = BlockChain(chain=copy_chain(chain))
+    resolved = []
+    ours.resolve_conflicts = lambda: resolved.append(True) or False
+    gossip = Gossip(ours)
+
+    # A block past our tip whose parent we lack starts a resolution in the
+    # background, and another one only after the interval.
+    assert gossip.receive(theirs.chain[-1]) == BLOCK_GAP
+    assert wait_until(lambda: resolved == [True])
+    assert gossip.receive(theirs.chain[-2]) == BLOCK_GAP
+    assert gossip.resolve() is None
+    gossip.resolved_at -= gossip.resolve_interval
+    assert gossip.resolve().result() is False
+    assert resolved == [True, True]
+
+    # Orphans that do not lead past our tip start none.
+    gossip.resolved_at -= gossip.resolve_interval
+    started_at = gossip.resolved_at
+    rival = dataclasses.replace(chain[1], previous_hash=bytes(32))
+    assert gossip.receive(rival) == BLOCK_GAP
+    assert gossip.resolved_at == started_at
+    assert resolved == [True, True]
+
+
+@typechecked
+def test_gossip_bounded_fan_out(fx_serve, fx_valid_block_chain: BlockChain):
+    lock = threading.Lock()
+    running = []
+    peaks = []
+
+    def stand_in_node() -> Flask:
+        app = Flask(__name__)
+
+        @app.route('/chain/announce/', methods=['POST'])
+        def announce():
+            with lock:
+                running.append(None)
+                peaks.append(len(running))
+            time.sleep(0.1)
+            with lock:
+                running.pop()
+            return jsonify({'outcome': BLOCK_ACCEPTED})
+
+        return app
+
+    fx_valid_block_chain.nodes = {
+        fx_serve(stand_in_node()) for _ in range(6)
+    }
+    gossip = Gossip(fx_valid_block_chain, max_workers=2)
+    futures = gossip.announce(fx_valid_block_chain.last_block)
+    assert [future.result(timeout=5) for future in futures] == \
+        [BLOCK_ACCEPTED] * 6
+    assert max(peaks) == 2
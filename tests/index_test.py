@@ -0,0 +1,72 @@
+import dataclasses
+import decimal
+
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.difficulty import INITIAL_TARGET, block_work
+from uaena.index import ChainIndex
+from uaena.transaction import Transaction
+
+
+@typechecked
+def test_chain_index_sync(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    index = ChainIndex()
+    index.sync(chain[:2])
+    assert index.height == 2
+    index.sync(chain)
+    assert index.height == 3
+    assert index.by_address == {
+        bytes(16): [(0, 0), (1, 1), (2, 0)],
+        bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'): [(0, 0), (1, 0)],
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'): [
+            (1, 0), (1, 1), (2, 0),
+        ],
+    }
+    assert index.by_hash == {
+        block.hash: position for position, block in enumerate(chain)
+    }
+    assert index.history(
+        chain, bytes.fromhex('33ee49f83681417e82660cb9585d13b1'), 1, 1,
+    ) == (3, [(1, 1)])
+    assert index.history(chain, bytes.fromhex('ff' * 16)) == (0, [])
+    assert index.position(chain, chain[2].hash) == 2
+    assert index.position(chain, bytes(32)) is None
+    assert index.work(chain, 0) == 0
+    assert index.work(chain, 3) == 3 * block_work(INITIAL_TARGET)
+
+
+@typechecked
+def test_chain_index_sync_fork(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    index = ChainIndex()
+    index.sync(chain)
+    # A chain forking from ours after the second block, where a transfer
+    # to oneself takes the place of the third.
+    address = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    fork = chain[:2] + [
+        dataclasses.replace(
+            chain[2],
+            transactions=[
+                Transaction(
+                    sender=address,
+                    recipient=address,
+                    amount=decimal.Decimal('1'),
+                ),
+            ],
+        ),
+    ]
+    index.sync(fork)
+    fresh = ChainIndex()
+    fresh.sync(fork)
+    assert index == fresh
+    assert index.by_address[address] == [(1, 0), (1, 1), (2, 0)]
+    assert bytes(16) in index.by_address
+    assert chain[2].hash not in index.by_hash
+
+    # Shorter chains are unindexed down to their length.
+    index.sync(chain[:1])
+    fresh = ChainIndex()
+    fresh.sync(chain[:1])
+    assert index == fresh
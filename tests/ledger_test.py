@@ -0,0 +1,41 @@
+import decimal
+
+from typeguard import typechecked
+
+from uaena.block import Block
+from uaena.ledger import Ledger
+from uaena.transaction import Transaction
+
+
+@typechecked
+def test_ledger_sync(fx_block: Block, fx_transaction: Transaction):
+    ledger = Ledger()
+    chain = [fx_block]
+    ledger.sync(chain)
+    sender = bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4')
+    recipient = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+    assert ledger.height == 1
+    assert ledger.confirmed_balance(sender) == 1
+    assert ledger.confirmed_balance(recipient) == 0
+
+    block = Block(
+        index=2,
+        timestamp=fx_block.timestamp + 15000,
+        proof=1111,
+        previous_hash=fx_block.hash,
+        transactions=[fx_transaction],
+    )
+    chain.append(block)
+    ledger.sync(chain)
+    assert ledger.height == 2
+    assert ledger.confirmed_balance(sender) == decimal.Decimal('0.5')
+    assert ledger.confirmed_balance(recipient) == decimal.Decimal('0.5')
+
+
+@typechecked
+def test_ledger_sync_rebuild(fx_block: Block, fx_transaction: Transaction):
+    ledger = Ledger()
+    ledger.sync([fx_block])
+    ledger.sync([])
+    assert ledger.height == 0
+    assert ledger.confirmed == {}
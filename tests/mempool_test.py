@@ -0,0 +1,95 @@
+import decimal
+
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.mempool import Mempool
+from uaena.transaction import Transaction
+
+alice = bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4')
+bob = bytes.fromhex('33ee49f83681417e82660cb9585d13b1')
+carol = bytes.fromhex('a9596e7414064c778bdc36b76bb2dc2c')
+
+
+def confirmed(address: bytes) -> decimal.Decimal:
+    return decimal.Decimal(1 if address == alice else 0)
+
+
+def transfer(sender: bytes, recipient: bytes, amount: str) -> Transaction:
+    return Transaction(
+        sender=sender, recipient=recipient, amount=decimal.Decimal(amount),
+    )
+
+
+@typechecked
+def test_mempool_add(fx_transaction: Transaction):
+    mempool = Mempool()
+    mempool.add(fx_transaction, confirmed)
+    assert list(mempool) == [fx_transaction]
+    assert fx_transaction in mempool
+    assert mempool.pending_balance(alice) == decimal.Decimal('-0.5')
+    assert mempool.pending_balance(bob) == decimal.Decimal('0.5')
+    with raises(ValueError):
+        mempool.add(
+            transfer(fx_transaction.sender, fx_transaction.recipient, '0.5'),
+            confirmed,
+        )
+    assert len(mempool) == 1
+
+    mempool.remove(fx_transaction.hash)
+    assert not mempool
+    assert mempool.pending == {}
+    assert mempool.by_sender == {}
+
+
+def test_mempool_evict():
+    mempool = Mempool(max_size=3)
+    funding = transfer(alice, bob, '1')
+    spend = transfer(bob, carol, '0.5')
+    mempool.add(funding, confirmed)
+    mempool.add(spend, confirmed)
+    mempool.add(transfer(carol, alice, '0.5'), confirmed)
+    # Evicting the funding of bob's spend takes the spend, and the spend
+    # that carol made out of it, along.
+    mempool.add(transfer(alice, carol, '0.25'), confirmed)
+    assert list(mempool) == [transfer(alice, carol, '0.25')]
+    assert mempool.pending_balance(bob) == 0
+
+    mempool = Mempool(max_size=1)
+    mempool.add(funding, confirmed)
+    mempool.add(transfer(alice, carol, '0.5'), confirmed)
+    assert list(mempool) == [transfer(alice, carol, '0.5')]
+
+
+def test_mempool_select():
+    mempool = Mempool(max_block_transactions=2)
+    transactions = [transfer(alice, bob, f'0.{i}') for i in range(1, 4)]
+    for transaction in transactions:
+        mempool.add(transaction, confirmed)
+    assert mempool.select() == transactions[:2]
+    assert mempool.clear() == transactions
+    assert mempool.select() == []
+
+
+@typechecked
+def test_mempool_reorganize():
+    mempool = Mempool()
+    # Bob spends what Alice sent him in a block the chain then drops.
+    sent = transfer(alice, bob, '1')
+    spent = transfer(bob, carol, '1')
+    kept = transfer(alice, carol, '0.5')
+    mempool.add(spent, lambda address: decimal.Decimal(address == bob))
+    mempool.add(kept, confirmed)
+    mempool.reorganize([sent], [kept], {alice, bob}, confirmed)
+    # The dropped transaction goes back in first, so every prefix of the
+    # pool stays affordable, and the one the new blocks include leaves.
+    assert list(mempool) == [sent, spent]
+    assert mempool.pending_balance(bob) == 0
+
+    # Alice's funds are gone in the chain switched to next, and so are the
+    # transactions that depended on them.
+    mempool.reorganize(
+        [], [], {alice}, lambda address: decimal.Decimal(),
+    )
+    assert not mempool
+    assert mempool.pending == {}
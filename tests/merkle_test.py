@@ -0,0 +1,63 @@
+import decimal
+
+from pytest import mark, raises
+from typeguard import typechecked
+
+from uaena.merkle import (EMPTY_ROOT, MerkleProof, leaf_hash, merkle_root,
+                          node_hash)
+from uaena.transaction import Transaction
+
+
+def transactions(count: int) -> list:
+    return [
+        Transaction(
+            sender=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+            recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+            amount=decimal.Decimal(i + 1),
+        )
+        for i in range(count)
+    ]
+
+
+@typechecked
+def test_merkle_root():
+    a, b, c = transactions(3)
+    assert merkle_root([]) == EMPTY_ROOT
+    assert merkle_root([a]) == leaf_hash(a)
+    assert merkle_root([a, b]) == node_hash(leaf_hash(a), leaf_hash(b))
+    # The odd one out is carried up rather than paired with itself.
+    assert merkle_root([a, b, c]) == node_hash(
+        node_hash(leaf_hash(a), leaf_hash(b)), leaf_hash(c),
+    )
+    assert merkle_root([a, b, c]) != merkle_root([a, b, c, c])
+
+
+@mark.parametrize('count', [1, 2, 3, 5, 8, 13])
+def test_merkle_proof(count: int):
+    items = transactions(count)
+    root = merkle_root(items)
+    for position, transaction in enumerate(items):
+        proof = MerkleProof.build(items, position)
+        assert len(proof.siblings) <= count.bit_length()
+        assert proof.verify(transaction, root)
+        assert MerkleProof.deserialize(proof.serialize()) == proof
+        other = items[(position + 1) % count]
+        assert count == 1 or not proof.verify(other, root)
+
+
+@typechecked
+def test_merkle_proof_invalid():
+    items = transactions(5)
+    root = merkle_root(items)
+    proof = MerkleProof.build(items, 4)
+    assert not MerkleProof(
+        position=4, count=6, siblings=proof.siblings,
+    ).verify(items[4], root)
+    assert not MerkleProof(
+        position=4, count=5, siblings=[*proof.siblings, root],
+    ).verify(items[4], root)
+    assert not MerkleProof(
+        position=4, count=5, siblings=proof.siblings[1:],
+    ).verify(items[4], root)
+    with raises(ValueError):
+        MerkleProof.build(items, 5)
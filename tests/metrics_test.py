@@ -0,0 +1,76 @@
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.metrics import (BALANCE_SECONDS, BLOCK_VALIDATION_SECONDS,
+                           CHAIN_VALIDATION_SECONDS, MINING_ATTEMPTS,
+                           MINING_HASHES, Counter, Gauge, Histogram, Registry)
+
+
+@typechecked
+def test_registry_render():
+    registry = Registry()
+    counter = registry.register(Counter('calls_total', 'Calls.'))
+    gauge = registry.register(Gauge('rate', 'Rate.'))
+    histogram = registry.register(
+        Histogram(
+            'latency_seconds', 'Latency.', buckets=(0.1, 1.0),
+            labels=('route',),
+        ),
+    )
+    counter.inc()
+    counter.inc(2)
+    gauge.set(0.5)
+    histogram.observe(0.05, '/a/')
+    histogram.observe(0.1, '/a/')
+    histogram.observe(2.0, '/a/')
+    histogram.observe(0.5, '/"b"/')
+    assert counter.get() == 3
+    assert histogram.count('/a/') == 3
+    assert histogram.sum('/a/') == 2.15
+    assert registry.render() == '''\
+# HELP calls_total Calls.
+# TYPE calls_total counter
+calls_total 3
+# HELP rate Rate.
+# TYPE rate gauge
+rate 0.5
+# HELP latency_seconds Latency.
+# TYPE latency_seconds histogram
+latency_seconds_bucket{route="/a/",le="0.1"} 2
+latency_seconds_bucket{route="/a/",le="1"} 2
+latency_seconds_bucket{route="/a/",le="+Inf"} 3
+latency_seconds_count{route="/a/"} 3
+latency_seconds_sum{route="/a/"} 2.15
+latency_seconds_bucket{route="/\\"b\\"/",le="0.1"} 0
+latency_seconds_bucket{route="/\\"b\\"/",le="1"} 1
+latency_seconds_bucket{route="/\\"b\\"/",le="+Inf"} 1
+latency_seconds_count{route="/\\"b\\"/"} 1
+latency_seconds_sum{route="/\\"b\\"/"} 0.5
+'''
+    with raises(ValueError):
+        registry.register(Counter('rate', 'Rate again.'))
+
+
+@typechecked
+def test_instrumented_hot_paths(fx_valid_block_chain: BlockChain):
+    hashes = MINING_HASHES.get()
+    attempts = MINING_ATTEMPTS.count()
+    proof = BlockChain.proof_of_work(fx_valid_block_chain.last_block.proof)
+    assert MINING_HASHES.get() == hashes + proof + 1
+    assert MINING_ATTEMPTS.count() == attempts + 1
+
+    chains = CHAIN_VALIDATION_SECONDS.count()
+    blocks = BLOCK_VALIDATION_SECONDS.count()
+    assert BlockChain.valid_chain(fx_valid_block_chain.chain)
+    assert not BlockChain.valid_chain(fx_valid_block_chain.chain[1:])
+    assert CHAIN_VALIDATION_SECONDS.count() == chains + 2
+    # One observation per block, up to the first invalid one.
+    assert BLOCK_VALIDATION_SECONDS.count() == blocks + 4
+
+    calls = BALANCE_SECONDS.count()
+    fx_valid_block_chain.balance_of(bytes(16))
+    fx_valid_block_chain.balance_of(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    )
+    assert BALANCE_SECONDS.count() == calls + 2
@@ -0,0 +1,105 @@
+import threading
+import time
+
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.difficulty import INITIAL_TARGET
+from uaena.mining import (JOB_CANCELLED, JOB_DONE, JOB_RUNNING, Miner,
+                          MiningCancelled, MiningJob, MiningJobs, search)
+
+
+def wait_for(job: MiningJob, timeout: float=10) -> None:
+    deadline = time.monotonic() + timeout
+    while job.state == JOB_RUNNING and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+@typechecked
+def test_search():
+    assert search(1234, 0, 62594) is None
+    assert search(1234, 0, 62595) == 62594
+    assert search(1234, 62594, 62595) == 62594
+    assert BlockChain.valid_proof(1234, search(1234, 0, 100000))
+    # A harder target skips proofs only the initial target accepts.
+    # sha256(b'123462594') starts with 00000f2f.
+    assert search(1234, 62594, 62595, INITIAL_TARGET // 16) == 62594
+    assert search(1234, 62594, 62595, INITIAL_TARGET // 32) is None
+
+
+@typechecked
+def test_miner_mine():
+    # BlockChain.proof_of_work(1) == 72608, BlockChain.proof_of_work(72608)
+    # == 24348; chunks are small enough that the pool has to skip empty ones
+    # and must not return a larger proof found by a faster worker.
+    miner = Miner(workers=2, chunk_size=5000)
+    try:
+        assert miner.mine(1) == 72608
+        pool = miner.pool()
+        assert miner.mine(72608) == 24348
+        # The pool is started once, and kept for the searches after.
+        assert miner.pool() is pool
+    finally:
+        miner.close()
+    assert Miner(workers=1, chunk_size=5000).mine(1) == 72608
+
+
+@typechecked
+def test_miner_mine_cancelled():
+    cancelled = threading.Event()
+    cancelled.set()
+    miner = Miner(workers=2)
+    try:
+        with raises(MiningCancelled):
+            miner.mine(1, cancelled)
+    finally:
+        miner.close()
+    with raises(MiningCancelled):
+        Miner(workers=1).mine(1, cancelled)
+
+
+@typechecked
+def test_mining_jobs(fx_valid_block_chain: BlockChain):
+    reward_recipient = bytes.fromhex('619b9000222b457b978efbca2815d38a')
+    jobs = MiningJobs(
+        fx_valid_block_chain,
+        reward_recipient=reward_recipient,
+        miner=Miner(workers=1, chunk_size=5000),
+    )
+    job = jobs.start()
+    assert jobs.get(job.id) is job
+    wait_for(job)
+    assert job.state == JOB_DONE
+    assert job.block is fx_valid_block_chain.last_block
+    assert job.block.proof == 183745  # BlockChain.proof_of_work(24348)
+    assert job.block.transactions[-1].recipient == reward_recipient
+    assert job.reason is None
+
+    job = jobs.start()
+    assert jobs.start() is job
+    assert jobs.cancel(job.id) is job
+    wait_for(job)
+    assert job.state == JOB_CANCELLED
+    assert job.reason == 'cancelled'
+    assert len(fx_valid_block_chain.chain) == 4
+    assert jobs.get('unknown') is None
+
+
+@typechecked
+def test_mining_jobs_new_tip(fx_valid_block_chain: BlockChain):
+    jobs = MiningJobs(
+        fx_valid_block_chain,
+        reward_recipient=bytes.fromhex('619b9000222b457b978efbca2815d38a'),
+        miner=Miner(workers=1, chunk_size=5000),
+    )
+    job = jobs.start()
+    # A block arriving from elsewhere moves the tip under the job.
+    block = fx_valid_block_chain.create_block(
+        proof=183745,
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    )
+    wait_for(job)
+    assert job.state == JOB_CANCELLED
+    assert job.reason == 'new tip'
+    assert fx_valid_block_chain.last_block is block
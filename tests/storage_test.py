@@ -0,0 +1,112 @@
+import pathlib
+
+from pytest import raises
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.storage import FSYNC_NEVER, INDEX_ENTRY, BlockStore, StoredChain
+
+
+@typechecked
+def test_block_store(tmp_path: pathlib.Path, fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    store = BlockStore(tmp_path, segment_size=1)
+    store.extend(chain)
+    assert len(store) == 3
+    assert store[1] == chain[1]
+    assert store[-1] == chain[-1]
+    assert list(store) == chain
+    # Every block overflows the tiny segments.
+    assert store.segments() == [0, 1, 2]
+    with raises(IndexError):
+        store[3]
+    store.close()
+
+    reopened = BlockStore(tmp_path, fsync=FSYNC_NEVER)
+    assert reopened.mapped_count == 3
+    assert list(reopened) == chain
+
+    reopened.truncate(1)
+    assert list(reopened) == chain[:1]
+    assert reopened.segments() == [0]
+    reopened.append(chain[1])
+    assert list(BlockStore(tmp_path)) == chain[:2]
+
+
+@typechecked
+def test_block_store_recover(
+    tmp_path: pathlib.Path, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    store = BlockStore(tmp_path)
+    store.extend(chain)
+    store.close()
+    segment = tmp_path / 'segment-00000000.log'
+    size = segment.stat().st_size
+
+    # The last index entry is lost, and the record after it is torn.
+    index = tmp_path / 'index'
+    index.write_bytes(index.read_bytes()[:-INDEX_ENTRY.size - 3])
+    with segment.open('ab') as f:
+        f.write(b'\x00\x00\x10')
+    recovered = BlockStore(tmp_path)
+    assert list(recovered) == chain
+    assert segment.stat().st_size == size
+    assert index.stat().st_size == 3 * INDEX_ENTRY.size
+
+    # The last record is torn, so its index entry goes as well.
+    with segment.open('r+b') as f:
+        f.truncate(size - 1)
+    assert list(BlockStore(tmp_path)) == chain[:2]
+
+
+@typechecked
+def test_block_chain_store(
+    tmp_path: pathlib.Path, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    block_chain = BlockChain(chain=chain[:2], store=BlockStore(tmp_path))
+    block_chain.create_block(
+        proof=24348,
+        reward_recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        timestamp=chain[1].timestamp + 1,
+    )
+    restarted = BlockChain(store=BlockStore(tmp_path))
+    assert isinstance(restarted.chain, StoredChain)
+    assert restarted.chain == block_chain.chain
+    assert restarted.balance_of(
+        bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+    ) == 2.5
+
+    # Switching branches keeps the chain lazy, and the store in step.
+    with restarted.chain_lock:
+        restarted.reorganize(restarted.chain, 2, [chain[2]])
+    assert isinstance(restarted.chain, StoredChain)
+    assert restarted.chain == chain
+    assert list(BlockStore(tmp_path)) == chain
+
+
+@typechecked
+def test_stored_chain(
+    tmp_path: pathlib.Path, fx_valid_block_chain: BlockChain,
+):
+    chain = fx_valid_block_chain.chain
+    store = BlockStore(tmp_path)
+    store.extend(chain)
+    stored = StoredChain(store)
+    assert len(stored) == 3
+    assert stored.blocks == [None, None, None]
+    assert stored[-1] == chain[-1]
+    assert stored.blocks[:2] == [None, None]
+    assert stored[1:] == chain[1:]
+    assert stored.blocks[0] is None
+
+    head = stored.head(1)
+    store.truncate(1)
+    assert stored[0] == chain[0]
+    # The dropped blocks were read before the store was truncated.
+    assert stored == chain
+    head.append(chain[1])
+    assert head == chain[:2]
+    with raises(TypeError):
+        head.insert(0, chain[2])
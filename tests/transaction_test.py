@@ -1,3 +1,7 @@
+import dataclasses
+import decimal
+
+from pytest import raises
 from typeguard import typechecked
 
 from uaena.transaction import Transaction
@@ -19,3 +23,39 @@ def test_transaction_deserialize(fx_transaction: Transaction):
         'recipient': '33ee49f83681417e82660cb9585d13b1',
         'amount': '0.5',
     }) == fx_transaction
+
+
+@typechecked
+def test_transaction_frozen(fx_transaction: Transaction):
+    transaction = Transaction.deserialize(fx_transaction.serialize())
+    assert transaction == fx_transaction
+    with raises(dataclasses.FrozenInstanceError):
+        transaction.amount = decimal.Decimal('1')
+
+
+@typechecked
+def test_transaction_decode(fx_transaction: Transaction):
+    data = b'\xff' + fx_transaction.encode() + b'\xff'
+    assert Transaction.decode(data, 1) == (fx_transaction, len(data) - 1)
+    with raises(ValueError):
+        Transaction.decode(data[:-2], 1)
+    with raises(ValueError):
+        Transaction.decode(data[:-5] + b'\x03abc', 1)
+
+
+@typechecked
+def test_transaction_field_length(fx_transaction: Transaction):
+    with raises(ValueError):
+        Transaction(
+            sender=b'\x01' * 256,
+            recipient=fx_transaction.recipient,
+            amount=fx_transaction.amount,
+        )
+    transaction = Transaction(
+        sender=b'\x01' * 255,
+        recipient=fx_transaction.recipient,
+        amount=decimal.Decimal('0.' + '1' * 300),
+    )
+    with raises(ValueError):
+        transaction.encode()
+    assert Transaction.decode(fx_transaction.encode())[0] == fx_transaction
@@ -0,0 +1,45 @@
+import dataclasses
+
+from typeguard import typechecked
+
+from uaena.block_chain import BlockChain
+from uaena.tree import BlockTree
+
+
+@typechecked
+def test_block_tree_branch(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    positions = {block.hash: i for i, block in enumerate(chain[:1])}
+    tree = BlockTree(max_side=2)
+    tree.add_side(chain[1], 2)
+    tree.add_side(chain[2], 3)
+    assert chain[2].hash in tree
+    assert tree.branch(chain[2].hash, positions.get) == (1, chain[1:])
+    assert tree.branch(chain[0].hash, positions.get) == (1, [])
+    assert tree.branch(bytes(32), positions.get) is None
+    # The oldest side blocks are forgotten first.
+    rival = dataclasses.replace(chain[1], timestamp=chain[1].timestamp + 1)
+    tree.add_side(rival, 2)
+    assert list(tree.side) == [chain[2].hash, rival.hash]
+    assert tree.work == {chain[2].hash: 3, rival.hash: 2}
+    assert tree.branch(chain[2].hash, positions.get) is None
+    tree.remove_side(rival.hash)
+    assert rival.hash not in tree
+
+
+@typechecked
+def test_block_tree_orphans(fx_valid_block_chain: BlockChain):
+    chain = fx_valid_block_chain.chain
+    rival = dataclasses.replace(chain[2], timestamp=chain[2].timestamp + 1)
+    tree = BlockTree(max_orphans=2)
+    tree.add_orphan(chain[1])
+    tree.add_orphan(chain[2])
+    tree.add_orphan(rival)
+    # The oldest orphan is forgotten first.
+    assert chain[1].hash not in tree
+    assert list(tree.by_parent) == [chain[1].hash]
+    assert tree.adopt(chain[0].hash) == []
+    assert tree.adopt(chain[1].hash) == [chain[2], rival]
+    assert tree.orphans == {}
+    assert tree.by_parent == {}
+    assert tree.remove_orphan(chain[2].hash) is None
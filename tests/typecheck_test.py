@@ -0,0 +1,20 @@
+from pytest import MonkeyPatch, raises
+from typeguard import TypeCheckError, typechecked
+
+from uaena import typecheck
+from uaena.typecheck import TYPECHECK_ALL, TYPECHECK_BOUNDARY, hot_path
+
+
+def double(value: int) -> int:
+    return value * 2
+
+
+@typechecked
+def test_hot_path(monkeypatch: MonkeyPatch):
+    monkeypatch.setattr(typecheck, 'TYPECHECK', TYPECHECK_ALL)
+    with raises(TypeCheckError):
+        hot_path(double)('a')
+
+    monkeypatch.setattr(typecheck, 'TYPECHECK', TYPECHECK_BOUNDARY)
+    assert hot_path(double) is double
+    assert hot_path(double)('a') == 'aa'
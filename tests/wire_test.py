@@ -0,0 +1,70 @@
+import dataclasses
+import decimal
+import json
+import typing
+
+from pytest import mark, raises
+from typeguard import typechecked
+
+from uaena.block import BLOCK_VERSION_MERKLE, Block
+from uaena.difficulty import INITIAL_TARGET
+from uaena.transaction import Transaction
+from uaena.wire import decode_blocks, decode_chain, encode_blocks, encode_chain
+
+
+def variants(block: Block) -> list:
+    transaction = Transaction(
+        sender=bytes.fromhex('5ca60de0575441718094ea0ffcb02aa4'),
+        recipient=bytes.fromhex('33ee49f83681417e82660cb9585d13b1'),
+        amount=decimal.Decimal('1.50E-8'),
+    )
+    return [
+        block,
+        dataclasses.replace(block, transactions=[]),
+        dataclasses.replace(
+            block,
+            transactions=[*block.transactions, transaction],
+            version=BLOCK_VERSION_MERKLE,
+            target=INITIAL_TARGET // 3,
+        ),
+        block.compact(),
+    ]
+
+
+@typechecked
+def test_encode_blocks_round_trip(fx_block: Block):
+    blocks = variants(fx_block)
+    data = b''.join(encode_blocks(blocks))
+    decoded = decode_blocks(data)
+    # Decoding gives the very blocks JSON does, down to the exponents of
+    # amounts.
+    assert decoded == [
+        Block.deserialize(json.loads(json.dumps(block.serialize())))
+        for block in blocks
+    ]
+    assert [block.hash for block in decoded] == [b.hash for b in blocks]
+    assert [
+        [str(t.amount) for t in block.transactions] for block in decoded
+    ] == [[str(t.amount) for t in block.transactions] for block in blocks]
+    assert len(data) < len(json.dumps([b.serialize() for b in blocks]))
+    assert decode_blocks(b'') == []
+
+
+@mark.parametrize('next_position', [1, None])
+@typechecked
+def test_encode_chain_round_trip(
+    fx_block: Block, next_position: typing.Optional[int],
+):
+    blocks = variants(fx_block)
+    data = b''.join(encode_chain(7, next_position, blocks))
+    assert decode_chain(data) == (7, next_position, blocks)
+
+
+@typechecked
+def test_decode_blocks_malformed(fx_block: Block):
+    data = b''.join(encode_blocks([fx_block]))
+    for malformed in (data[:2], data[:-1], data + b'\0', data[:4] + b'\0'):
+        with raises(ValueError):
+            decode_blocks(malformed)
+    with raises(ValueError):
+        decode_chain(b'\0' * 8)
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import array
+import collections.abc
+import dataclasses
+import decimal
+import typing
+
+from .transaction import Transaction
+from .typecheck import hot_path
+
+#: Amounts are kept in fixed point with this many decimal places.
+AMOUNT_DECIMALS = 8
+
+
+@hot_path
+def to_fixed_point(amount: decimal.Decimal) -> typing.Tuple[int, int]:
+    """Splits ``amount`` into an integer number of units of
+    ``10 ** -AMOUNT_DECIMALS`` and the exponent it was written with, so
+    that :func:`from_fixed_point` gives back exactly the same
+    :class:`~decimal.Decimal`, down to its string form.
+
+    Raises :exc:`ValueError` if that is not possible.
+
+    """
+    try:
+        exponent = amount.as_tuple().exponent
+        units = int(amount.scaleb(AMOUNT_DECIMALS))
+    except (TypeError, ValueError, OverflowError, decimal.InvalidOperation):
+        raise ValueError(f'{amount} is not a fixed point amount')
+    if (not isinstance(exponent, int) or
+            not -2 ** 63 <= units < 2 ** 63 or
+            from_fixed_point(units, exponent).as_tuple() !=
+            amount.as_tuple()):
+        raise ValueError(f'{amount} is not a fixed point amount')
+    return units, exponent
+
+
+@hot_path
+def from_fixed_point(units: int, exponent: int) -> decimal.Decimal:
+    return decimal.Decimal(units).scaleb(-AMOUNT_DECIMALS).quantize(
+        decimal.Decimal((0, (1,), exponent)),
+    )
+
+
+@dataclasses.dataclass
+class AddressTable:
+    """Interns addresses, and numbers them.
+
+    Every transaction of a :class:`TransactionBatch` touching an address
+    shares one :class:`bytes` object for it, and the batch refers to the
+    address by its number.
+
+    """
+
+    numbers: typing.Dict[bytes, int] = dataclasses.field(default_factory=dict)
+    addresses: typing.List[bytes] = dataclasses.field(default_factory=list)
+
+    @hot_path
+    def number(self, address: bytes) -> int:
+        number = self.numbers.get(address)
+        if number is None:
+            number = len(self.addresses)
+            self.addresses.append(address)
+            self.numbers[address] = number
+        return number
+
+
+@dataclasses.dataclass(eq=False)
+class TransactionBatch(collections.abc.MutableSequence):
+    """Columnar list of transactions.
+
+    Senders and recipients are kept as numbers in the batch's own
+    :class:`AddressTable`, and amounts in fixed point, all in flat arrays,
+    which takes a fraction of the memory of as many
+    :class:`~uaena.transaction.Transaction` objects.  Transactions are
+    materialized when they are read.  A batch depends on nothing outside of
+    it, so it can be pickled, and dropping it drops its addresses.
+
+    Only amounts :func:`to_fixed_point` accepts can be stored.
+
+    """
+
+    senders: array.array = dataclasses.field(
+        default_factory=lambda: array.array('I'),
+    )
+    recipients: array.array = dataclasses.field(
+        default_factory=lambda: array.array('I'),
+    )
+    units: array.array = dataclasses.field(
+        default_factory=lambda: array.array('q'),
+    )
+    exponents: array.array = dataclasses.field(
+        default_factory=lambda: array.array('b'),
+    )
+    addresses: AddressTable = dataclasses.field(default_factory=AddressTable)
+
+    @staticmethod
+    @hot_path
+    def from_transactions(
+        transactions: typing.Iterable[Transaction],
+    ) -> TransactionBatch:
+        batch = TransactionBatch()
+        batch.extend(transactions)
+        return batch
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    @hot_path
+    def __getitem__(
+        self,
+        index: typing.Union[int, slice],
+    ) -> typing.Union[Transaction, typing.List[Transaction]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        addresses = self.addresses.addresses
+        return Transaction(
+            sender=addresses[self.senders[index]],
+            recipient=addresses[self.recipients[index]],
+            amount=from_fixed_point(self.units[index], self.exponents[index]),
+        )
+
+    def __iter__(self) -> typing.Iterator[Transaction]:
+        addresses = self.addresses.addresses
+        for sender, recipient, units, exponent in zip(
+            self.senders, self.recipients, self.units, self.exponents,
+        ):
+            yield Transaction(
+                sender=addresses[sender],
+                recipient=addresses[recipient],
+                amount=from_fixed_point(units, exponent),
+            )
+
+    @hot_path
+    def columns(self, transaction: Transaction) -> typing.Tuple[int, ...]:
+        units, exponent = to_fixed_point(transaction.amount)
+        if not -128 <= exponent < 128:
+            raise ValueError(f'{transaction.amount} is not a fixed point '
+                             f'amount')
+        return (
+            self.addresses.number(transaction.sender),
+            self.addresses.number(transaction.recipient),
+            units,
+            exponent,
+        )
+
+    def __setitem__(self, index: int, transaction: Transaction) -> None:
+        if isinstance(index, slice):
+            raise TypeError('TransactionBatch does not support slice '
+                            'assignment')
+        (self.senders[index], self.recipients[index],
+         self.units[index], self.exponents[index]) = self.columns(transaction)
+
+    def __delitem__(self, index: typing.Union[int, slice]) -> None:
+        for column in (self.senders, self.recipients, self.units,
+                       self.exponents):
+            del column[index]
+
+    def insert(self, index: int, transaction: Transaction) -> None:
+        sender, recipient, units, exponent = self.columns(transaction)
+        self.senders.insert(index, sender)
+        self.recipients.insert(index, recipient)
+        self.units.insert(index, units)
+        self.exponents.insert(index, exponent)
+
+    def append(self, transaction: Transaction) -> None:
+        sender, recipient, units, exponent = self.columns(transaction)
+        self.senders.append(sender)
+        self.recipients.append(recipient)
+        self.units.append(units)
+        self.exponents.append(exponent)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if isinstance(other, TransactionBatch) and \
+                self.addresses.addresses == other.addresses.addresses:
+            return (self.senders, self.recipients, self.units,
+                    self.exponents) == (other.senders, other.recipients,
+                                        other.units, other.exponents)
+        if isinstance(other, collections.abc.Sequence):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self)!r})'
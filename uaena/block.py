@@ -3,35 +3,95 @@ from __future__ import annotations
 import dataclasses
 import hashlib
 import json
+import struct
 import typing
 
-from typeguard import typechecked
-
+from .batch import TransactionBatch
+from .difficulty import INITIAL_TARGET, target_bytes
+from .merkle import MerkleProof, merkle_root
 from .transaction import Transaction
+from .typecheck import hot_path
+
+#: Blocks hashed over their JSON serialization.  This is the version of every
+#: block made before versions were introduced, so it is left out of
+#: :meth:`Block.serialize` to keep their hashes unchanged.
+BLOCK_VERSION_JSON = 1
+#: Blocks hashed over their canonical binary encoding, :meth:`Block.encode`.
+BLOCK_VERSION_BINARY = 2
+#: Blocks hashed over their header, :meth:`Block.encode_header`, which
+#: commits to their transactions through the root of a Merkle tree.
+BLOCK_VERSION_MERKLE = 3
+BLOCK_VERSIONS = frozenset({
+    BLOCK_VERSION_JSON, BLOCK_VERSION_BINARY, BLOCK_VERSION_MERKLE,
+})
+#: The fixed-width fields an encoded block or header starts with: version,
+#: index, timestamp, proof and the length of the previous hash.
+BLOCK_FIELDS = struct.Struct('>BQqQB')
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class Block:
     index: int
     timestamp: int
     proof: int
     previous_hash: bytes
-    transactions: typing.List[Transaction] = dataclasses.field(
+    transactions: typing.MutableSequence[Transaction] = dataclasses.field(
         default_factory=list,
     )
+    version: int = BLOCK_VERSION_JSON
+    target: int = INITIAL_TARGET
+    _hash: typing.Optional[bytes] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False,
+    )
+    _merkle_root: typing.Optional[bytes] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False,
+    )
+
+    def __setattr__(self, name: str, value: typing.Any) -> None:
+        # Any change to a field invalidates the memoized hashes.  Note that
+        # mutating the transactions list in place is not noticed; blocks are
+        # not supposed to change once they are part of a chain.
+        object.__setattr__(self, name, value)
+        if not name.startswith('_'):
+            object.__setattr__(self, '_hash', None)
+            object.__setattr__(self, '_merkle_root', None)
 
-    @typechecked
+    @hot_path
+    def compact(self) -> Block:
+        """The same block, with its transactions in a columnar
+        :class:`~uaena.batch.TransactionBatch` if they fit in one.
+
+        """
+        if isinstance(self.transactions, TransactionBatch):
+            return self
+        try:
+            transactions = TransactionBatch.from_transactions(
+                self.transactions,
+            )
+        except ValueError:
+            return self
+        block = dataclasses.replace(self, transactions=transactions)
+        block._hash = self._hash
+        block._merkle_root = self._merkle_root
+        return block
+
+    @hot_path
     def serialize(self) -> typing.Mapping[str, typing.Any]:
-        return {
+        data = {
             'index': self.index,
             'timestamp': self.timestamp,
             'proof': self.proof,
             'previous_hash': self.previous_hash.hex(),
             'transactions': [t.serialize() for t in self.transactions],
         }
+        if self.version != BLOCK_VERSION_JSON:
+            data['version'] = self.version
+        if self.target != INITIAL_TARGET:
+            data['target'] = target_bytes(self.target).hex()
+        return data
 
     @staticmethod
-    @typechecked
+    @hot_path
     def deserialize(data: typing.Mapping[str, typing.Any]) -> Block:
         return Block(
             index=int(data['index']),
@@ -42,11 +102,304 @@ class Block:
                 Transaction.deserialize(transaction)
                 for transaction in data['transactions']
             ],
+            version=int(data.get('version', BLOCK_VERSION_JSON)),
+            target=int(data['target'], 16) if 'target' in data
+            else INITIAL_TARGET,
+        )
+
+    @hot_path
+    def encode(self) -> bytes:
+        """Canonical binary form of the block, used for hashing blocks of
+        :const:`BLOCK_VERSION_BINARY`.
+
+        Raises :exc:`ValueError` if a field is out of the range of
+        :const:`BLOCK_FIELDS`.
+
+        """
+        return encode_target(self.target, [
+            pack_fields(
+                self.version,
+                self.index,
+                self.timestamp,
+                self.proof,
+                self.previous_hash,
+            ),
+            self.previous_hash,
+            struct.pack('>I', len(self.transactions)),
+            *(t.encode() for t in self.transactions),
+        ])
+
+    @staticmethod
+    @hot_path
+    def decode(data: bytes) -> Block:
+        """Reads a block in its :meth:`encode` form, which leaves nothing
+        out, so ``Block.decode(block.encode()) == block`` for any block.
+
+        Raises :exc:`ValueError` if ``data`` is not a well-formed block.
+
+        """
+        try:
+            version, index, timestamp, proof, hash_length = \
+                BLOCK_FIELDS.unpack_from(data)
+            offset = BLOCK_FIELDS.size
+            previous_hash = data[offset:offset + hash_length]
+            offset += hash_length
+            count, = struct.unpack_from('>I', data, offset)
+        except struct.error as e:
+            raise ValueError(f'Malformed block: {e}')
+        offset += 4
+        transactions = []
+        for _ in range(count):
+            transaction, offset = Transaction.decode(data, offset)
+            transactions.append(transaction)
+        rest = data[offset:]
+        if not rest:
+            target = INITIAL_TARGET
+        elif len(rest) == len(target_bytes(INITIAL_TARGET)):
+            target = int.from_bytes(rest, 'big')
+        else:
+            raise ValueError('Malformed block: trailing data')
+        return Block(
+            index=index,
+            timestamp=timestamp,
+            proof=proof,
+            previous_hash=previous_hash,
+            transactions=transactions,
+            version=version,
+            target=target,
         )
 
     @property
-    @typechecked
+    @hot_path
+    def merkle_root(self) -> bytes:
+        if self._merkle_root is None:
+            self._merkle_root = merkle_root(self.transactions)
+        return self._merkle_root
+
+    @hot_path
+    def encode_header(self) -> bytes:
+        """Binary header of the block, used for hashing blocks of
+        :const:`BLOCK_VERSION_MERKLE`.  It takes the place of the
+        transactions in :meth:`encode` with their count and Merkle root, so
+        it can be checked against the block hash without the transactions.
+
+        """
+        return encode_header(
+            self.version,
+            self.index,
+            self.timestamp,
+            self.proof,
+            self.previous_hash,
+            len(self.transactions),
+            self.merkle_root,
+            self.target,
+        )
+
+    @hot_path
+    def header(self) -> BlockHeader:
+        return BlockHeader(
+            index=self.index,
+            timestamp=self.timestamp,
+            proof=self.proof,
+            previous_hash=self.previous_hash,
+            transactions_digest=self.merkle_root,
+            transaction_count=len(self.transactions),
+            hash=self.hash,
+            version=self.version,
+            target=self.target,
+        )
+
+    @hot_path
+    def prove(self, position: int) -> MerkleProof:
+        """Proves the transaction at ``position`` is in the block."""
+        return MerkleProof.build(self.transactions, position)
+
+    @hot_path
+    def remember_hash(self, block_hash: bytes) -> None:
+        """Takes ``block_hash`` as the :attr:`hash` of the block rather than
+        computing it, e.g. when another process already did, from the
+        :meth:`encode` form of the block.
+
+        """
+        self._hash = block_hash
+
+    @property
+    @hot_path
     def hash(self) -> bytes:
         """Creates a SHA-256 hash of a Block"""
-        block_string = json.dumps(self.serialize(), sort_keys=True).encode()
-        return bytes.fromhex(hashlib.sha256(block_string).hexdigest())
+        if self._hash is not None:
+            return self._hash
+        if self.version == BLOCK_VERSION_JSON:
+            block_bytes = json.dumps(self.serialize(), sort_keys=True).encode()
+        elif self.version == BLOCK_VERSION_BINARY:
+            block_bytes = self.encode()
+        elif self.version == BLOCK_VERSION_MERKLE:
+            block_bytes = self.encode_header()
+        else:
+            raise ValueError(f'Unknown block version: {self.version}')
+        self._hash = hashlib.sha256(block_bytes).digest()
+        return self._hash
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class BlockHeader:
+    """Everything about a :class:`Block` but its transactions, which the
+    header stands for by their count and Merkle root.  A chain of headers
+    can be checked for linkage and proof of work on its own.
+
+    The ``hash`` of a header of :const:`BLOCK_VERSION_MERKLE` can be checked
+    against the header itself.  Older blocks are hashed over their
+    transactions, so the hash their header carries can only be checked
+    once the block arrives, by comparing it with :meth:`Block.header`.
+
+    """
+
+    index: int
+    timestamp: int
+    proof: int
+    previous_hash: bytes
+    transactions_digest: bytes
+    transaction_count: int
+    hash: bytes
+    version: int = BLOCK_VERSION_JSON
+    target: int = INITIAL_TARGET
+
+    @hot_path
+    def header(self) -> BlockHeader:
+        return self
+
+    @hot_path
+    def valid_hash(self) -> bool:
+        """Whether ``hash`` is the hash of the header.  Always true for
+        headers of versions not hashed over their header.
+
+        """
+        if self.version != BLOCK_VERSION_MERKLE:
+            return True
+        return hashlib.sha256(encode_header(
+            self.version,
+            self.index,
+            self.timestamp,
+            self.proof,
+            self.previous_hash,
+            self.transaction_count,
+            self.transactions_digest,
+            self.target,
+        )).digest() == self.hash
+
+    @hot_path
+    def serialize(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'index': self.index,
+            'timestamp': self.timestamp,
+            'proof': self.proof,
+            'previous_hash': self.previous_hash.hex(),
+            'transactions_digest': self.transactions_digest.hex(),
+            'transaction_count': self.transaction_count,
+            'hash': self.hash.hex(),
+            'version': self.version,
+            'target': target_bytes(self.target).hex(),
+        }
+
+    @staticmethod
+    @hot_path
+    def deserialize(data: typing.Mapping[str, typing.Any]) -> BlockHeader:
+        return BlockHeader(
+            index=int(data['index']),
+            timestamp=int(data['timestamp']),
+            proof=int(data['proof']),
+            previous_hash=bytes.fromhex(data['previous_hash']),
+            transactions_digest=bytes.fromhex(data['transactions_digest']),
+            transaction_count=int(data['transaction_count']),
+            hash=bytes.fromhex(data['hash']),
+            version=int(data.get('version', BLOCK_VERSION_JSON)),
+            target=int(data['target'], 16) if 'target' in data
+            else INITIAL_TARGET,
+        )
+
+
+#: What a chain holds at a position: a block, or only its header where the
+#: chain was pruned, i.e. below the checkpoint a node was bootstrapped from.
+ChainEntry = typing.Union[Block, BlockHeader]
+
+
+@hot_path
+def encode_target(target: int, parts: typing.List[bytes]) -> bytes:
+    """Joins the encoded ``parts`` of a block or header, followed by its
+    ``target`` unless that is :const:`~uaena.difficulty.INITIAL_TARGET`, so
+    blocks made before targets were recorded keep their hashes.
+
+    """
+    if target != INITIAL_TARGET:
+        parts.append(target_bytes(target))
+    return b''.join(parts)
+
+
+@hot_path
+def pack_fields(
+    version: int,
+    index: int,
+    timestamp: int,
+    proof: int,
+    previous_hash: bytes,
+) -> bytes:
+    """The :const:`BLOCK_FIELDS` an encoded block or header starts with.
+
+    Raises :exc:`ValueError` if a field is out of their range.
+
+    """
+    try:
+        return BLOCK_FIELDS.pack(
+            version, index, timestamp, proof, len(previous_hash),
+        )
+    except struct.error as e:
+        raise ValueError(f'Block field out of range: {e}')
+
+
+@hot_path
+def encode_header(
+    version: int,
+    index: int,
+    timestamp: int,
+    proof: int,
+    previous_hash: bytes,
+    transaction_count: int,
+    transactions_digest: bytes,
+    target: int=INITIAL_TARGET,
+) -> bytes:
+    return encode_target(target, [
+        pack_fields(version, index, timestamp, proof, previous_hash),
+        previous_hash,
+        struct.pack('>I', transaction_count),
+        transactions_digest,
+    ])
+
+
+@hot_path
+def verify_inclusion(
+    block_hash: bytes,
+    header: bytes,
+    transaction: Transaction,
+    proof: MerkleProof,
+) -> bool:
+    """Checks that ``transaction`` is in the block of the given hash, from
+    the block's :meth:`~Block.encode_header` and a :class:`MerkleProof`,
+    without the rest of its transactions.
+
+    """
+    root_size = hashlib.sha256().digest_size
+    fixed = BLOCK_FIELDS.size
+    if (len(header) < fixed or
+            header[0] != BLOCK_VERSION_MERKLE or
+            hashlib.sha256(header).digest() != block_hash):
+        return False
+    # The count and root follow the previous hash, and may be followed by
+    # the target.
+    offset = fixed + header[fixed - 1]
+    if len(header) not in (offset + 4 + root_size,
+                           offset + 4 + 2 * root_size):
+        return False
+    count, = struct.unpack_from('>I', header, offset)
+    return proof.count == count and proof.verify(
+        transaction, header[offset + 4:offset + 4 + root_size],
+    )
@@ -1,46 +1,215 @@
+import collections
+import concurrent.futures
 import dataclasses
 import datetime
 import decimal
-import itertools
 import hashlib
+import multiprocessing
+import threading
 import time
 import typing
 import urllib.parse
 
-from requests import get
 from typeguard import typechecked
 
-from .block import Block
+from .block import (BLOCK_VERSION_JSON, BLOCK_VERSIONS, Block, BlockHeader,
+                    ChainEntry, pack_fields)
+from .checkpoint import Checkpoint, CheckpointStore
+from .consensus import PeerClient
+from .difficulty import (INITIAL_TARGET, RETARGET_INTERVAL, block_work,
+                         expected_target, target_bytes)
+from .index import ChainIndex, Location
+from .ledger import Ledger
+from .mempool import Mempool
+from .metrics import (BALANCE_SECONDS, BLOCK_VALIDATION_SECONDS,
+                      CHAIN_VALIDATION_SECONDS, record_mining)
+from .storage import BlockStore, StoredChain
 from .transaction import Transaction
+from .tree import BlockTree
+from .typecheck import hot_path
 
 MINING_REWARD_SENDER = bytes.fromhex('00000000000000000000000000000000')
 MINING_REWARD = decimal.Decimal('1')
-DIFFICULTY = 4
+MAX_BLOCK_INTERVAL = 2 * 60 * 60 * 1000
+#: The number of headers first asked for when looking for the block a peer's
+#: chain forks from ours.  The window doubles on each further request.
+SYNC_WINDOW = 16
+#: Blocks between two checkpoints of the balances.
+CHECKPOINT_INTERVAL = 1000
+#: Headers fetched per request during a headers-first sync.
+HEADERS_BATCH = 2000
+#: Blocks per chunk checked by a worker of a :class:`ChainVerifier`.
+VERIFY_CHUNK_SIZE = 500
+#: The fewest blocks a :class:`ChainVerifier` hands to its pool; shorter
+#: runs are validated faster in-process than they are shipped to workers.
+VERIFY_MIN_POOL_LENGTH = 4000
+#: Sync by downloading the blocks after the common ancestor at once, and
+#: validating them as they are.
+SYNC_BLOCKS = 'blocks'
+#: Sync by downloading and validating the headers after the common ancestor
+#: first, and the blocks only if the headers hold up.
+SYNC_HEADERS_FIRST = 'headers-first'
+#: What :meth:`BlockChain.accept_block` did with a block: made it the tip
+#: of the chain...
+BLOCK_ACCEPTED = 'accepted'
+#: ...found it in the chain already...
+BLOCK_KNOWN = 'known'
+#: ...kept it as an orphan, as blocks between our chain and it are missing...
+BLOCK_GAP = 'gap'
+#: ...or kept it on a side branch, with no more work than our chain.
+BLOCK_FORK = 'fork'
+
+
+class InvalidChainError(ValueError):
+    """Raised when a chain fails validation.
+
+    ``index`` is the position of the first invalid block in the chain.
+
+    """
+
+    def __init__(self, index: int, reason: str) -> None:
+        super().__init__(f'Block at {index} is invalid: {reason}')
+        self.index = index
+        self.reason = reason
 
 
 @dataclasses.dataclass
 class BlockChain:
-    chain: typing.List[Block] = dataclasses.field(default_factory=list)
-    current_transactions: typing.List[Transaction] = dataclasses.field(
+    #: The blocks of the chain.  A chain bootstrapped from a checkpoint is
+    #: pruned: it only keeps the headers of the blocks before the
+    #: checkpoint.
+    chain: typing.MutableSequence[ChainEntry] = dataclasses.field(
         default_factory=list,
     )
+    mempool: Mempool = dataclasses.field(
+        default_factory=Mempool, repr=False, compare=False,
+    )
     nodes: typing.Set[str] = dataclasses.field(default_factory=set)
+    block_version: int = BLOCK_VERSION_JSON
+    #: Keep the transactions of blocks in columnar batches, which saves
+    #: memory at the cost of materializing transactions when they are read.
+    compact: bool = False
+    peer_client: PeerClient = dataclasses.field(
+        default_factory=PeerClient, repr=False, compare=False,
+    )
+    ledger: Ledger = dataclasses.field(
+        default_factory=Ledger, repr=False, compare=False,
+    )
+    #: Where every address appears in the chain, and where every block is.
+    index: ChainIndex = dataclasses.field(
+        default_factory=ChainIndex, repr=False, compare=False,
+    )
+    #: The blocks known off the chain: side branches and orphans.
+    tree: BlockTree = dataclasses.field(
+        default_factory=BlockTree, repr=False, compare=False,
+    )
+    #: Validates the blocks of peers' chains, on a process pool if it has
+    #: more than one worker.
+    verifier: 'ChainVerifier' = dataclasses.field(
+        default_factory=lambda: ChainVerifier(), repr=False, compare=False,
+    )
+    store: typing.Optional[BlockStore] = dataclasses.field(
+        default=None, repr=False, compare=False,
+    )
+    sync_mode: str = SYNC_HEADERS_FIRST
+    checkpoints: typing.Optional[CheckpointStore] = dataclasses.field(
+        default=None, repr=False, compare=False,
+    )
+    checkpoint_interval: int = CHECKPOINT_INTERVAL
+    #: Height of the last checkpoint of the chain.
+    checkpoint_height: int = dataclasses.field(
+        default=0, init=False, repr=False, compare=False,
+    )
+    #: Called with the new last block whenever the tip of the chain moves,
+    #: be it by a block created here or by a chain adopted from a peer.
+    tip_listeners: typing.List[typing.Callable[[Block], None]] = (
+        dataclasses.field(default_factory=list, repr=False, compare=False)
+    )
+    #: Serializes the writers of the chain.  Readers take no lock: the
+    #: chain list is only ever appended to, and replacing the chain assigns
+    #: a new list, so a reader holding the list sees a consistent chain.
+    chain_lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False,
+    )
+    #: Guards the mempool, and the ledger along with it, so transactions
+    #: are admitted against a consistent view of the balances.  Chain
+    #: writers take it briefly to move transactions from the mempool into
+    #: the ledger; when both are held, ``chain_lock`` is taken first.
+    mempool_lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False,
+    )
 
-    @typechecked
-    def balance_of(self, address: bytes) -> decimal.Decimal:
-        balance = decimal.Decimal()
-        if address == MINING_REWARD_SENDER:
-            return balance
-        transactions = itertools.chain(
-            *(block.transactions for block in self.chain),
-            self.current_transactions
-        )
-        for transaction in transactions:
-            if transaction.sender == address:
-                balance -= transaction.amount
-            if transaction.recipient == address:
-                balance += transaction.amount
-        return balance
+    def __post_init__(self) -> None:
+        if self.store is not None:
+            # Restore the chain from the store, reading its blocks as they
+            # are needed, or seed an empty store.
+            if not self.chain:
+                self.chain = StoredChain(self.store, load=self.compacted)
+            elif not len(self.store):
+                self.store.extend(self.chain)
+        checkpoint = self.latest_checkpoint()
+        if self.pruned_height and (
+            checkpoint is None or checkpoint.height <= self.pruned_height
+        ):
+            raise ValueError(
+                'A pruned chain needs a checkpoint after its pruned blocks',
+            )
+        if checkpoint is not None:
+            # Start from the balances of the checkpoint, rather than
+            # replaying the whole chain.
+            self.ledger = Ledger(
+                confirmed=dict(checkpoint.balances),
+                height=checkpoint.height,
+                source_chain=self.chain,
+            )
+            self.checkpoint_height = checkpoint.height
+        self.ledger.sync(self.chain)
+
+    @property
+    @hot_path
+    def pruned_height(self) -> int:
+        """The number of blocks at the start of the chain of which only the
+        headers are kept.
+
+        """
+        return pruned_length(self.chain)
+
+    @property
+    def current_transactions(self) -> typing.List[Transaction]:
+        """The transactions waiting in the mempool, oldest first."""
+        with self.mempool_lock:
+            return list(self.mempool)
+
+    @current_transactions.setter
+    def current_transactions(
+        self,
+        transactions: typing.Iterable[Transaction],
+    ) -> None:
+        with self.mempool_lock:
+            self.mempool.clear()
+            for transaction in transactions:
+                self.append_transaction(transaction)
+
+    @hot_path
+    def balance_of(
+        self,
+        address: bytes,
+        include_pending: bool=True,
+    ) -> decimal.Decimal:
+        started_at = time.perf_counter()
+        try:
+            if address == MINING_REWARD_SENDER:
+                return decimal.Decimal()
+            with self.mempool_lock:
+                # The chain may have been reassigned from the outside;
+                # syncing is a no-op when the index is already current.
+                self.ledger.sync(self.chain)
+                balance = self.ledger.confirmed_balance(address)
+                if include_pending:
+                    balance += self.mempool.pending_balance(address)
+                return balance
+        finally:
+            BALANCE_SECONDS.observe(time.perf_counter() - started_at)
 
     @typechecked
     def create_genesis_block(
@@ -63,43 +232,490 @@ class BlockChain:
         previous_hash: typing.Optional[bytes]=None,
         timestamp: typing.Optional[int]=None,
     ) -> Block:
-        """Create a new Block in the BlockChain."""
-        self.append_transaction(
-            Transaction(
-                sender=MINING_REWARD_SENDER,
-                recipient=reward_recipient,
-                amount=MINING_REWARD,
+        """Create a new Block in the BlockChain, with the oldest pending
+        transactions that fit in it.
+
+        """
+        reward = Transaction(
+            sender=MINING_REWARD_SENDER,
+            recipient=reward_recipient,
+            amount=MINING_REWARD,
+        )
+        self.valid_transaction(reward)
+        with self.chain_lock:
+            with self.mempool_lock:
+                selected = self.mempool.select()
+            block = Block(
+                index=len(self.chain) + 1,
+                timestamp=timestamp or int(time.time() * 1000),
+                transactions=[*selected, reward],
+                proof=proof,
+                previous_hash=previous_hash or self.chain[-1].hash,
+                version=self.block_version,
+                target=self.next_target(),
+            )
+            block = self.compacted(block)
+            if self.store is not None:
+                self.store.append(block)
+            with self.mempool_lock:
+                self.chain.append(block)
+                for transaction in selected:
+                    # It may have been evicted since it was selected.
+                    if transaction in self.mempool:
+                        self.mempool.remove(transaction.hash)
+                self.ledger.sync(self.chain)
+            self.index.sync(self.chain)
+            self.notify_tip()
+            self.write_checkpoint()
+        return block
+
+    @typechecked
+    def accept_block(self, block: Block) -> str:
+        """Takes in a block announced by a peer.  Returns:
+
+        - :const:`BLOCK_ACCEPTED` if the block is now the tip of our chain,
+          be it because it follows our tip, or because it completes a side
+          branch with more work than our chain, which we switch to;
+        - :const:`BLOCK_KNOWN` if we have the block already;
+        - :const:`BLOCK_FORK` if it is kept on a side branch with no more
+          work than our chain;
+        - :const:`BLOCK_GAP` if its parent is unknown, in which case it is
+          kept as an orphan until the parent arrives.
+
+        Orphans waiting for the block are then taken in as well.
+
+        Raises :exc:`InvalidChainError` if the block, or the side branch it
+        completes, is not valid.
+
+        """
+        with self.chain_lock:
+            outcome = self.attach_block(block)
+            parents = [block.hash] if outcome in (
+                BLOCK_ACCEPTED, BLOCK_FORK,
+            ) else []
+            while parents:
+                for orphan in self.tree.adopt(parents.pop()):
+                    try:
+                        if self.attach_block(orphan) in (
+                            BLOCK_ACCEPTED, BLOCK_FORK,
+                        ):
+                            parents.append(orphan.hash)
+                    except InvalidChainError:
+                        pass
+        return outcome
+
+    @hot_path
+    def attach_block(self, block: Block) -> str:
+        """Puts ``block`` where it belongs in the block tree: on top of the
+        chain, on a side branch, or among the orphans.  The caller holds
+        ``chain_lock``.
+
+        """
+        chain = self.chain
+        # Hashing a block of a later version encodes it.
+        check_fields(block.index - 1, block)
+        block_hash = block.hash
+        if self.index.position(chain, block_hash) is not None or \
+                block_hash in self.tree:
+            return BLOCK_KNOWN
+        if not chain:
+            if block.index != 1:
+                self.tree.add_orphan(block)
+                return BLOCK_GAP
+            self.reorganize(chain, 0, [block])
+            return BLOCK_ACCEPTED
+        if block.previous_hash == chain[-1].hash:
+            self.reorganize(chain, len(chain), [block])
+            return BLOCK_ACCEPTED
+        found = self.tree.branch(
+            block.previous_hash,
+            lambda parent_hash: self.index.position(chain, parent_hash),
+        )
+        if found is None:
+            self.tree.add_orphan(block)
+            return BLOCK_GAP
+        fork, branch = found
+        parent = branch[-1] if branch else chain[fork - 1]
+        validate_link(
+            fork + len(branch),
+            parent,
+            parent.hash,
+            block,
+            timestamp_window(
+                chain[max(0, fork - RETARGET_INTERVAL):fork] + branch,
             ),
         )
-        block = Block(
-            index=len(self.chain) + 1,
-            timestamp=timestamp or int(time.time() * 1000),
-            transactions=self.current_transactions,
-            proof=proof,
-            previous_hash=previous_hash or self.chain[-1].hash,
+        work = block_work(block.target) + (
+            self.tree.work[parent.hash] if branch
+            else self.index.work(chain, fork)
         )
-        self.chain.append(block)
-        self.current_transactions = []
+        if work <= self.index.work(chain, len(chain)):
+            self.tree.add_side(block, work)
+            return BLOCK_FORK
+        self.reorganize(chain, fork, [*branch, block])
+        return BLOCK_ACCEPTED
+
+    @hot_path
+    def branch_ledger(
+        self,
+        chain: typing.Sequence[ChainEntry],
+        fork: int,
+        branch: typing.Sequence[Block],
+    ) -> Ledger:
+        """The balances after the first ``fork`` blocks of ``chain``, of
+        just the addresses the blocks after them or the ``branch`` touch:
+        all it takes to validate the branch, without copying the ledger.
+        The caller holds ``chain_lock``.
+
+        """
+        dropped = chain[fork:]
+        addresses = {
+            address
+            for block in (*dropped, *branch)
+            for transaction in block.transactions
+            for address in (transaction.sender, transaction.recipient)
+        }
+        with self.mempool_lock:
+            self.ledger.sync(chain)
+            ledger = Ledger(
+                confirmed={
+                    address: self.ledger.confirmed_balance(address)
+                    for address in addresses
+                },
+                height=self.ledger.height,
+            )
+        for block in reversed(dropped):
+            ledger.revert_block(block)
+        return ledger
+
+    @hot_path
+    def reorganize(
+        self,
+        chain: typing.Sequence[ChainEntry],
+        fork: int,
+        branch: typing.List[Block],
+    ) -> None:
+        """Validates ``branch`` as the successor of the first ``fork``
+        blocks of ``chain``, our chain, and switches to it.  The caller
+        holds ``chain_lock``.
+
+        Raises :exc:`InvalidChainError` if the branch is not valid, after
+        forgetting its invalid blocks, or if it forks off before the
+        checkpoint a pruned chain starts from.
+
+        """
+        if fork < self.pruned_height:
+            for block in branch:
+                self.tree.remove_side(block.hash)
+            raise InvalidChainError(fork, 'forks off before the checkpoint')
+        ancestor = chain[fork - 1] if fork else None
+        validator = ChainValidator(
+            ledger=self.branch_ledger(chain, fork, branch),
+            last_block=ancestor,
+            last_hash=ancestor.hash if ancestor else None,
+            timestamps=timestamp_window(
+                chain[max(0, fork - RETARGET_INTERVAL):fork],
+            ),
+        )
+        try:
+            for block in branch:
+                validator.validate(block)
+        except InvalidChainError as e:
+            for block in branch[e.index - fork:]:
+                self.tree.remove_side(block.hash)
+            raise
+        self.switch_branch(chain, fork, branch)
+
+    @hot_path
+    def switch_branch(
+        self,
+        chain: typing.Sequence[ChainEntry],
+        fork: int,
+        branch: typing.List[Block],
+    ) -> None:
+        """Replaces the blocks of ``chain``, our chain, after the first
+        ``fork`` with the validated ``branch``.  Only the blocks in between
+        are reverted and applied to the ledger, the index and the mempool;
+        the dropped blocks are kept on a side branch.  The caller holds
+        ``chain_lock``.
+
+        """
+        dropped = chain[fork:]
+        dropped_work = [
+            self.index.work(chain, fork + i + 1) for i in range(len(dropped))
+        ]
+        blocks = [self.compacted(block) for block in branch]
+        if self.store is not None:
+            if dropped:
+                self.store.truncate(fork)
+            self.store.extend(blocks)
+        with self.mempool_lock:
+            self.ledger.sync(chain)
+            for block in reversed(dropped):
+                self.ledger.revert_block(block)
+            for block in blocks:
+                self.ledger.apply_block(block)
+            if dropped:
+                # Readers may be holding the old list; replace it rather
+                # than truncating it.
+                if isinstance(chain, StoredChain):
+                    chain = chain.head(fork)
+                    chain.extend(blocks)
+                else:
+                    chain = chain[:fork] + blocks
+                self.ledger.source_chain = chain
+                self.chain = chain
+            else:
+                chain.extend(blocks)
+            dropped_transactions = [
+                transaction
+                for block in dropped
+                for transaction in block.transactions
+            ]
+            added_transactions = [
+                transaction
+                for block in blocks
+                for transaction in block.transactions
+            ]
+            self.mempool.reorganize(
+                [
+                    transaction for transaction in dropped_transactions
+                    if transaction.sender != MINING_REWARD_SENDER
+                ],
+                added_transactions,
+                {
+                    address
+                    for transaction in (
+                        *dropped_transactions, *added_transactions,
+                    )
+                    for address in (transaction.sender, transaction.recipient)
+                },
+                self.ledger.confirmed_balance,
+            )
+        for block, work in zip(dropped, dropped_work):
+            self.tree.add_side(block, work)
+        for block in branch:
+            self.tree.remove_side(block.hash)
+        self.checkpoint_height = min(self.checkpoint_height, fork)
+        self.index.sync(chain)
+        self.notify_tip()
+        self.write_checkpoint()
+
+    @hot_path
+    def notify_tip(self) -> None:
+        for listener in self.tip_listeners:
+            listener(self.chain[-1])
+
+    @typechecked
+    def latest_checkpoint(self) -> typing.Optional[Checkpoint]:
+        """The latest stored checkpoint of our chain, if any."""
+        if self.checkpoints is None:
+            return None
+        chain = self.chain
+        for checkpoint in self.checkpoints:
+            if 0 < checkpoint.height <= len(chain) and \
+                    chain[checkpoint.height - 1].hash == checkpoint.block_hash:
+                return checkpoint
+        return None
+
+    @typechecked
+    def write_checkpoint(self) -> typing.Optional[Checkpoint]:
+        """Stores a checkpoint of the balances at the tip, if
+        ``checkpoint_interval`` blocks have been added since the last one.
+
+        """
+        if self.checkpoints is None or self.checkpoint_interval <= 0:
+            return None
+        with self.chain_lock:
+            chain = self.chain
+            if len(chain) - self.checkpoint_height < self.checkpoint_interval:
+                return None
+            with self.mempool_lock:
+                self.ledger.sync(chain)
+                balances = dict(self.ledger.confirmed)
+            checkpoint = Checkpoint(
+                height=len(chain),
+                block_hash=chain[-1].hash,
+                balances=balances,
+            )
+            self.checkpoints.save(checkpoint)
+            self.checkpoint_height = checkpoint.height
+        return checkpoint
+
+    @typechecked
+    def bootstrap(
+        self,
+        node: str,
+        checkpoint_hash: bytes,
+        deadline_at: float,
+    ) -> bool:
+        """Starts an empty node from ``node``'s chain, taking the balances
+        from the checkpoint of the trusted ``checkpoint_hash``.  Only the
+        headers of the blocks before the checkpoint are fetched, and only
+        checked to link up to it; the chain keeps them in the place of the
+        blocks.  The blocks from the checkpoint on are fetched, and those
+        after it validated in full.
+
+        """
+        if self.chain:
+            raise ValueError('Only an empty node can be bootstrapped')
+        checkpoint = self.peer_client.fetch_checkpoint(
+            node, checkpoint_hash, deadline_at,
+        )
+        if checkpoint is None or checkpoint.hash != checkpoint_hash:
+            return False
+        height = checkpoint.height
+        length = self.peer_client.fetch_length(node, deadline_at)
+        if length is None or length < height or height < 1:
+            return False
+        headers = []
+        for start in range(0, height - 1, HEADERS_BATCH):
+            stop = min(start + HEADERS_BATCH, height - 1)
+            batch = self.peer_client.fetch_headers(
+                node, start, stop, deadline_at,
+            )
+            if batch is None or len(batch) != stop - start:
+                return False
+            headers.extend(batch)
+        blocks = self.peer_client.fetch_bodies(
+            node, height - 1, length, deadline_at,
+        )
+        if not blocks:
+            return False
+        previous_hash = None
+        for position, entry in enumerate([*headers, blocks[0]]):
+            if entry.index != position + 1 or (
+                previous_hash is not None and
+                entry.previous_hash != previous_hash
+            ) or isinstance(entry, BlockHeader) and not entry.valid_hash():
+                return False
+            previous_hash = entry.hash
+        if previous_hash != checkpoint.block_hash:
+            return False
+        last_block = blocks[0]
+        validator = ChainValidator(
+            ledger=Ledger(confirmed=dict(checkpoint.balances), height=height),
+            last_block=last_block,
+            last_hash=last_block.hash,
+            timestamps=timestamp_window(
+                [*headers[-RETARGET_INTERVAL:], last_block],
+            ),
+        )
+        try:
+            self.verifier.verify(validator, blocks[1:])
+        except InvalidChainError:
+            return False
+
+        with self.chain_lock:
+            if self.chain:
+                return False
+            chain = [*headers, *(self.compacted(block) for block in blocks)]
+            if self.store is not None:
+                self.store.truncate(0)
+                self.store.extend(chain)
+            if self.checkpoints is not None:
+                self.checkpoints.save(checkpoint)
+            self.checkpoint_height = height
+            validator.ledger.source_chain = chain
+            with self.mempool_lock:
+                self.chain = chain
+                self.ledger = validator.ledger
+            self.index.sync(chain)
+            self.notify_tip()
+            self.write_checkpoint()
+        return True
+
+    @hot_path
+    def compacted(self, block: ChainEntry) -> ChainEntry:
+        if self.compact and isinstance(block, Block):
+            return block.compact()
         return block
 
     @typechecked
     def append_transaction(self, transaction: Transaction) -> int:
         """Creates a new transaction to go into the next mined Block."""
-        self.valid_transaction(transaction)
-        self.current_transactions.append(transaction)
-        return self.last_block.index + 1 if self.last_block else 1
+        with self.mempool_lock:
+            self.valid_transaction(transaction)
+            if transaction.sender == MINING_REWARD_SENDER:
+                raise ValueError(
+                    'Mining rewards are only added by create_block',
+                )
+            self.mempool.add(transaction, self.ledger.confirmed_balance)
+        last_block = self.last_block
+        return last_block.index + 1 if last_block else 1
+
+    @typechecked
+    def append_transactions(
+        self,
+        transactions: typing.Iterable[Transaction],
+    ) -> typing.List[typing.Optional[str]]:
+        """Pools many transactions in one pass, in order, each checked
+        against the confirmed balances and the transactions pooled before
+        it.  Gives, for every transaction, ``None`` if it was pooled, or why
+        it was rejected.
+
+        """
+        errors = []
+        with self.mempool_lock:
+            self.ledger.sync(self.chain)
+            for transaction in transactions:
+                try:
+                    self.append_transaction(transaction)
+                except ValueError as e:
+                    errors.append(str(e))
+                else:
+                    errors.append(None)
+        return errors
+
+    @typechecked
+    def history(
+        self,
+        address: bytes,
+        start: int=0,
+        limit: typing.Optional[int]=None,
+    ) -> typing.Tuple[int, typing.List[typing.Tuple[Location, Block]]]:
+        """The number of confirmed transactions touching ``address``, and
+        the locations and blocks of those from the ``start``-th on, oldest
+        first, at most ``limit`` of them.
+
+        """
+        chain = self.chain
+        total, locations = self.index.history(chain, address, start, limit)
+        return total, [
+            (location, chain[location[0]]) for location in locations
+        ]
+
+    @typechecked
+    def find_block(
+        self,
+        block_hash: bytes,
+    ) -> typing.Optional[typing.Tuple[int, Block]]:
+        """The position and block of the given hash, if it is in the
+        chain.
+
+        """
+        chain = self.chain
+        position = self.index.position(chain, block_hash)
+        if position is None:
+            return None
+        return position, chain[position]
 
     @typechecked
     def register_node(self, address: str) -> None:
-        self.nodes.add(urllib.parse.urlparse(address).netloc)
+        # Copied rather than added to, as consensus may be iterating it.
+        self.nodes = {*self.nodes, urllib.parse.urlparse(address).netloc}
 
     @property
-    @typechecked
+    @hot_path
     def last_block(self) -> typing.Optional[Block]:
-        return self.chain[-1] if self.chain else None
+        chain = self.chain
+        return chain[-1] if chain else None
 
-    @typechecked
+    @hot_path
     def valid_transaction(self, transaction: Transaction):
+        amount = transaction.amount
+        if not amount.is_finite() or amount <= 0:
+            raise ValueError(f'Amount must be positive: {amount}')
         if transaction.sender == MINING_REWARD_SENDER:
             if transaction.amount != MINING_REWARD:
                 raise ValueError(f'Mining reward must be {MINING_REWARD}')
@@ -112,72 +728,223 @@ class BlockChain:
             )
 
     @staticmethod
-    @typechecked
-    def valid_proof(last_proof: int, proof: int) -> bool:
+    @hot_path
+    def valid_proof(
+        last_proof: int,
+        proof: int,
+        target: int=INITIAL_TARGET,
+    ) -> bool:
         """Validates the Proof:
-        Does hash(last_proof, proof) contain 4 leading zeroes?
+        Is hash(last_proof, proof), as a 256-bit integer, below ``target``?
 
         """
         guess = f'{last_proof}{proof}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:DIFFICULTY] == '0000'
+        return hashlib.sha256(guess).digest() < target_bytes(target)
 
     @staticmethod
-    @typechecked
-    def proof_of_work(last_proof: int) -> int:
+    @hot_path
+    def proof_of_work(last_proof: int, target: int=INITIAL_TARGET) -> int:
         """Simple Proof of Work Algorithm:
-        - Find a number p' such that hash(pp') contains leading 4 zeroes,
-          where p is the previous p'
+        - Find a number p' such that hash(pp') is below ``target``, where p
+          is the previous p'
         - p is the previous proof, and p' is the new proof
 
         """
+        started_at = time.perf_counter()
         proof = 0
-        while not BlockChain.valid_proof(last_proof, proof):
+        while not BlockChain.valid_proof(last_proof, proof, target):
             proof += 1
+        record_mining(proof + 1, time.perf_counter() - started_at)
         return proof
 
+    @hot_path
+    def next_target(self) -> int:
+        """The target the next block of the chain must have."""
+        chain = self.chain
+        return expected_target(
+            len(chain),
+            chain[-1].target if chain else INITIAL_TARGET,
+            timestamp_window(chain),
+        )
+
     @staticmethod
-    @typechecked
-    def valid_chain(chain: typing.List[Block]) -> bool:
+    @hot_path
+    def verify_chain(
+        chain: typing.Sequence[Block],
+        verifier: typing.Optional['ChainVerifier']=None,
+    ) -> Ledger:
+        """Validates ``chain`` in a single forward pass of the balances,
+        behind the workers of ``verifier``, if given, checking the blocks
+        themselves.
+
+        Raises :exc:`InvalidChainError` for the first invalid block, and
+        returns the confirmed balances of the chain otherwise.
+
+        """
+        if not chain:
+            raise InvalidChainError(0, 'chain is empty')
+        started_at = time.perf_counter()
+        validator = ChainValidator()
+        try:
+            if verifier is None:
+                for block in chain:
+                    validator.validate(block)
+            else:
+                verifier.verify(validator, chain)
+        finally:
+            CHAIN_VALIDATION_SECONDS.observe(
+                time.perf_counter() - started_at,
+            )
+        validator.ledger.source_chain = chain
+        return validator.ledger
+
+    @staticmethod
+    @hot_path
+    def valid_chain(
+        chain: typing.Sequence[Block],
+        verifier: typing.Optional['ChainVerifier']=None,
+    ) -> bool:
         """Determine if a given BlockChain is valid"""
-        block_chain = BlockChain(chain=chain)
-        last_block = chain[0]
-        current_index = 1
+        try:
+            BlockChain.verify_chain(chain, verifier)
+        except InvalidChainError:
+            return False
+        return True
 
-        while current_index < len(chain):
-            block = chain[current_index]
+    @typechecked
+    def common_prefix_length(
+        self,
+        node: str,
+        peer_length: int,
+        deadline_at: float,
+    ) -> typing.Optional[int]:
+        """Finds how many leading blocks ``node``'s chain shares with ours by
+        comparing block hashes, walking back from the shorter tip in
+        doubling windows.  Returns :const:`None` if the node fails to answer.
 
-            if block.index - last_block.index != 1:
-                return False
+        """
+        top = min(len(self.chain), peer_length)
+        window = SYNC_WINDOW
+        while top > 0:
+            bottom = max(0, top - window)
+            headers = self.peer_client.fetch_headers(
+                node, bottom, top, deadline_at,
+            )
+            if headers is None or len(headers) != top - bottom:
+                return None
+            for position in reversed(range(bottom, top)):
+                peer_hash = headers[position - bottom].hash
+                if peer_hash == self.chain[position].hash:
+                    return position + 1
+            top = bottom
+            window *= 2
+        return 0
 
-            if block.previous_hash != last_block.hash:
-                return False
+    @typechecked
+    def sync_with(
+        self,
+        node: str,
+        peer_length: int,
+        deadline_at: float,
+    ) -> bool:
+        """Switches to ``node``'s chain if it has more work than ours and
+        is valid, fetching and validating only the blocks after the common
+        ancestor.
 
-            timestamp_difference = block.timestamp - last_block.timestamp
-            if not (0 < timestamp_difference < 2 * 60 * 60 * 1000):
-                return False
+        """
+        shared = self.common_prefix_length(node, peer_length, deadline_at)
+        if shared is None or shared < self.pruned_height:
+            return False
+        if self.sync_mode == SYNC_HEADERS_FIRST:
+            blocks = self.fetch_headers_first(
+                node, shared, peer_length, deadline_at,
+            )
+        else:
+            blocks = self.peer_client.fetch_blocks(node, shared, deadline_at)
+        if blocks is None:
+            return False
 
-            if not BlockChain.valid_proof(last_block.proof, block.proof):
+        # Validate the peer's blocks on the balances at the common ancestor,
+        # on a snapshot of our chain so that blocks keep being created
+        # meanwhile.
+        with self.chain_lock:
+            chain = self.chain
+            length = len(chain)
+            if self.index.work(chain, shared) + sum(
+                block_work(block.target) for block in blocks
+            ) <= self.index.work(chain, length):
                 return False
+            ledger = self.branch_ledger(chain, shared, blocks)
+        ancestor = chain[shared - 1] if shared else None
+        validator = ChainValidator(
+            ledger=ledger,
+            last_block=ancestor,
+            last_hash=ancestor.hash if ancestor else None,
+            timestamps=timestamp_window(
+                chain[max(0, shared - RETARGET_INTERVAL):shared],
+            ),
+        )
+        try:
+            self.verifier.verify(validator, blocks)
+        except InvalidChainError:
+            return False
 
-            mining_reward_valid = False
-            for transaction in block.transactions:
-                if transaction.sender == MINING_REWARD_SENDER:
-                    if mining_reward_valid:
-                        return False
-                    if transaction.amount != MINING_REWARD:
-                        return False
-                    mining_reward_valid = True
-                else:
-                    if not BlockChain.valid_transaction(
-                        block_chain, transaction
-                    ):
-                        return False
+        with self.chain_lock:
+            if self.chain is not chain or len(chain) != length:
+                # Our tip moved while the peer's blocks were validated; the
+                # next round of consensus will compare the chains again.
+                return False
+            self.switch_branch(chain, shared, blocks)
+        return True
 
-            last_block = block
-            current_index += 1
+    @typechecked
+    def fetch_headers_first(
+        self,
+        node: str,
+        shared: int,
+        peer_length: int,
+        deadline_at: float,
+    ) -> typing.Optional[typing.List[Block]]:
+        """Fetches the blocks of ``node``'s chain after the first ``shared``,
+        up to ``peer_length``.  Their headers are fetched and validated
+        first, so a bogus chain costs its headers, up to the first invalid
+        one.  The blocks are then downloaded in parallel and checked against
+        the headers.  Returns :const:`None` if any of it fails.
 
-        return True
+        """
+        if peer_length <= len(self.chain):
+            return None
+        ancestor = self.chain[shared - 1] if shared else None
+        validator = HeaderChainValidator(
+            position=shared,
+            last_header=ancestor.header() if ancestor else None,
+            timestamps=timestamp_window(
+                self.chain[max(0, shared - RETARGET_INTERVAL):shared],
+            ),
+        )
+        headers = []
+        for start in range(shared, peer_length, HEADERS_BATCH):
+            stop = min(start + HEADERS_BATCH, peer_length)
+            batch = self.peer_client.fetch_headers(
+                node, start, stop, deadline_at,
+            )
+            if batch is None or len(batch) != stop - start:
+                return None
+            try:
+                for header in batch:
+                    validator.validate(header)
+            except InvalidChainError:
+                return None
+            headers.extend(batch)
+        blocks = self.peer_client.fetch_bodies(
+            node, shared, peer_length, deadline_at,
+        )
+        if blocks is None:
+            return None
+        for block, header in zip(blocks, headers):
+            if block.header() != header:
+                return None
+        return blocks
 
     @typechecked
     def resolve_conflicts(self) -> bool:
@@ -185,25 +952,447 @@ class BlockChain:
         by replacing our chain with the longest one in the network.
 
         """
-        neighbours = self.nodes
-        new_chain = None
+        deadline_at = time.monotonic() + self.peer_client.deadline
+        lengths = self.peer_client.fetch_lengths(self.nodes, deadline_at)
+        longer = sorted(
+            (node for node, length in lengths.items()
+             if length > len(self.chain)),
+            key=lengths.__getitem__,
+            reverse=True,
+        )
+        # Peers come longest first, so the first valid chain wins.
+        for node in longer:
+            if self.sync_with(node, lengths[node], deadline_at):
+                return True
+        return False
 
-        max_length = len(self.chain)
 
-        for node in neighbours:
-            response = get(f'http://{node}/chain/')
+@dataclasses.dataclass
+class ChainValidator:
+    """Validates blocks one at a time, in chain order.
 
-            if response.ok:
-                data = response.json()
-                length = data['length']
-                chain = [Block.deserialize(block) for block in data['chain']]
+    The validator keeps the running balances of every block it has
+    accepted, so each transaction is checked against the history before
+    it and each block is hashed exactly once.
 
-                if length > max_length and BlockChain.valid_chain(chain):
-                    max_length = length
-                    new_chain = chain
+    """
 
-        if new_chain:
-            self.chain = new_chain
-            return True
+    ledger: Ledger = dataclasses.field(default_factory=Ledger)
+    last_block: typing.Optional[Block] = None
+    last_hash: typing.Optional[bytes] = None
+    #: Timestamps of the last accepted blocks, for retargeting.
+    timestamps: typing.Deque[int] = dataclasses.field(
+        default_factory=lambda: timestamp_window([]),
+    )
 
-        return False
+    @hot_path
+    def validate(self, block: Block) -> None:
+        """Validates ``block`` as the successor of the last accepted block,
+        and accepts it.
+
+        """
+        started_at = time.perf_counter()
+        try:
+            validate_link(
+                self.ledger.height,
+                self.last_block,
+                self.last_hash,
+                block,
+                self.timestamps,
+            )
+            self.accept(block)
+        finally:
+            BLOCK_VALIDATION_SECONDS.observe(time.perf_counter() - started_at)
+
+    @hot_path
+    def accept(self, block: Block) -> None:
+        """Checks the transactions of ``block`` against the balances, and
+        accepts it.  Its link to the last accepted block must have been
+        validated already, e.g. by :func:`check_links`.
+
+        """
+        position = self.ledger.height
+        balances = self.ledger.confirmed
+        zero = decimal.Decimal()
+        mining_rewarded = False
+        for transaction in block.transactions:
+            if transaction.sender == MINING_REWARD_SENDER:
+                if mining_rewarded:
+                    raise InvalidChainError(
+                        position, 'more than one mining reward',
+                    )
+                if transaction.amount != MINING_REWARD:
+                    raise InvalidChainError(
+                        position, f'mining reward must be {MINING_REWARD}',
+                    )
+                mining_rewarded = True
+            elif balances.get(transaction.sender, zero) < transaction.amount:
+                raise InvalidChainError(
+                    position,
+                    f'sender {transaction.sender.hex()} does not have '
+                    f'sufficient balance',
+                )
+            Ledger.apply(balances, transaction)
+
+        self.ledger.height += 1
+        self.last_block = block
+        self.last_hash = block.hash
+        self.timestamps.append(block.timestamp)
+
+
+@dataclasses.dataclass
+class ChainVerifier:
+    """Validates runs of blocks, on a process pool if it has more than one
+    worker.
+
+    Everything about a block but its transactions -- its hash, its link to
+    the block before it, its timestamp, target and proof -- only depends on
+    the blocks before it, so those checks are cut into chunks of
+    ``chunk_size`` blocks that ``workers`` processes run with
+    :func:`check_frames`.  The balances are checked sequentially by a
+    :class:`ChainValidator`, following the chunks in order as they come
+    back, so the first invalid block is the one reported, and no chunk past
+    it is waited for.
+
+    Blocks are shipped to the workers in their :meth:`Block.encode` form,
+    which is several times cheaper to pickle than the blocks themselves,
+    and the hashes the workers compute are kept on the blocks.  Even so, a
+    worker takes over twice as long over a block, decoding it included, as
+    validating it in-process does, so the pool only pays off with several
+    workers and on long runs: runs shorter than ``min_pool_length`` are
+    validated in this process, like every run of a verifier with a single
+    worker, which is the default.
+
+    The pool is started on first use, with the ``forkserver`` method where
+    there is one rather than forking a threaded server, and is kept until
+    :meth:`close`.
+
+    """
+
+    workers: int = 1
+    chunk_size: int = VERIFY_CHUNK_SIZE
+    min_pool_length: int = VERIFY_MIN_POOL_LENGTH
+    _pool: typing.Optional[concurrent.futures.Executor] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False,
+    )
+    _pool_lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False,
+    )
+
+    @typechecked
+    def verify(
+        self,
+        validator: ChainValidator,
+        blocks: typing.Sequence[Block],
+    ) -> None:
+        """Validates ``blocks`` as the successors of the last block
+        ``validator`` accepted, and accepts them.
+
+        Raises :exc:`InvalidChainError` for the first invalid block.
+
+        """
+        if self.workers <= 1 or len(blocks) < self.min_pool_length:
+            for block in blocks:
+                validator.validate(block)
+            return
+        self._verify_in_pool(self.pool(), validator, blocks)
+
+    def pool(self) -> concurrent.futures.Executor:
+        """The process pool of the verifier, started if it is not yet."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = process_pool(self.workers)
+            return self._pool
+
+    def close(self) -> None:
+        """Shuts the process pool down, if it was started."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    @hot_path
+    def _verify_in_pool(
+        self,
+        pool: concurrent.futures.Executor,
+        validator: ChainValidator,
+        blocks: typing.Sequence[Block],
+    ) -> None:
+        position = validator.ledger.height
+        timestamps = list(validator.timestamps)
+        chunks = range(0, len(blocks), self.chunk_size)
+
+        def submit(start: int) -> concurrent.futures.Future:
+            if start:
+                # The worker hashes the block before its chunk itself
+                # rather than wait for the worker of the chunk before.
+                last, last_hash = blocks[start - 1].encode(), None
+            else:
+                last, last_hash = validator.last_block, validator.last_hash
+            window = timestamps + [
+                block.timestamp
+                for block in blocks[max(0, start - RETARGET_INTERVAL):start]
+            ]
+            return pool.submit(
+                check_frames,
+                position + start,
+                last,
+                last_hash,
+                [
+                    block.encode()
+                    for block in blocks[start:start + self.chunk_size]
+                ],
+                window[-RETARGET_INTERVAL:],
+            )
+
+        # Keep every worker busy with one extra chunk queued, like
+        # :class:`~uaena.mining.Miner`, and check the balances of each chunk
+        # as soon as it is back.
+        in_flight = collections.deque(
+            submit(start) for start in chunks[:self.workers * 2]
+        )
+        pending = iter(chunks[self.workers * 2:])
+        try:
+            for start in chunks:
+                hashes, durations, failure = in_flight.popleft().result()
+                next_start = next(pending, None)
+                if next_start is not None:
+                    in_flight.append(submit(next_start))
+                for block, block_hash, duration in zip(
+                    blocks[start:], hashes, durations,
+                ):
+                    block.remember_hash(block_hash)
+                    started_at = time.perf_counter()
+                    try:
+                        validator.accept(block)
+                    finally:
+                        BLOCK_VALIDATION_SECONDS.observe(
+                            duration + time.perf_counter() - started_at,
+                        )
+                if failure is not None:
+                    # The links of the invalid block were checked as well.
+                    BLOCK_VALIDATION_SECONDS.observe(durations[len(hashes)])
+                    raise InvalidChainError(*failure)
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+
+def process_pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    """A pool of ``workers`` processes, started with the ``forkserver``
+    method where there is one, or else ``spawn``, rather than forking a
+    process that may be running threads, like a server.
+
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return concurrent.futures.ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context(
+            'forkserver' if 'forkserver' in methods else 'spawn',
+        ),
+    )
+
+
+@hot_path
+def check_frames(
+    position: int,
+    last: typing.Union[bytes, Block, BlockHeader, None],
+    last_hash: typing.Optional[bytes],
+    frames: typing.Sequence[bytes],
+    timestamps: typing.Sequence[int],
+) -> typing.Tuple[
+    typing.List[bytes],
+    typing.List[float],
+    typing.Optional[typing.Tuple[int, str]],
+]:
+    """:func:`check_links` over blocks in their :meth:`Block.encode` form,
+    ``last`` included if it is :class:`bytes`, for a worker of a
+    :class:`ChainVerifier`.
+
+    """
+    if isinstance(last, bytes):
+        last = Block.decode(last)
+    return check_links(
+        position,
+        last,
+        last_hash,
+        [Block.decode(frame) for frame in frames],
+        timestamps,
+    )
+
+
+@hot_path
+def check_links(
+    position: int,
+    last: typing.Union[Block, BlockHeader, None],
+    last_hash: typing.Optional[bytes],
+    blocks: typing.Sequence[Block],
+    timestamps: typing.Sequence[int],
+) -> typing.Tuple[
+    typing.List[bytes],
+    typing.List[float],
+    typing.Optional[typing.Tuple[int, str]],
+]:
+    """Runs :func:`validate_link` over ``blocks``, which start at
+    ``position`` and follow ``last``, whose hash is ``last_hash`` (computed
+    if :const:`None`).  ``timestamps`` are those of the blocks before them,
+    for retargeting.
+
+    Returns the hashes of the blocks up to the first invalid one, how long
+    checking each block took, the invalid one included, and the position of
+    that block with the reason it is invalid, if any.
+
+    """
+    if last is not None and last_hash is None:
+        last_hash = last.hash
+    window = collections.deque(timestamps, maxlen=RETARGET_INTERVAL)
+    hashes = []
+    durations = []
+    for offset, block in enumerate(blocks):
+        started_at = time.perf_counter()
+        try:
+            validate_link(position + offset, last, last_hash, block, window)
+        except InvalidChainError as e:
+            durations.append(time.perf_counter() - started_at)
+            return hashes, durations, (e.index, e.reason)
+        last = block
+        last_hash = block.hash
+        hashes.append(last_hash)
+        durations.append(time.perf_counter() - started_at)
+        window.append(block.timestamp)
+    return hashes, durations, None
+
+
+@dataclasses.dataclass
+class HeaderChainValidator:
+    """Validates block headers one at a time, in chain order, checking
+    their linkage, timestamps and proofs of work without the transactions.
+
+    """
+
+    position: int = 0
+    last_header: typing.Optional[BlockHeader] = None
+    #: Timestamps of the last accepted headers, for retargeting.
+    timestamps: typing.Deque[int] = dataclasses.field(
+        default_factory=lambda: timestamp_window([]),
+    )
+
+    @hot_path
+    def validate(self, header: BlockHeader) -> None:
+        """Validates ``header`` as the successor of the last accepted
+        header, and accepts it.
+
+        """
+        last_header = self.last_header
+        validate_link(
+            self.position,
+            last_header,
+            last_header.hash if last_header else None,
+            header,
+            self.timestamps,
+        )
+        if not header.valid_hash():
+            raise InvalidChainError(
+                self.position, 'hash does not match header',
+            )
+        self.position += 1
+        self.last_header = header
+        self.timestamps.append(header.timestamp)
+
+
+@hot_path
+def validate_link(
+    position: int,
+    last: typing.Union[Block, BlockHeader, None],
+    last_hash: typing.Optional[bytes],
+    current: typing.Union[Block, BlockHeader],
+    timestamps: typing.Sequence[int],
+) -> None:
+    """Checks that the block or header ``current`` at ``position`` can
+    follow ``last``, whose hash is ``last_hash``, raising
+    :exc:`InvalidChainError` otherwise.  ``timestamps`` are those of the
+    blocks before it, for retargeting.
+
+    """
+    if current.version not in BLOCK_VERSIONS:
+        raise InvalidChainError(position, 'unknown block version')
+    check_fields(position, current)
+    # Retargeting only starts with the first block that records a target or
+    # a later version, so chains made before it keep validating.
+    if not (untargeted(current) and (last is None or untargeted(last))):
+        target = expected_target(
+            position, last.target if last else INITIAL_TARGET, timestamps,
+        )
+        if current.target != target:
+            raise InvalidChainError(position, 'unexpected target')
+    if last is None:
+        return
+    if current.index - last.index != 1:
+        raise InvalidChainError(position, 'index is not sequential')
+    if current.previous_hash != last_hash:
+        raise InvalidChainError(position, 'previous_hash does not match')
+    timestamp_difference = current.timestamp - last.timestamp
+    if not (0 < timestamp_difference < MAX_BLOCK_INTERVAL):
+        raise InvalidChainError(position, 'timestamp out of range')
+    if not BlockChain.valid_proof(last.proof, current.proof, current.target):
+        raise InvalidChainError(position, 'invalid proof')
+
+
+@hot_path
+def check_fields(position: int, entry: ChainEntry) -> None:
+    """Raises :exc:`InvalidChainError` unless the block or header
+    ``entry`` at ``position`` fits its binary encoding, which every peer
+    may ask for.
+
+    """
+    try:
+        pack_fields(
+            entry.version,
+            entry.index,
+            entry.timestamp,
+            entry.proof,
+            entry.previous_hash,
+        )
+        target_bytes(entry.target)
+    except ValueError:
+        raise InvalidChainError(position, 'field out of range')
+
+
+@hot_path
+def untargeted(entry: ChainEntry) -> bool:
+    """Whether ``entry`` could have been made before targets were: a block
+    of :const:`~uaena.block.BLOCK_VERSION_JSON` at
+    :const:`~uaena.difficulty.INITIAL_TARGET`, which records neither.
+
+    """
+    return entry.version == BLOCK_VERSION_JSON and \
+        entry.target == INITIAL_TARGET
+
+
+@hot_path
+def pruned_length(chain: typing.Sequence[ChainEntry]) -> int:
+    """The number of headers at the start of ``chain``, which are followed
+    by blocks only.
+
+    """
+    if not chain or isinstance(chain[0], Block):
+        return 0
+    low, high = 0, len(chain)
+    while low < high:
+        middle = (low + high) // 2
+        if isinstance(chain[middle], BlockHeader):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+@hot_path
+def timestamp_window(
+    blocks: typing.Sequence[ChainEntry],
+) -> typing.Deque[int]:
+    """The timestamps of the last blocks, as many as retargeting needs."""
+    return collections.deque(
+        (block.timestamp for block in blocks[-RETARGET_INTERVAL:]),
+        maxlen=RETARGET_INTERVAL,
+    )
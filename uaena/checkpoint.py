@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import dataclasses
+import decimal
+import hashlib
+import json
+import os
+import pathlib
+import struct
+import typing
+
+from typeguard import typechecked
+
+from .typecheck import hot_path
+
+#: Checkpoints kept on disk; older ones are removed as new ones are written.
+KEEP_CHECKPOINTS = 3
+
+
+@dataclasses.dataclass(frozen=True)
+class Checkpoint:
+    """The confirmed balance of every address after the first ``height``
+    blocks of a chain, the last of which hashes to ``block_hash``.
+
+    A checkpoint is committed to by its :attr:`hash`, so a node given the
+    hash of a checkpoint it trusts can take the balances from any peer, and
+    only has to validate the blocks after it.
+
+    """
+
+    height: int
+    block_hash: bytes
+    balances: typing.Mapping[bytes, decimal.Decimal]
+
+    @hot_path
+    def encode(self) -> bytes:
+        """Canonical binary form of the checkpoint, used for hashing.
+        Addresses are sorted, and zero balances left out.
+
+        """
+        parts = [
+            struct.pack('>QB', self.height, len(self.block_hash)),
+            self.block_hash,
+        ]
+        for address, balance in sorted(self.balances.items()):
+            if not balance:
+                continue
+            amount = str(balance).encode()
+            parts.extend([
+                struct.pack('>B', len(address)), address,
+                struct.pack('>B', len(amount)), amount,
+            ])
+        return b''.join(parts)
+
+    @property
+    @hot_path
+    def hash(self) -> bytes:
+        return hashlib.sha256(self.encode()).digest()
+
+    @hot_path
+    def serialize(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'height': self.height,
+            'block_hash': self.block_hash.hex(),
+            'balances': {
+                address.hex(): str(balance)
+                for address, balance in sorted(self.balances.items())
+                if balance
+            },
+            'hash': self.hash.hex(),
+        }
+
+    @staticmethod
+    @hot_path
+    def deserialize(data: typing.Mapping[str, typing.Any]) -> Checkpoint:
+        """Reads a serialized checkpoint, raising :exc:`ValueError` if it
+        does not match the hash it carries.
+
+        """
+        try:
+            checkpoint = Checkpoint(
+                height=int(data['height']),
+                block_hash=bytes.fromhex(data['block_hash']),
+                balances={
+                    bytes.fromhex(address): decimal.Decimal(balance)
+                    for address, balance in data['balances'].items()
+                },
+            )
+            expected = bytes.fromhex(data['hash'])
+        except (KeyError, TypeError, AttributeError,
+                decimal.InvalidOperation) as e:
+            raise ValueError(f'Malformed checkpoint: {e}')
+        if checkpoint.hash != expected:
+            raise ValueError('Checkpoint does not match its hash')
+        return checkpoint
+
+
+@dataclasses.dataclass
+class CheckpointStore:
+    """Directory of checkpoints, one ``checkpoint-NNNNNNNNNNNN.json`` file
+    per height.  Files are written to a temporary name and renamed into
+    place, so a crash never leaves a torn checkpoint behind.
+
+    """
+
+    path: pathlib.Path
+    keep: int = KEEP_CHECKPOINTS
+
+    def __post_init__(self) -> None:
+        self.path = pathlib.Path(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    @typechecked
+    def checkpoint_path(self, height: int) -> pathlib.Path:
+        return self.path / f'checkpoint-{height:012d}.json'
+
+    @typechecked
+    def heights(self) -> typing.List[int]:
+        """Heights of the stored checkpoints, latest first."""
+        return sorted(
+            (int(path.stem.split('-')[1])
+             for path in self.path.glob('checkpoint-*.json')),
+            reverse=True,
+        )
+
+    @typechecked
+    def load(self, height: int) -> typing.Optional[Checkpoint]:
+        """The checkpoint at ``height``, or :const:`None` if there is none
+        or it is damaged.
+
+        """
+        try:
+            with self.checkpoint_path(height).open() as f:
+                return Checkpoint.deserialize(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    @typechecked
+    def __iter__(self) -> typing.Iterator[Checkpoint]:
+        """The intact checkpoints, latest first."""
+        for height in self.heights():
+            checkpoint = self.load(height)
+            if checkpoint is not None:
+                yield checkpoint
+
+    @typechecked
+    def save(self, checkpoint: Checkpoint) -> None:
+        path = self.checkpoint_path(checkpoint.height)
+        temporary = path.with_suffix('.tmp')
+        with temporary.open('w') as f:
+            json.dump(checkpoint.serialize(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, path)
+        for height in self.heights()[self.keep:]:
+            self.checkpoint_path(height).unlink(missing_ok=True)
@@ -0,0 +1,319 @@
+import concurrent.futures
+import dataclasses
+import json
+import time
+import typing
+
+import requests
+from requests.adapters import HTTPAdapter
+from typeguard import TypeCheckError, typechecked
+
+from .block import Block, BlockHeader
+from .checkpoint import Checkpoint
+from .metrics import PEER_REQUEST_SECONDS, PEER_RESPONSE_BYTES
+from .wire import BLOCKS_MIMETYPE, decode_blocks, encode_blocks
+
+TIMEOUT = 5.0
+DEADLINE = 30.0
+RETRIES = 2
+BACKOFF = 0.1
+MAX_WORKERS = 8
+#: Blocks fetched per request when downloading block bodies in parallel.
+BODY_BATCH = 64
+
+
+@dataclasses.dataclass
+class PeerClient:
+    """Fetches chains from peer nodes concurrently.
+
+    Requests go through a single pooled :class:`requests.Session`.  Each
+    request is bounded by ``timeout`` and retried ``retries`` times with
+    exponential ``backoff``, and every fetch as a whole is bounded by
+    ``deadline`` seconds: peers that have not answered by then are ignored.
+
+    Blocks are asked for in the binary :mod:`uaena.wire` format if
+    ``binary`` is set, falling back to JSON for peers that only speak that.
+
+    """
+
+    timeout: float = TIMEOUT
+    deadline: float = DEADLINE
+    retries: int = RETRIES
+    backoff: float = BACKOFF
+    max_workers: int = MAX_WORKERS
+    body_batch: int = BODY_BATCH
+    binary: bool = True
+    session: requests.Session = dataclasses.field(
+        default_factory=requests.Session, repr=False, compare=False,
+    )
+
+    def __post_init__(self) -> None:
+        adapter = HTTPAdapter(pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @typechecked
+    def request(
+        self,
+        method: str,
+        url: str,
+        deadline_at: float,
+        **kwargs: typing.Any,
+    ) -> typing.Optional[requests.Response]:
+        """Sends a request, or returns :const:`None` if the peer fails to
+        answer successfully before ``deadline_at`` (a :func:`time.monotonic`
+        value).  How long it took and how large the answer was are recorded
+        in :mod:`uaena.metrics`.
+
+        """
+        started_at = time.perf_counter()
+        response = self._send(method, url, deadline_at, **kwargs)
+        PEER_REQUEST_SECONDS.observe(
+            time.perf_counter() - started_at,
+            method, 'failed' if response is None else 'ok',
+        )
+        if response is not None:
+            PEER_RESPONSE_BYTES.observe(len(response.content), method)
+        return response
+
+    @typechecked
+    def _send(
+        self,
+        method: str,
+        url: str,
+        deadline_at: float,
+        **kwargs: typing.Any,
+    ) -> typing.Optional[requests.Response]:
+        attempt = 0
+        while True:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                response = self.session.request(
+                    method, url, timeout=min(self.timeout, remaining),
+                    **kwargs,
+                )
+            except requests.RequestException:
+                pass
+            else:
+                if response.ok:
+                    return response
+                if response.status_code < 500:
+                    return None
+            if attempt >= self.retries:
+                return None
+            time.sleep(
+                min(self.backoff * 2 ** attempt,
+                    max(0, deadline_at - time.monotonic())),
+            )
+            attempt += 1
+
+    @typechecked
+    def get(
+        self,
+        url: str,
+        deadline_at: float,
+        accept: typing.Optional[str]=None,
+    ) -> typing.Optional[requests.Response]:
+        headers = {'Accept': accept} if accept else {}
+        return self.request('GET', url, deadline_at, headers=headers)
+
+    @typechecked
+    def get_json(
+        self,
+        url: str,
+        deadline_at: float,
+    ) -> typing.Optional[typing.Any]:
+        """Fetches ``url`` and decodes its JSON body, or returns
+        :const:`None` if the peer fails to answer before ``deadline_at``.
+
+        """
+        response = self.get(url, deadline_at)
+        if response is None:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    @typechecked
+    def fetch_length(
+        self,
+        node: str,
+        deadline_at: float,
+    ) -> typing.Optional[int]:
+        data = self.get_json(f'http://{node}/chain/length/', deadline_at)
+        try:
+            return int(data['length'])
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    @typechecked
+    def fetch_checkpoint(
+        self,
+        node: str,
+        checkpoint_hash: bytes,
+        deadline_at: float,
+    ) -> typing.Optional[Checkpoint]:
+        data = self.get_json(
+            f'http://{node}/checkpoints/{checkpoint_hash.hex()}/',
+            deadline_at,
+        )
+        try:
+            return Checkpoint.deserialize(data)
+        except (TypeError, TypeCheckError, ValueError):
+            return None
+
+    @typechecked
+    def fetch_headers(
+        self,
+        node: str,
+        start: int,
+        stop: int,
+        deadline_at: float,
+    ) -> typing.Optional[typing.List[BlockHeader]]:
+        """Fetches the headers of the blocks at positions ``start`` to
+        ``stop`` of the node's chain.
+
+        """
+        data = self.get_json(
+            f'http://{node}/chain/headers/?from={start}&to={stop}',
+            deadline_at,
+        )
+        try:
+            return [
+                BlockHeader.deserialize(header) for header in data['headers']
+            ]
+        except (KeyError, TypeError, TypeCheckError, ValueError):
+            return None
+
+    @typechecked
+    def fetch_blocks(
+        self,
+        node: str,
+        start: int,
+        deadline_at: float,
+        limit: typing.Optional[int]=None,
+    ) -> typing.Optional[typing.List[Block]]:
+        """Fetches the blocks of the node's chain from position ``start``,
+        at most ``limit`` of them if given.
+
+        """
+        url = f'http://{node}/chain/blocks/?from={start}'
+        if limit is not None:
+            url += f'&limit={limit}'
+        accept = f'{BLOCKS_MIMETYPE}, application/json;q=0.5' \
+            if self.binary else 'application/json'
+        response = self.get(url, deadline_at, accept)
+        if response is None:
+            return None
+        mimetype = response.headers.get('Content-Type', '').split(';')[0]
+        try:
+            if mimetype.strip() == BLOCKS_MIMETYPE:
+                return decode_blocks(response.content)
+            data = response.json()
+            return [Block.deserialize(block) for block in data['blocks']]
+        except (KeyError, TypeError, TypeCheckError, ValueError):
+            return None
+
+    @typechecked
+    def fetch_bodies(
+        self,
+        node: str,
+        start: int,
+        stop: int,
+        deadline_at: float,
+    ) -> typing.Optional[typing.List[Block]]:
+        """Fetches the blocks at positions ``start`` to ``stop`` of the
+        node's chain, ``body_batch`` blocks per request, several requests at
+        once.  Returns :const:`None` unless every block arrives before
+        ``deadline_at``.
+
+        """
+        starts = range(start, stop, self.body_batch)
+        if not starts:
+            return []
+        pool = concurrent.futures.ThreadPoolExecutor(
+            min(self.max_workers, len(starts)),
+        )
+        try:
+            futures = [
+                pool.submit(
+                    self.fetch_blocks, node, batch_start, deadline_at,
+                    min(self.body_batch, stop - batch_start),
+                )
+                for batch_start in starts
+            ]
+            done, _ = concurrent.futures.wait(
+                futures, timeout=max(0, deadline_at - time.monotonic()),
+            )
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        blocks = []
+        for batch_start, future in zip(starts, futures):
+            batch = future.result() if future in done else None
+            if batch is None or \
+                    len(batch) != min(self.body_batch, stop - batch_start):
+                return None
+            blocks.extend(batch)
+        return blocks
+
+    @typechecked
+    def announce(
+        self,
+        node: str,
+        block: Block,
+        deadline_at: float,
+    ) -> typing.Optional[str]:
+        """Announces ``block`` to ``node``, and returns what the node did
+        with it, or :const:`None` if it failed to answer or rejected it.
+
+        """
+        if self.binary:
+            data = b''.join(encode_blocks([block]))
+            content_type = BLOCKS_MIMETYPE
+        else:
+            data = json.dumps(block.serialize()).encode()
+            content_type = 'application/json'
+        response = self.request(
+            'POST', f'http://{node}/chain/announce/', deadline_at,
+            data=data, headers={'Content-Type': content_type},
+        )
+        try:
+            return str(response.json()['outcome'])
+        except (AttributeError, KeyError, TypeError, ValueError):
+            return None
+
+    @typechecked
+    def fetch_lengths(
+        self,
+        nodes: typing.Iterable[str],
+        deadline_at: float,
+    ) -> typing.Mapping[str, int]:
+        """Asks every node for the length of its chain at once.  Nodes that
+        fail to answer before ``deadline_at`` are left out.
+
+        """
+        nodes = list(nodes)
+        if not nodes:
+            return {}
+        pool = concurrent.futures.ThreadPoolExecutor(
+            min(self.max_workers, len(nodes)),
+        )
+        try:
+            futures = {
+                pool.submit(self.fetch_length, node, deadline_at): node
+                for node in nodes
+            }
+            done, _ = concurrent.futures.wait(
+                futures, timeout=max(0, deadline_at - time.monotonic()),
+            )
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+        lengths = {}
+        for future in done:
+            length = future.result()
+            if length is not None:
+                lengths[futures[future]] = length
+        return lengths
@@ -0,0 +1,74 @@
+import typing
+
+from .typecheck import hot_path
+
+#: Leading zero hex digits the hash of a proof needed before difficulty was
+#: recorded in blocks.
+DIFFICULTY = 4
+#: A proof is valid if the SHA-256 digest of the previous proof and the proof,
+#: read as a big-endian integer, is below the block's target.  Blocks that
+#: do not record a target have this one, which is the same as requiring
+#: :const:`DIFFICULTY` leading zero hex digits.
+INITIAL_TARGET = 1 << (256 - 4 * DIFFICULTY)
+#: The easiest target retargeting may go up to.
+MAX_TARGET = (1 << 256) - 1
+#: The target is adjusted every this many blocks...
+RETARGET_INTERVAL = 100
+#: ...so that blocks come this many milliseconds apart...
+TARGET_BLOCK_INTERVAL = 60 * 1000
+#: ...by at most this factor either way at a time.
+MAX_ADJUSTMENT = 4
+
+
+@hot_path
+def target_bytes(target: int) -> bytes:
+    """The target as a 32-byte big-endian string, which compares with raw
+    digests the same way the integers compare.
+
+    Raises :exc:`ValueError` if the target does not fit.
+
+    """
+    try:
+        return target.to_bytes(32, 'big')
+    except OverflowError as e:
+        raise ValueError(f'Target out of range: {e}')
+
+
+@hot_path
+def expected_target(
+    position: int,
+    last_target: int,
+    timestamps: typing.Sequence[int],
+) -> int:
+    """The target of the block at ``position`` of a chain, given the target
+    of the block before it and the timestamps of the up to
+    :const:`RETARGET_INTERVAL` blocks before it, oldest first.
+
+    The target is kept from block to block, and scaled at every multiple of
+    :const:`RETARGET_INTERVAL` by how long the last interval's blocks took
+    against how long they should have.
+
+    """
+    if position == 0:
+        return INITIAL_TARGET
+    if position % RETARGET_INTERVAL:
+        return last_target
+    if len(timestamps) < RETARGET_INTERVAL:
+        raise ValueError(
+            f'Retargeting needs the timestamps of the last '
+            f'{RETARGET_INTERVAL} blocks',
+        )
+    expected = (RETARGET_INTERVAL - 1) * TARGET_BLOCK_INTERVAL
+    actual = timestamps[-1] - timestamps[-RETARGET_INTERVAL]
+    actual = max(expected // MAX_ADJUSTMENT,
+                 min(actual, expected * MAX_ADJUSTMENT))
+    return max(1, min(MAX_TARGET, last_target * actual // expected))
+
+
+@hot_path
+def block_work(target: int) -> int:
+    """The expected number of hashes it takes to find a proof below
+    ``target``; chains are compared by the sum of the work of their blocks.
+
+    """
+    return (1 << 256) // (target + 1)
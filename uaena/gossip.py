@@ -0,0 +1,131 @@
+import collections
+import concurrent.futures
+import dataclasses
+import threading
+import time
+import typing
+
+from typeguard import typechecked
+
+from .block import Block
+from .block_chain import BLOCK_GAP, BLOCK_KNOWN, BlockChain
+from .consensus import MAX_WORKERS
+
+#: Hashes of the latest blocks remembered, to drop repeated announcements.
+MAX_SEEN = 10000
+#: Seconds at least between two resolutions started by announced blocks.
+RESOLVE_INTERVAL = 10.0
+
+
+@dataclasses.dataclass
+class Gossip:
+    """Pushes new blocks to the ``nodes`` of ``block_chain``, and takes in
+    the blocks they push.
+
+    Every time the tip of the chain moves, be it by a block mined here, a
+    block accepted from a peer or a sync, the new tip is announced to every
+    node, at most ``max_workers`` announcements at once.  An announced block
+    that follows a block we know is validated on its own and attached to the
+    chain or a side branch; if that moves the tip it is relayed further.
+    Only a block whose parent we do not know, and which claims to lead past
+    our tip, makes the node resolve conflicts with its peers.  Its proof of
+    work follows from its parent's proof, so it cannot be checked before
+    the parent arrives; the resolution runs in the background instead, and
+    at most once every ``resolve_interval`` seconds.
+
+    Blocks are remembered by hash, so a block reaching a node from several
+    peers is only looked at once.
+
+    """
+
+    block_chain: BlockChain
+    max_workers: int = MAX_WORKERS
+    max_seen: int = MAX_SEEN
+    resolve_interval: float = RESOLVE_INTERVAL
+    seen: typing.MutableMapping[bytes, None] = dataclasses.field(
+        default_factory=collections.OrderedDict, repr=False,
+    )
+    lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False,
+    )
+    #: Held while resolving conflicts, so announcements arriving meanwhile
+    #: do not start another resolution.
+    resolving: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False,
+    )
+    #: When the last resolution started, by :func:`time.monotonic`.
+    resolved_at: float = dataclasses.field(
+        default=float('-inf'), init=False, repr=False, compare=False,
+    )
+    pool: concurrent.futures.ThreadPoolExecutor = dataclasses.field(
+        init=False, repr=False, compare=False,
+    )
+
+    def __post_init__(self) -> None:
+        self.pool = concurrent.futures.ThreadPoolExecutor(
+            self.max_workers, thread_name_prefix='gossip',
+        )
+        self.block_chain.tip_listeners.append(self.announce)
+
+    @typechecked
+    def remember(self, block_hash: bytes) -> bool:
+        """Remembers ``block_hash``, and tells whether it was new."""
+        with self.lock:
+            if block_hash in self.seen:
+                return False
+            self.seen[block_hash] = None
+            while len(self.seen) > self.max_seen:
+                self.seen.popitem(last=False)
+            return True
+
+    @typechecked
+    def announce(self, block: Block) -> typing.List[concurrent.futures.Future]:
+        """Announces ``block`` to every node in the background, and returns
+        the futures of what each node did with it.
+
+        """
+        self.remember(block.hash)
+        peer_client = self.block_chain.peer_client
+        deadline_at = time.monotonic() + peer_client.deadline
+        return [
+            self.pool.submit(peer_client.announce, node, block, deadline_at)
+            for node in self.block_chain.nodes
+        ]
+
+    @typechecked
+    def receive(self, block: Block) -> str:
+        """Takes in a block announced by a peer, and returns what became of
+        it; see :meth:`BlockChain.accept_block`.
+
+        Raises :exc:`~uaena.block_chain.InvalidChainError` if the block
+        follows a block we know, but is not valid.
+
+        """
+        if not self.remember(block.hash):
+            return BLOCK_KNOWN
+        outcome = self.block_chain.accept_block(block)
+        if outcome == BLOCK_GAP and \
+                block.index > len(self.block_chain.chain):
+            self.resolve()
+        return outcome
+
+    def resolve(self) -> typing.Optional[concurrent.futures.Future]:
+        """Resolves conflicts with the peers in the background, and returns
+        the future of whether the chain was replaced.  :const:`None` if a
+        resolution is already running, or the last one started less than
+        ``resolve_interval`` seconds ago.
+
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now < self.resolved_at + self.resolve_interval or \
+                    not self.resolving.acquire(blocking=False):
+                return None
+            self.resolved_at = now
+        return self.pool.submit(self._resolve)
+
+    def _resolve(self) -> bool:
+        try:
+            return self.block_chain.resolve_conflicts()
+        finally:
+            self.resolving.release()
@@ -0,0 +1,140 @@
+import dataclasses
+import threading
+import typing
+
+from .block import Block, ChainEntry
+from .difficulty import block_work
+from .typecheck import hot_path
+
+#: Where a transaction is: the position of its block in the chain, and its
+#: position among the transactions of the block.
+Location = typing.Tuple[int, int]
+
+
+@dataclasses.dataclass
+class ChainIndex:
+    """Secondary indexes of a chain: the transactions touching every
+    address, oldest first, the position of every block by its hash, and
+    the cumulative work of the chain up to every block.
+
+    Like the :class:`~uaena.ledger.Ledger`, the index remembers which chain
+    it was built from and how far it got, so :meth:`sync` only indexes the
+    blocks appended since the last call.  When the chain is swapped for
+    another one, only the blocks after the last block both chains share are
+    unindexed and indexed again.
+
+    """
+
+    by_address: typing.Dict[bytes, typing.List[Location]] = (
+        dataclasses.field(default_factory=dict)
+    )
+    by_hash: typing.Dict[bytes, int] = dataclasses.field(default_factory=dict)
+    #: The total work of the first ``n + 1`` blocks, at position ``n``.
+    cumulative_work: typing.List[int] = dataclasses.field(
+        default_factory=list,
+    )
+    height: int = 0
+    source_chain: typing.Optional[typing.Sequence[ChainEntry]] = (
+        dataclasses.field(default=None, repr=False, compare=False)
+    )
+    lock: threading.RLock = dataclasses.field(
+        default_factory=threading.RLock, repr=False, compare=False,
+    )
+
+    @hot_path
+    def add_block(self, block: ChainEntry) -> None:
+        position = self.height
+        # The header a pruned chain keeps for a block has no transactions to
+        # index.
+        transactions = block.transactions if isinstance(block, Block) else ()
+        for i, transaction in enumerate(transactions):
+            self.by_address.setdefault(
+                transaction.sender, [],
+            ).append((position, i))
+            if transaction.recipient != transaction.sender:
+                self.by_address.setdefault(
+                    transaction.recipient, [],
+                ).append((position, i))
+        self.by_hash[block.hash] = position
+        self.cumulative_work.append(
+            (self.cumulative_work[-1] if position else 0) +
+            block_work(block.target),
+        )
+        self.height += 1
+
+    @hot_path
+    def remove_block(self, block: ChainEntry) -> None:
+        """Undoes :meth:`add_block` for the last indexed ``block``."""
+        self.height -= 1
+        position = self.height
+        transactions = block.transactions if isinstance(block, Block) else ()
+        for transaction in transactions:
+            for address in {transaction.sender, transaction.recipient}:
+                locations = self.by_address.get(address)
+                # The locations of a block are the last of every address
+                # it touches.
+                while locations and locations[-1][0] == position:
+                    locations.pop()
+                if not locations:
+                    self.by_address.pop(address, None)
+        if self.by_hash.get(block.hash) == position:
+            del self.by_hash[block.hash]
+        del self.cumulative_work[position:]
+
+    @hot_path
+    def sync(self, chain: typing.Sequence[ChainEntry]) -> None:
+        """Bring the index up to date with ``chain``."""
+        with self.lock:
+            source = self.source_chain
+            if chain is not source and source is not None:
+                while self.height and (
+                    self.height > len(chain) or
+                    chain[self.height - 1].hash !=
+                    source[self.height - 1].hash
+                ):
+                    self.remove_block(source[self.height - 1])
+            elif len(chain) < self.height:
+                self.by_address = {}
+                self.by_hash = {}
+                self.cumulative_work = []
+                self.height = 0
+            self.source_chain = chain
+            for block in chain[self.height:]:
+                self.add_block(block)
+
+    @hot_path
+    def history(
+        self,
+        chain: typing.Sequence[ChainEntry],
+        address: bytes,
+        start: int=0,
+        limit: typing.Optional[int]=None,
+    ) -> typing.Tuple[int, typing.List[Location]]:
+        """The number of transactions of ``chain`` touching ``address``,
+        and the locations of those from the ``start``-th on, at most
+        ``limit`` of them.
+
+        """
+        with self.lock:
+            self.sync(chain)
+            locations = self.by_address.get(address, [])
+            stop = len(locations) if limit is None else start + limit
+            return len(locations), locations[start:stop]
+
+    @hot_path
+    def position(
+        self,
+        chain: typing.Sequence[ChainEntry],
+        block_hash: bytes,
+    ) -> typing.Optional[int]:
+        """The position of the block of ``chain`` with the given hash."""
+        with self.lock:
+            self.sync(chain)
+            return self.by_hash.get(block_hash)
+
+    @hot_path
+    def work(self, chain: typing.Sequence[ChainEntry], length: int) -> int:
+        """The total work of the first ``length`` blocks of ``chain``."""
+        with self.lock:
+            self.sync(chain)
+            return self.cumulative_work[length - 1] if length else 0
@@ -0,0 +1,87 @@
+import dataclasses
+import decimal
+import typing
+
+from .block import Block, ChainEntry
+from .transaction import Transaction
+from .typecheck import hot_path
+
+
+@dataclasses.dataclass
+class Ledger:
+    """Per-address index of the confirmed balances of a chain.
+
+    The ledger remembers which chain it was built from and how far it got,
+    so :meth:`sync` only applies the blocks appended since the last call
+    and rebuilds from scratch when the chain is swapped for another one.
+    Pending balances are kept by the :class:`~uaena.mempool.Mempool`.
+
+    """
+
+    confirmed: typing.Dict[bytes, decimal.Decimal] = dataclasses.field(
+        default_factory=dict,
+    )
+    height: int = 0
+    source_chain: typing.Optional[typing.Sequence[ChainEntry]] = (
+        dataclasses.field(default=None, repr=False, compare=False)
+    )
+
+    @staticmethod
+    @hot_path
+    def apply(
+        balances: typing.Dict[bytes, decimal.Decimal],
+        transaction: Transaction,
+    ) -> None:
+        zero = decimal.Decimal()
+        balances[transaction.sender] = (
+            balances.get(transaction.sender, zero) - transaction.amount
+        )
+        balances[transaction.recipient] = (
+            balances.get(transaction.recipient, zero) + transaction.amount
+        )
+
+    @staticmethod
+    @hot_path
+    def unapply(
+        balances: typing.Dict[bytes, decimal.Decimal],
+        transaction: Transaction,
+    ) -> None:
+        Ledger.apply(
+            balances,
+            Transaction(
+                sender=transaction.recipient,
+                recipient=transaction.sender,
+                amount=transaction.amount,
+            ),
+        )
+
+    @hot_path
+    def apply_block(self, block: Block) -> None:
+        for transaction in block.transactions:
+            Ledger.apply(self.confirmed, transaction)
+        self.height += 1
+
+    @hot_path
+    def revert_block(self, block: Block) -> None:
+        """Undoes :meth:`apply_block` for the last applied ``block``."""
+        for transaction in reversed(block.transactions):
+            Ledger.unapply(self.confirmed, transaction)
+        self.height -= 1
+
+    @hot_path
+    def sync(self, chain: typing.Sequence[ChainEntry]) -> None:
+        """Bring the index up to date with ``chain``.  The blocks of a pruned
+        chain are only kept from its checkpoint on, so its ledger must start
+        from there.
+
+        """
+        if chain is not self.source_chain or len(chain) < self.height:
+            self.confirmed = {}
+            self.height = 0
+            self.source_chain = chain
+        for block in chain[self.height:]:
+            self.apply_block(block)
+
+    @hot_path
+    def confirmed_balance(self, address: bytes) -> decimal.Decimal:
+        return self.confirmed.get(address, decimal.Decimal())
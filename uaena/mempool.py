@@ -0,0 +1,202 @@
+import dataclasses
+import decimal
+import typing
+
+from .ledger import Ledger
+from .transaction import Transaction
+from .typecheck import hot_path
+
+MAX_SIZE = 100000
+MAX_BLOCK_TRANSACTIONS = 10000
+
+Balance = typing.Callable[[bytes], decimal.Decimal]
+
+
+@dataclasses.dataclass
+class Mempool:
+    """Pool of the transactions waiting to be mined.
+
+    Transactions are kept in admission order and keyed by their hash, so a
+    transaction is only pooled once.  The pool indexes them by sender and
+    keeps the net change they make to each address, so checking whether a
+    sender can afford another transaction takes constant time.
+
+    The pool holds at most ``max_size`` transactions.  Admitting one more
+    evicts the oldest, along with any transaction that spent the funds it
+    brought in, and at most ``max_block_transactions`` are selected for a
+    block.
+
+    """
+
+    max_size: int = MAX_SIZE
+    max_block_transactions: int = MAX_BLOCK_TRANSACTIONS
+    transactions: typing.Dict[bytes, Transaction] = dataclasses.field(
+        default_factory=dict,
+    )
+    by_sender: typing.Dict[bytes, typing.Dict[bytes, None]] = (
+        dataclasses.field(default_factory=dict)
+    )
+    pending: typing.Dict[bytes, decimal.Decimal] = dataclasses.field(
+        default_factory=dict,
+    )
+
+    def __len__(self) -> int:
+        return len(self.transactions)
+
+    def __iter__(self) -> typing.Iterator[Transaction]:
+        return iter(self.transactions.values())
+
+    def __contains__(self, transaction: typing.Any) -> bool:
+        return (
+            isinstance(transaction, Transaction) and
+            transaction.hash in self.transactions
+        )
+
+    @hot_path
+    def pending_balance(self, address: bytes) -> decimal.Decimal:
+        """The net change pooled transactions make to ``address``."""
+        return self.pending.get(address, decimal.Decimal())
+
+    @hot_path
+    def add(self, transaction: Transaction, confirmed: Balance) -> None:
+        """Pools ``transaction``, evicting the oldest transactions if the
+        pool is full.  ``confirmed`` gives the confirmed balance of an
+        address.
+
+        Raises :exc:`ValueError` if the transaction is already pooled, or
+        if it had to be evicted itself.
+
+        """
+        transaction_hash = transaction.hash
+        if transaction_hash in self.transactions:
+            raise ValueError(
+                f'Transaction {transaction_hash.hex()} is already pending',
+            )
+        self.transactions[transaction_hash] = transaction
+        self.by_sender.setdefault(
+            transaction.sender, {},
+        )[transaction_hash] = None
+        Ledger.apply(self.pending, transaction)
+        while len(self.transactions) > self.max_size:
+            self.evict(next(iter(self.transactions)), confirmed)
+        if transaction_hash not in self.transactions:
+            raise ValueError('Mempool is full')
+
+    @hot_path
+    def remove(self, transaction_hash: bytes) -> Transaction:
+        transaction = self.transactions.pop(transaction_hash)
+        spends = self.by_sender[transaction.sender]
+        del spends[transaction_hash]
+        if not spends:
+            del self.by_sender[transaction.sender]
+        Ledger.unapply(self.pending, transaction)
+        for address in (transaction.sender, transaction.recipient):
+            if address in self.pending and not self.pending[address]:
+                del self.pending[address]
+        return transaction
+
+    @hot_path
+    def evict(self, transaction_hash: bytes, confirmed: Balance) -> None:
+        """Removes a transaction, and the latest spends of every address
+        left unable to afford its pooled transactions as a result.
+
+        """
+        evicted = [self.remove(transaction_hash)]
+        while evicted:
+            address = evicted.pop().recipient
+            while (address in self.by_sender and
+                   confirmed(address) + self.pending_balance(address) < 0):
+                latest = next(reversed(self.by_sender[address]))
+                evicted.append(self.remove(latest))
+
+    @hot_path
+    def reorganize(
+        self,
+        dropped: typing.Sequence[Transaction],
+        added: typing.Sequence[Transaction],
+        changed: typing.Iterable[bytes],
+        confirmed: Balance,
+    ) -> None:
+        """Updates the pool after the chain dropped blocks with the
+        ``dropped`` transactions and took on blocks with the ``added`` ones,
+        which ``changed`` the confirmed balances of some addresses.
+        ``confirmed`` gives the balances after the change.
+
+        Added transactions leave the pool.  Dropped ones go back in, ahead
+        of the pooled ones, since they came first.  Then the pool is walked
+        in order, and every spend of the addresses involved that is no
+        longer covered by their confirmed balance and the transactions
+        before it is evicted, which in turn involves its recipient, so a
+        prefix of the pool stays affordable.
+
+        """
+        included = {transaction.hash for transaction in added}
+        for transaction_hash in included:
+            if transaction_hash in self.transactions:
+                self.remove(transaction_hash)
+        restored = {}
+        for transaction in dropped:
+            transaction_hash = transaction.hash
+            if transaction_hash not in included and \
+                    transaction_hash not in self.transactions:
+                restored[transaction_hash] = transaction
+        if restored:
+            self.transactions = {**restored, **self.transactions}
+            senders = {}
+            for transaction_hash, transaction in restored.items():
+                senders.setdefault(
+                    transaction.sender, {},
+                )[transaction_hash] = None
+                Ledger.apply(self.pending, transaction)
+            for sender, spends in senders.items():
+                self.by_sender[sender] = {
+                    **spends, **self.by_sender.get(sender, {}),
+                }
+            while len(self.transactions) > self.max_size:
+                self.evict(next(iter(self.transactions)), confirmed)
+        involved = {
+            address
+            for transaction in dropped
+            for address in (transaction.sender, transaction.recipient)
+        }
+        involved.update(changed)
+        zero = decimal.Decimal()
+        funds = {}
+        changes = {}
+        unaffordable = []
+        for transaction_hash, transaction in self.transactions.items():
+            sender = transaction.sender
+            if sender in involved:
+                if sender not in funds:
+                    funds[sender] = confirmed(sender)
+                if funds[sender] + changes.get(sender, zero) < \
+                        transaction.amount:
+                    unaffordable.append(transaction_hash)
+                    involved.add(transaction.recipient)
+                    continue
+            Ledger.apply(changes, transaction)
+        for transaction_hash in unaffordable:
+            self.remove(transaction_hash)
+
+    @hot_path
+    def select(self) -> typing.List[Transaction]:
+        """The oldest transactions, at most as many as fit in a block.
+
+        A prefix of the pool is always affordable, since every transaction
+        was admitted on the funds of the ones before it.
+
+        """
+        selected = []
+        for transaction in self.transactions.values():
+            if len(selected) >= self.max_block_transactions:
+                break
+            selected.append(transaction)
+        return selected
+
+    def clear(self) -> typing.List[Transaction]:
+        """Empties the pool, returning what it held."""
+        transactions = list(self.transactions.values())
+        self.transactions = {}
+        self.by_sender = {}
+        self.pending = {}
+        return transactions
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import dataclasses
+import hashlib
+import typing
+
+from .transaction import Transaction
+from .typecheck import hot_path
+
+#: Leaves and inner nodes are hashed with different prefixes, so an inner
+#: node can never be passed off as a transaction.
+LEAF_PREFIX = b'\x00'
+NODE_PREFIX = b'\x01'
+#: Root of a tree without any transactions.
+EMPTY_ROOT = hashlib.sha256(b'').digest()
+
+
+@hot_path
+def leaf_hash(transaction: Transaction) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + transaction.encode()).digest()
+
+
+@hot_path
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+@hot_path
+def parent_level(level: typing.List[bytes]) -> typing.List[bytes]:
+    """Hashes the nodes of a level in pairs.  The last node of a level with
+    an odd number of nodes is carried up as is, rather than paired with
+    itself, so two different lists of transactions never share a root.
+
+    """
+    parents = [
+        node_hash(level[i], level[i + 1])
+        for i in range(0, len(level) - 1, 2)
+    ]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+
+@hot_path
+def merkle_root(transactions: typing.Iterable[Transaction]) -> bytes:
+    """Root of the Merkle tree over ``transactions``."""
+    level = [leaf_hash(t) for t in transactions]
+    if not level:
+        return EMPTY_ROOT
+    while len(level) > 1:
+        level = parent_level(level)
+    return level[0]
+
+
+@dataclasses.dataclass(frozen=True)
+class MerkleProof:
+    """Proof that a transaction is at ``position`` among the ``count``
+    transactions of a block: the hashes of the ``siblings`` of its leaf
+    and of its ancestors, from the bottom of the tree up, which is
+    O(log n) of them.
+
+    """
+
+    position: int
+    count: int
+    siblings: typing.Sequence[bytes]
+
+    @staticmethod
+    @hot_path
+    def build(
+        transactions: typing.Sequence[Transaction],
+        position: int,
+    ) -> MerkleProof:
+        """Proves the inclusion of the transaction at ``position``."""
+        if not 0 <= position < len(transactions):
+            raise ValueError(f'No transaction at position {position}')
+        level = [leaf_hash(t) for t in transactions]
+        siblings = []
+        index = position
+        while len(level) > 1:
+            sibling = index ^ 1
+            if sibling < len(level):
+                siblings.append(level[sibling])
+            level = parent_level(level)
+            index //= 2
+        return MerkleProof(
+            position=position, count=len(transactions), siblings=siblings,
+        )
+
+    @hot_path
+    def root(self, transaction: Transaction) -> bytes:
+        """The root of the tree the proof gives for ``transaction``.
+
+        Raises :exc:`ValueError` if the proof does not fit a tree of
+        ``count`` transactions.
+
+        """
+        if not 0 <= self.position < self.count:
+            raise ValueError(f'No transaction at position {self.position}')
+        siblings = iter(self.siblings)
+        node = leaf_hash(transaction)
+        index = self.position
+        size = self.count
+        try:
+            while size > 1:
+                if index % 2:
+                    node = node_hash(next(siblings), node)
+                elif index + 1 < size:
+                    node = node_hash(node, next(siblings))
+                index //= 2
+                size = (size + 1) // 2
+        except StopIteration:
+            raise ValueError('Too few siblings in the proof')
+        if next(siblings, None) is not None:
+            raise ValueError('Too many siblings in the proof')
+        return node
+
+    @hot_path
+    def verify(self, transaction: Transaction, root: bytes) -> bool:
+        """Whether ``transaction`` is in the tree of the given ``root``."""
+        try:
+            return self.root(transaction) == root
+        except ValueError:
+            return False
+
+    @hot_path
+    def serialize(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'position': self.position,
+            'count': self.count,
+            'siblings': [sibling.hex() for sibling in self.siblings],
+        }
+
+    @staticmethod
+    @hot_path
+    def deserialize(data: typing.Mapping[str, typing.Any]) -> MerkleProof:
+        return MerkleProof(
+            position=int(data['position']),
+            count=int(data['count']),
+            siblings=[bytes.fromhex(sibling) for sibling in data['siblings']],
+        )
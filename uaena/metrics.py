@@ -0,0 +1,295 @@
+"""Built-in instrumentation, exposed in the Prometheus text format.
+
+Metrics are plain counters and histograms kept in memory, cheap enough to be
+always on: recording a value takes a lock that is only ever held for a few
+additions (setting a gauge, not even that), and nothing is computed until
+``/metrics`` is scraped.  The
+metrics of a node are those of :data:`REGISTRY`, declared at the bottom of
+this module.
+
+"""
+import bisect
+import dataclasses
+import threading
+import time
+import typing
+
+from typeguard import typechecked
+
+from .typecheck import hot_path
+
+#: Upper bounds of the buckets of latency histograms, in seconds.
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+    0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+#: Upper bounds of the buckets of payload size histograms, in bytes.
+SIZE_BUCKETS = tuple(1 << shift for shift in range(8, 28, 2))
+#: Upper bounds of the buckets of the proof attempts per mined block.
+ATTEMPT_BUCKETS = tuple(1 << shift for shift in range(10, 30, 2))
+#: Media type of the Prometheus text exposition format.
+METRICS_MIMETYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LabelValues = typing.Tuple[str, ...]
+
+
+@hot_path
+def format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+@hot_path
+def format_labels(
+    names: typing.Sequence[str],
+    values: typing.Sequence[str],
+) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            value.replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'),
+        )
+        for name, value in zip(names, values)
+    )
+    return '{' + pairs + '}'
+
+
+@dataclasses.dataclass
+class Counter:
+    """A value that only goes up, such as a number of calls."""
+
+    name: str
+    help: str
+    labels: typing.Tuple[str, ...] = ()
+    values: typing.Dict[LabelValues, float] = dataclasses.field(
+        default_factory=dict, repr=False,
+    )
+    lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False,
+    )
+
+    type = 'counter'
+
+    @hot_path
+    def inc(self, amount: float=1, *label_values: str) -> None:
+        self.lock.acquire()
+        try:
+            self.values[label_values] = (
+                self.values.get(label_values, 0) + amount
+            )
+        finally:
+            self.lock.release()
+
+    @typechecked
+    def get(self, *label_values: str) -> float:
+        return self.values.get(label_values, 0)
+
+    @typechecked
+    def samples(self) -> typing.Iterator[str]:
+        with self.lock:
+            values = list(self.values.items())
+        for label_values, value in values:
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}{labels} {format_value(value)}'
+
+
+@dataclasses.dataclass
+class Gauge(Counter):
+    """A value that is set, such as the latest measured hashrate."""
+
+    type = 'gauge'
+
+    @hot_path
+    def set(self, value: float, *label_values: str) -> None:
+        self.values[label_values] = value
+
+
+@dataclasses.dataclass
+class Histogram:
+    """Counts observed values, such as latencies, in ``buckets`` by their
+    upper bounds, along with their count and sum.
+
+    """
+
+    name: str
+    help: str
+    buckets: typing.Tuple[float, ...] = LATENCY_BUCKETS
+    labels: typing.Tuple[str, ...] = ()
+    #: Per label values, the count of every bucket (not cumulative, the last
+    #: one being ``+Inf``) followed by the sum of the observed values.
+    values: typing.Dict[LabelValues, typing.List[float]] = dataclasses.field(
+        default_factory=dict, repr=False,
+    )
+    lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False,
+    )
+
+    type = 'histogram'
+
+    @hot_path
+    def observe(self, value: float, *label_values: str) -> None:
+        counts = self.values.get(label_values)
+        if counts is None:
+            counts = self.values.setdefault(
+                label_values, [0] * (len(self.buckets) + 2),
+            )
+        i = bisect.bisect_left(self.buckets, value)
+        # Explicit acquire and release cost half of a with statement, and
+        # this runs on every call of the instrumented paths.
+        self.lock.acquire()
+        try:
+            counts[i] += 1
+            counts[-1] += value
+        finally:
+            self.lock.release()
+
+    @typechecked
+    def time(self, *label_values: str) -> 'Timer':
+        """Observes how long a ``with`` block takes."""
+        return Timer(self, label_values)
+
+    @typechecked
+    def count(self, *label_values: str) -> int:
+        counts = self.values.get(label_values)
+        return sum(counts[:-1]) if counts else 0
+
+    @typechecked
+    def sum(self, *label_values: str) -> float:
+        counts = self.values.get(label_values)
+        return counts[-1] if counts else 0
+
+    @typechecked
+    def samples(self) -> typing.Iterator[str]:
+        with self.lock:
+            values = [(k, list(v)) for k, v in self.values.items()]
+        names = self.labels + ('le',)
+        for label_values, counts in values:
+            cumulative = 0
+            for bound, count in zip(
+                self.buckets + (float('inf'),), counts,
+            ):
+                cumulative += count
+                labels = format_labels(
+                    names, label_values + (format_value(bound),),
+                )
+                yield f'{self.name}_bucket{labels} {cumulative}'
+            labels = format_labels(self.labels, label_values)
+            yield f'{self.name}_count{labels} {cumulative}'
+            yield f'{self.name}_sum{labels} {format_value(counts[-1])}'
+
+
+@dataclasses.dataclass
+class Timer:
+    """Observes the time from entering to leaving a ``with`` block."""
+
+    histogram: Histogram
+    label_values: LabelValues
+    started_at: float = 0.0
+
+    def __enter__(self) -> 'Timer':
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: typing.Any) -> None:
+        self.histogram.observe(
+            time.perf_counter() - self.started_at, *self.label_values,
+        )
+
+
+Metric = typing.Union[Counter, Histogram]
+
+
+@dataclasses.dataclass
+class Registry:
+    """The metrics exposed together."""
+
+    metrics: typing.List[Metric] = dataclasses.field(default_factory=list)
+
+    @typechecked
+    def register(self, metric: Metric) -> Metric:
+        if any(m.name == metric.name for m in self.metrics):
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self.metrics.append(metric)
+        return metric
+
+    @typechecked
+    def render(self) -> str:
+        """All the metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            text = metric.help.replace('\\', r'\\').replace('\n', r'\n')
+            lines.append(f'# HELP {metric.name} {text}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+MINING_HASHES = REGISTRY.register(Counter(
+    'uaena_mining_hashes_total',
+    'Proof candidates hashed while mining.',
+))
+MINING_SECONDS = REGISTRY.register(Counter(
+    'uaena_mining_seconds_total',
+    'Time spent mining, in seconds.',
+))
+MINING_HASHRATE = REGISTRY.register(Gauge(
+    'uaena_mining_hashrate',
+    'Proof candidates hashed per second for the last mined block.',
+))
+MINING_ATTEMPTS = REGISTRY.register(Histogram(
+    'uaena_mining_attempts',
+    'Proof candidates hashed per mined block.',
+    buckets=ATTEMPT_BUCKETS,
+))
+CHAIN_VALIDATION_SECONDS = REGISTRY.register(Histogram(
+    'uaena_chain_validation_seconds',
+    'Time valid_chain takes for a whole chain, in seconds.',
+    buckets=LATENCY_BUCKETS + (30.0, 60.0, 300.0),
+))
+BLOCK_VALIDATION_SECONDS = REGISTRY.register(Histogram(
+    'uaena_block_validation_seconds',
+    'Time validating a block takes, in seconds; one observation per '
+    'validated block, the first invalid one included.',
+))
+BALANCE_SECONDS = REGISTRY.register(Histogram(
+    'uaena_balance_of_seconds',
+    'Time balance_of takes, in seconds; its count is the number of calls.',
+))
+PEER_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'uaena_peer_request_seconds',
+    'Time a request to a peer takes, retries included, in seconds.',
+    labels=('method', 'outcome'),
+))
+PEER_RESPONSE_BYTES = REGISTRY.register(Histogram(
+    'uaena_peer_response_bytes',
+    'Size of the body of the successful responses of peers, in bytes.',
+    buckets=SIZE_BUCKETS,
+    labels=('method',),
+))
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'uaena_http_request_seconds',
+    'Time the node takes to answer a request, up to the first byte of '
+    'streamed responses, in seconds.',
+    labels=('method', 'route', 'status'),
+))
+
+
+@hot_path
+def record_mining(attempts: int, seconds: float) -> None:
+    """Records the mining of a block after hashing ``attempts`` proof
+    candidates in ``seconds``.
+
+    """
+    MINING_HASHES.inc(attempts)
+    MINING_SECONDS.inc(seconds)
+    MINING_ATTEMPTS.observe(attempts)
+    if seconds > 0:
+        MINING_HASHRATE.set(attempts / seconds)
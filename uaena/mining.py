@@ -0,0 +1,343 @@
+import concurrent.futures
+import dataclasses
+import hashlib
+import os
+import threading
+import time
+import typing
+import uuid
+
+from typeguard import typechecked
+
+from .block import Block
+from .block_chain import BlockChain, process_pool
+from .difficulty import INITIAL_TARGET, target_bytes
+from .metrics import record_mining
+from .typecheck import hot_path
+
+CHUNK_SIZE = 20000
+POLL_INTERVAL = 0.05
+#: Finished jobs kept around so their status can still be asked for.
+MAX_FINISHED_JOBS = 100
+
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+
+class MiningCancelled(Exception):
+    """Raised when a mining job is cancelled before it finds a proof."""
+
+
+@hot_path
+def search(
+    last_proof: int,
+    start: int,
+    stop: int,
+    target: int=INITIAL_TARGET,
+) -> typing.Optional[int]:
+    """Finds the smallest proof in ``range(start, stop)`` that
+    :meth:`BlockChain.valid_proof <uaena.block_chain.BlockChain.valid_proof>`
+    accepts for ``last_proof`` and ``target``, or :const:`None`.
+
+    The hash state of ``last_proof`` is computed once and copied for each
+    candidate, and the raw digest is compared with the target's bytes
+    instead of converting either to an integer.
+
+    """
+    prefix = hashlib.sha256(str(last_proof).encode())
+    below = target_bytes(target)
+    for proof in range(start, stop):
+        guess = prefix.copy()
+        guess.update(str(proof).encode())
+        if guess.digest() < below:
+            return proof
+    return None
+
+
+@dataclasses.dataclass
+class Miner:
+    """Proof of work search split across a process pool.
+
+    The nonce space is cut into chunks of ``chunk_size`` candidates that
+    are searched by ``workers`` processes, and results are consumed in
+    chunk order, so the proof found is always the smallest one -- the same
+    :meth:`BlockChain.proof_of_work
+    <uaena.block_chain.BlockChain.proof_of_work>` finds.
+
+    The pool is started on the first search, like the one of a
+    :class:`~uaena.block_chain.ChainVerifier`, and kept for the next ones
+    until :meth:`close`.
+
+    """
+
+    workers: int = dataclasses.field(
+        default_factory=lambda: os.cpu_count() or 1,
+    )
+    chunk_size: int = CHUNK_SIZE
+    _pool: typing.Optional[concurrent.futures.Executor] = dataclasses.field(
+        default=None, init=False, repr=False, compare=False,
+    )
+    _pool_lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False,
+    )
+
+    @typechecked
+    def mine(
+        self,
+        last_proof: int,
+        cancelled: typing.Optional[threading.Event]=None,
+        target: int=INITIAL_TARGET,
+    ) -> int:
+        """Finds the proof following ``last_proof`` for a block of the
+        given ``target``.
+
+        Raises :exc:`MiningCancelled` as soon as ``cancelled`` is set, e.g.
+        because a competing block has arrived.
+
+        """
+        if cancelled is None:
+            cancelled = threading.Event()
+        started_at = time.perf_counter()
+        if self.workers <= 1:
+            proof = self._mine_sequentially(last_proof, cancelled, target)
+        else:
+            proof = self._mine_in_pool(
+                self.pool(), last_proof, cancelled, target,
+            )
+        # Chunks past the proof may have been searched in parallel, but the
+        # candidates up to it are what it took to find.
+        record_mining(proof + 1, time.perf_counter() - started_at)
+        return proof
+
+    def pool(self) -> concurrent.futures.Executor:
+        """The process pool of the miner, started if it is not yet."""
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = process_pool(self.workers)
+            return self._pool
+
+    def close(self) -> None:
+        """Shuts the process pool down, if it was started."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    @hot_path
+    def _mine_sequentially(
+        self,
+        last_proof: int,
+        cancelled: threading.Event,
+        target: int,
+    ) -> int:
+        start = 0
+        while not cancelled.is_set():
+            proof = search(last_proof, start, start + self.chunk_size, target)
+            if proof is not None:
+                return proof
+            start += self.chunk_size
+        raise MiningCancelled()
+
+    @hot_path
+    def _mine_in_pool(
+        self,
+        pool: concurrent.futures.Executor,
+        last_proof: int,
+        cancelled: threading.Event,
+        target: int,
+    ) -> int:
+        # Keep every worker busy with one extra chunk queued, and consume
+        # the chunks in order so the smallest proof wins.
+        in_flight = []
+        start = 0
+        try:
+            while True:
+                while len(in_flight) < self.workers * 2:
+                    in_flight.append(
+                        pool.submit(
+                            search, last_proof, start,
+                            start + self.chunk_size, target,
+                        ),
+                    )
+                    start += self.chunk_size
+                head = in_flight[0]
+                while True:
+                    if cancelled.is_set():
+                        raise MiningCancelled()
+                    try:
+                        proof = head.result(timeout=POLL_INTERVAL)
+                    except concurrent.futures.TimeoutError:
+                        continue
+                    break
+                if proof is not None:
+                    return proof
+                del in_flight[0]
+        finally:
+            # The pool outlives the search; leave it to the next one.
+            for future in in_flight:
+                future.cancel()
+
+
+@dataclasses.dataclass
+class MiningJob:
+    """A search for the proof of the block at ``index``, following ``tip``,
+    the hash of the last block when the job started (:const:`None` for the
+    genesis block).
+
+    """
+
+    id: str
+    index: int
+    tip: typing.Optional[bytes]
+    last_proof: int
+    target: int = INITIAL_TARGET
+    proof: typing.Optional[int] = None
+    state: str = JOB_RUNNING
+    reason: typing.Optional[str] = None
+    block: typing.Optional[Block] = None
+    started_at: float = dataclasses.field(default_factory=time.time)
+    finished_at: typing.Optional[float] = None
+    cancelled: threading.Event = dataclasses.field(
+        default_factory=threading.Event, repr=False, compare=False,
+    )
+
+    @typechecked
+    def cancel(self, reason: str) -> None:
+        if self.state == JOB_RUNNING and not self.cancelled.is_set():
+            self.reason = reason
+            self.cancelled.set()
+
+    @typechecked
+    def finish(
+        self,
+        state: str,
+        block: typing.Optional[Block]=None,
+        reason: typing.Optional[str]=None,
+    ) -> None:
+        self.block = block
+        self.reason = reason or self.reason
+        self.finished_at = time.time()
+        self.state = state
+
+    @typechecked
+    def serialize(self) -> typing.Mapping[str, typing.Any]:
+        return {
+            'id': self.id,
+            'index': self.index,
+            'state': self.state,
+            'reason': self.reason,
+            'tip': self.tip.hex() if self.tip else None,
+            'proof': self.proof,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'block': self.block.serialize() if self.block else None,
+        }
+
+
+@dataclasses.dataclass
+class MiningJobs:
+    """Runs mining jobs for ``block_chain`` on background threads, one at
+    a time, so the node keeps serving requests while it mines.
+
+    Jobs are cancelled as soon as the tip of the chain moves under them,
+    e.g. because consensus adopted a peer's chain.  A job whose proof
+    arrives after the tip moved is not turned into a block.
+
+    """
+
+    block_chain: BlockChain
+    reward_recipient: bytes
+    miner: Miner = dataclasses.field(default_factory=Miner)
+    jobs: typing.Dict[str, MiningJob] = dataclasses.field(
+        default_factory=dict,
+    )
+    lock: threading.Lock = dataclasses.field(
+        default_factory=threading.Lock, repr=False, compare=False,
+    )
+
+    def __post_init__(self) -> None:
+        self.block_chain.tip_listeners.append(self.tip_changed)
+
+    @typechecked
+    def start(self) -> MiningJob:
+        """Starts mining the next block, unless a job is running already,
+        in which case that job is returned.
+
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if job.state == JOB_RUNNING:
+                    return job
+            last_block = self.block_chain.last_block
+            job = MiningJob(
+                id=uuid.uuid4().hex,
+                index=len(self.block_chain.chain) + 1,
+                tip=last_block.hash if last_block else None,
+                last_proof=last_block.proof if last_block else 0,
+                target=self.block_chain.next_target(),
+            )
+            self.jobs[job.id] = job
+            finished = [
+                old for old in self.jobs.values() if old.state != JOB_RUNNING
+            ]
+            for old in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[old.id]
+        threading.Thread(
+            target=self.run, args=(job,), name=f'mining-{job.id}',
+            daemon=True,
+        ).start()
+        return job
+
+    @typechecked
+    def get(self, job_id: str) -> typing.Optional[MiningJob]:
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    @typechecked
+    def cancel(self, job_id: str) -> typing.Optional[MiningJob]:
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel('cancelled')
+        return job
+
+    @typechecked
+    def tip_changed(self, block: Block) -> None:
+        # Copied under the lock, as start() may be adding and dropping jobs
+        # on another thread.
+        with self.lock:
+            jobs = list(self.jobs.values())
+        for job in jobs:
+            # Every block but the one the job itself mined cancels it.
+            if (job.index, job.proof) != (block.index, block.proof):
+                job.cancel('new tip')
+
+    @typechecked
+    def run(self, job: MiningJob) -> None:
+        try:
+            if job.tip is None:
+                job.proof = 1
+            else:
+                job.proof = self.miner.mine(
+                    job.last_proof, job.cancelled, job.target,
+                )
+            with self.block_chain.chain_lock:
+                last_block = self.block_chain.last_block
+                if job.cancelled.is_set() or \
+                        (last_block.hash if last_block else None) != job.tip:
+                    raise MiningCancelled()
+                if job.tip is None:
+                    block = self.block_chain.create_genesis_block(
+                        self.reward_recipient,
+                    )
+                else:
+                    block = self.block_chain.create_block(
+                        job.proof, self.reward_recipient,
+                    )
+        except MiningCancelled:
+            job.finish(JOB_CANCELLED, reason=job.reason or 'new tip')
+        except Exception as e:
+            job.finish(JOB_FAILED, reason=str(e))
+        else:
+            job.finish(JOB_DONE, block=block)
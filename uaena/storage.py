@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import collections.abc
+import dataclasses
+import json
+import mmap
+import os
+import pathlib
+import struct
+import typing
+import zlib
+
+from typeguard import typechecked
+
+from .block import Block, BlockHeader, ChainEntry
+from .typecheck import hot_path
+
+#: Segments are rolled over once they grow past this many bytes.
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+#: Flush every appended block to disk before returning.
+FSYNC_ALWAYS = 'always'
+#: Flush a segment to disk when it is rolled over, and on :meth:`close`.
+FSYNC_SEGMENT = 'segment'
+#: Leave flushing to the operating system.
+FSYNC_NEVER = 'never'
+FSYNC_POLICIES = frozenset({FSYNC_ALWAYS, FSYNC_SEGMENT, FSYNC_NEVER})
+
+#: A record is its payload length and CRC-32, followed by the payload.
+RECORD_HEADER = struct.Struct('>II')
+#: An index entry is the segment number, offset and length of a record.
+INDEX_ENTRY = struct.Struct('>IQI')
+
+IndexEntry = typing.Tuple[int, int, int]
+
+
+@hot_path
+def deserialize_entry(payload: bytes) -> ChainEntry:
+    """Reads a stored block, or the header a pruned chain keeps in its
+    place.
+
+    """
+    data = json.loads(payload)
+    if 'transactions' in data:
+        return Block.deserialize(data)
+    return BlockHeader.deserialize(data)
+
+
+@dataclasses.dataclass
+class BlockStore:
+    """Append-only, segmented log of serialized blocks, and of the headers
+    a pruned chain keeps in the place of its first blocks.
+
+    Blocks are appended to ``segment-NNNNNNNN.log`` files under ``path``,
+    and the position of every record is kept in a fixed-width ``index``
+    file.  The index is memory-mapped when the store is opened, so the
+    length of the chain and any block in it are available without reading,
+    let alone deserializing, the whole log.
+
+    Opening a store recovers it from a crash: complete records that did not
+    make it to the index are indexed, and a torn record at the end of the
+    log is truncated.
+
+    """
+
+    path: pathlib.Path
+    segment_size: int = SEGMENT_SIZE
+    fsync: str = FSYNC_ALWAYS
+    mapped_index: typing.Optional[mmap.mmap] = dataclasses.field(
+        default=None, init=False, repr=False,
+    )
+    mapped_count: int = dataclasses.field(default=0, init=False, repr=False)
+    appended: typing.List[IndexEntry] = dataclasses.field(
+        default_factory=list, init=False, repr=False,
+    )
+
+    def __post_init__(self) -> None:
+        if self.fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy: {self.fsync}')
+        self.path = pathlib.Path(self.path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.index_path.touch()
+        self.recover()
+        self.map_index()
+
+    @property
+    def index_path(self) -> pathlib.Path:
+        return self.path / 'index'
+
+    @hot_path
+    def segment_path(self, segment: int) -> pathlib.Path:
+        return self.path / f'segment-{segment:08d}.log'
+
+    def map_index(self) -> None:
+        if self.mapped_index is not None:
+            self.mapped_index.close()
+            self.mapped_index = None
+        self.appended = []
+        size = self.index_path.stat().st_size
+        self.mapped_count = size // INDEX_ENTRY.size
+        if size:
+            with self.index_path.open('rb') as f:
+                self.mapped_index = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ,
+                )
+
+    def recover(self) -> None:
+        """Brings the index and the log back in line after a crash."""
+        index_size = self.index_path.stat().st_size
+        with self.index_path.open('r+b') as index:
+            # Drop a partially written index entry, and the entries of
+            # records that did not reach the disk.
+            count = index_size // INDEX_ENTRY.size
+            last = None
+            while count:
+                index.seek((count - 1) * INDEX_ENTRY.size)
+                entry = INDEX_ENTRY.unpack(index.read(INDEX_ENTRY.size))
+                if self.read_record(*entry) is not None:
+                    last = entry
+                    break
+                count -= 1
+            index.truncate(count * INDEX_ENTRY.size)
+
+            # Index complete records written after the last indexed one, and
+            # truncate whatever follows them.
+            if last is None:
+                segment, offset = 0, 0
+            else:
+                segment, offset = last[0], last[1] + last[2]
+            while True:
+                segment_path = self.segment_path(segment)
+                segment_path.touch()
+                with segment_path.open('r+b') as log:
+                    size = log.seek(0, os.SEEK_END)
+                    while offset < size:
+                        log.seek(offset)
+                        header = log.read(RECORD_HEADER.size)
+                        if len(header) < RECORD_HEADER.size:
+                            break
+                        length, checksum = RECORD_HEADER.unpack(header)
+                        payload = log.read(length)
+                        if (len(payload) < length or
+                                zlib.crc32(payload) != checksum):
+                            break
+                        index.seek(0, os.SEEK_END)
+                        index.write(INDEX_ENTRY.pack(
+                            segment, offset, RECORD_HEADER.size + length,
+                        ))
+                        offset += RECORD_HEADER.size + length
+                    torn = offset < size
+                    log.truncate(offset)
+                if torn or not self.segment_path(segment + 1).exists():
+                    break
+                segment, offset = segment + 1, 0
+            for later in self.segments():
+                if later > segment:
+                    self.segment_path(later).unlink()
+
+    def segments(self) -> typing.List[int]:
+        return sorted(
+            int(p.stem.split('-')[1]) for p in self.path.glob('segment-*.log')
+        )
+
+    @hot_path
+    def read_record(
+        self,
+        segment: int,
+        offset: int,
+        length: int,
+    ) -> typing.Optional[bytes]:
+        """Reads a record's payload, or :const:`None` if it is torn."""
+        try:
+            with self.segment_path(segment).open('rb') as log:
+                log.seek(offset)
+                return BlockStore.parse_record(log.read(length))
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    @hot_path
+    def parse_record(record: bytes) -> typing.Optional[bytes]:
+        if len(record) < RECORD_HEADER.size:
+            return None
+        payload_length, checksum = RECORD_HEADER.unpack_from(record)
+        payload = record[RECORD_HEADER.size:]
+        if (payload_length != len(payload) or
+                zlib.crc32(payload) != checksum):
+            return None
+        return payload
+
+    def __len__(self) -> int:
+        return self.mapped_count + len(self.appended)
+
+    @hot_path
+    def entry(self, position: int) -> IndexEntry:
+        if not 0 <= position < len(self):
+            raise IndexError(position)
+        if position < self.mapped_count:
+            return INDEX_ENTRY.unpack_from(
+                self.mapped_index, position * INDEX_ENTRY.size,
+            )
+        return self.appended[position - self.mapped_count]
+
+    @hot_path
+    def __getitem__(self, position: int) -> ChainEntry:
+        if position < 0:
+            position += len(self)
+        payload = self.read_record(*self.entry(position))
+        if payload is None:
+            raise ValueError(f'Block at {position} is corrupted')
+        return deserialize_entry(payload)
+
+    def __iter__(self) -> typing.Iterator[ChainEntry]:
+        return self.read(0, len(self))
+
+    @hot_path
+    def read(self, start: int, stop: int) -> typing.Iterator[ChainEntry]:
+        """Reads the blocks from position ``start`` to ``stop``."""
+        # Read each segment through a single file object, rather than
+        # opening it again for every block.
+        segment, log = None, None
+        try:
+            for position in range(start, stop):
+                entry = self.entry(position)
+                if entry[0] != segment:
+                    if log is not None:
+                        log.close()
+                    segment = entry[0]
+                    log = self.segment_path(segment).open('rb')
+                log.seek(entry[1])
+                payload = BlockStore.parse_record(log.read(entry[2]))
+                if payload is None:
+                    raise ValueError(f'Block at {position} is corrupted')
+                yield deserialize_entry(payload)
+        finally:
+            if log is not None:
+                log.close()
+
+    @typechecked
+    def append(self, block: ChainEntry) -> None:
+        payload = json.dumps(
+            block.serialize(), separators=(',', ':'), sort_keys=True,
+        ).encode()
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload))
+        record += payload
+        if len(self):
+            segment, offset, length = self.entry(len(self) - 1)
+            offset += length
+            if offset >= self.segment_size:
+                if self.fsync == FSYNC_SEGMENT:
+                    self.sync_segment(segment)
+                segment, offset = segment + 1, 0
+        else:
+            segment, offset = 0, 0
+        # The record goes to disk before its index entry, so an entry never
+        # points past the end of the log.
+        with self.segment_path(segment).open('ab') as log:
+            log.write(record)
+            if self.fsync == FSYNC_ALWAYS:
+                log.flush()
+                os.fsync(log.fileno())
+        entry = (segment, offset, len(record))
+        with self.index_path.open('ab') as index:
+            index.write(INDEX_ENTRY.pack(*entry))
+            if self.fsync == FSYNC_ALWAYS:
+                index.flush()
+                os.fsync(index.fileno())
+        self.appended.append(entry)
+
+    @typechecked
+    def extend(self, blocks: typing.Iterable[ChainEntry]) -> None:
+        for block in blocks:
+            self.append(block)
+
+    @typechecked
+    def truncate(self, length: int) -> None:
+        """Drops every block from position ``length`` on, e.g. when the
+        chain is replaced after a fork.
+
+        """
+        if length >= len(self):
+            return
+        segment, offset, _ = self.entry(length)
+        # Unmap the index before shrinking it.
+        if self.mapped_index is not None:
+            self.mapped_index.close()
+            self.mapped_index = None
+        with self.segment_path(segment).open('r+b') as log:
+            log.truncate(offset)
+        for later in self.segments():
+            if later > segment or later == segment > 0 and not offset:
+                self.segment_path(later).unlink()
+        with self.index_path.open('r+b') as index:
+            index.truncate(length * INDEX_ENTRY.size)
+        self.map_index()
+
+    @typechecked
+    def sync_segment(self, segment: int) -> None:
+        for path in (self.segment_path(segment), self.index_path):
+            with path.open('rb') as f:
+                os.fsync(f.fileno())
+
+    def close(self) -> None:
+        if self.fsync != FSYNC_NEVER and len(self):
+            self.sync_segment(self.entry(len(self) - 1)[0])
+        if self.mapped_index is not None:
+            self.mapped_index.close()
+            self.mapped_index = None
+
+
+@dataclasses.dataclass(eq=False)
+class StoredChain(collections.abc.MutableSequence):
+    """The chain kept in a :class:`BlockStore`, as a list whose blocks are
+    only read and deserialized once they are first accessed, so a node
+    restarts without reading its whole log.
+
+    Appending to the chain does not append to the store; the store is
+    written to separately, ahead of the chain, as for an in-memory chain.
+    Slices are plain lists, while :meth:`head` gives a shorter chain that
+    still reads its blocks lazily.
+
+    """
+
+    store: BlockStore
+    #: The blocks read so far, and :const:`None` for the others.
+    blocks: typing.Optional[typing.List[typing.Optional[ChainEntry]]] = None
+    #: Applied to every block read from the store, e.g. to compact it.
+    load: typing.Optional[typing.Callable[[ChainEntry], ChainEntry]] = (
+        dataclasses.field(default=None, repr=False)
+    )
+
+    def __post_init__(self) -> None:
+        if self.blocks is None:
+            self.blocks = [None] * len(self.store)
+
+    def __len__(self) -> int:
+        return len(self.blocks)
+
+    @hot_path
+    def fill(self, start: int, stop: int) -> None:
+        """Reads the blocks from ``start`` to ``stop`` not read yet."""
+        blocks = self.blocks
+        while start < stop and blocks[start] is not None:
+            start += 1
+        while stop > start and blocks[stop - 1] is not None:
+            stop -= 1
+        if start >= stop:
+            return
+        for position, block in enumerate(
+            self.store.read(start, stop), start,
+        ):
+            if blocks[position] is None:
+                blocks[position] = self.load(block) if self.load else block
+
+    @hot_path
+    def __getitem__(
+        self,
+        index: typing.Union[int, slice],
+    ) -> typing.Union[ChainEntry, typing.List[ChainEntry]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                self.fill(start, stop)
+                return self.blocks[start:stop]
+            return [self[i] for i in range(start, stop, step)]
+        block = self.blocks[index]
+        if block is None:
+            if index < 0:
+                index += len(self)
+            self.fill(index, index + 1)
+            block = self.blocks[index]
+        return block
+
+    def __iter__(self) -> typing.Iterator[ChainEntry]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def __setitem__(self, index: int, block: ChainEntry) -> None:
+        raise TypeError('Blocks of a StoredChain cannot be replaced')
+
+    def __delitem__(self, index: typing.Union[int, slice]) -> None:
+        raise TypeError('Blocks of a StoredChain cannot be removed')
+
+    def insert(self, index: int, block: ChainEntry) -> None:
+        if index < len(self):
+            raise TypeError('Blocks can only be appended to a StoredChain')
+        self.blocks.append(block)
+
+    @hot_path
+    def head(self, length: int) -> StoredChain:
+        """The first ``length`` blocks, as a chain of their own."""
+        return StoredChain(self.store, self.blocks[:length], self.load)
+
+    def __eq__(self, other: typing.Any) -> bool:
+        if isinstance(other, collections.abc.Sequence):
+            return len(self) == len(other) and all(
+                a == b for a, b in zip(self, other)
+            )
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.store.path!s}, {len(self)})'
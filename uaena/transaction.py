@@ -2,18 +2,33 @@ from __future__ import annotations
 
 import dataclasses
 import decimal
+import hashlib
+import struct
 import typing
 
-from typeguard import typechecked
+from .typecheck import hot_path
 
+#: Longest address, and longest amount in its string form, a transaction
+#: can have: :meth:`Transaction.encode` prefixes each with its length in a
+#: single byte.
+MAX_FIELD_LENGTH = 255
 
-@dataclasses.dataclass
+
+@dataclasses.dataclass(frozen=True, slots=True)
 class Transaction:
     sender: bytes
     recipient: bytes
     amount: decimal.Decimal
 
-    @typechecked
+    def __post_init__(self) -> None:
+        for address in (self.sender, self.recipient):
+            if len(address) > MAX_FIELD_LENGTH:
+                raise ValueError(
+                    f'Addresses cannot be longer than {MAX_FIELD_LENGTH} '
+                    f'bytes',
+                )
+
+    @hot_path
     def serialize(self) -> typing.Mapping[str, typing.Any]:
         return {
             'sender': self.sender.hex(),
@@ -22,10 +37,65 @@ class Transaction:
         }
 
     @staticmethod
-    @typechecked
+    @hot_path
     def deserialize(data: typing.Mapping[str, typing.Any]) -> Transaction:
         return Transaction(
             sender=bytes.fromhex(data['sender']),
             recipient=bytes.fromhex(data['recipient']),
             amount=decimal.Decimal(data['amount']),
         )
+
+    @hot_path
+    def encode(self) -> bytes:
+        """Canonical binary form of the transaction, used for hashing.
+
+        Raises :exc:`ValueError` if the amount is too long to encode.
+
+        """
+        amount = str(self.amount).encode()
+        if len(amount) > MAX_FIELD_LENGTH:
+            raise ValueError(f'Amount {self.amount} is too long to encode')
+        return b''.join([
+            struct.pack('>B', len(self.sender)), self.sender,
+            struct.pack('>B', len(self.recipient)), self.recipient,
+            struct.pack('>B', len(amount)), amount,
+        ])
+
+    @staticmethod
+    @hot_path
+    def decode(
+        data: bytes,
+        offset: int=0,
+    ) -> typing.Tuple[Transaction, int]:
+        """Reads a transaction in its :meth:`encode` form from ``offset`` of
+        ``data``.  Returns it along with the offset right after it.
+
+        """
+        # Every field is preceded by its length.  Slicing past the end of
+        # ``data`` silently comes up short, so only the end of the last
+        # field has to be checked.
+        try:
+            end = offset + 1 + data[offset]
+            sender = data[offset + 1:end]
+            offset = end + 1 + data[end]
+            recipient = data[end + 1:offset]
+            end = offset + 1 + data[offset]
+            amount = data[offset + 1:end]
+        except IndexError:
+            raise ValueError('Truncated transaction')
+        if end > len(data):
+            raise ValueError('Truncated transaction')
+        try:
+            amount = decimal.Decimal(amount.decode('ascii'))
+        except (UnicodeDecodeError, decimal.InvalidOperation):
+            raise ValueError(f'Malformed amount: {amount!r}')
+        transaction = Transaction(
+            sender=sender, recipient=recipient, amount=amount,
+        )
+        return transaction, end
+
+    @property
+    @hot_path
+    def hash(self) -> bytes:
+        """Creates a SHA-256 hash of a Transaction"""
+        return hashlib.sha256(self.encode()).digest()
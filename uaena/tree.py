@@ -0,0 +1,98 @@
+import dataclasses
+import typing
+
+from .block import Block
+from .typecheck import hot_path
+
+#: Side blocks kept at most; the oldest are forgotten first.
+MAX_SIDE_BLOCKS = 1000
+#: Orphan blocks kept at most; the oldest are forgotten first.
+MAX_ORPHANS = 1000
+
+
+@dataclasses.dataclass
+class BlockTree:
+    """The blocks known off the chain.
+
+    Side blocks belong to branches that fork from the chain, and are kept
+    by hash along with the cumulative work of their branch up to them, so
+    a branch that overtakes the chain can be switched to without fetching
+    it again.  Orphans are blocks whose parent has not arrived yet, kept by
+    the hash of their parent until it does.
+
+    """
+
+    side: typing.Dict[bytes, Block] = dataclasses.field(default_factory=dict)
+    work: typing.Dict[bytes, int] = dataclasses.field(default_factory=dict)
+    orphans: typing.Dict[bytes, Block] = dataclasses.field(
+        default_factory=dict,
+    )
+    by_parent: typing.Dict[bytes, typing.Dict[bytes, None]] = (
+        dataclasses.field(default_factory=dict)
+    )
+    max_side: int = MAX_SIDE_BLOCKS
+    max_orphans: int = MAX_ORPHANS
+
+    def __contains__(self, block_hash: typing.Any) -> bool:
+        return block_hash in self.side or block_hash in self.orphans
+
+    @hot_path
+    def add_side(self, block: Block, work: int) -> None:
+        self.side[block.hash] = block
+        self.work[block.hash] = work
+        while len(self.side) > self.max_side:
+            self.remove_side(next(iter(self.side)))
+
+    @hot_path
+    def remove_side(self, block_hash: bytes) -> None:
+        self.side.pop(block_hash, None)
+        self.work.pop(block_hash, None)
+
+    @hot_path
+    def branch(
+        self,
+        block_hash: bytes,
+        position: typing.Callable[[bytes], typing.Optional[int]],
+    ) -> typing.Optional[typing.Tuple[int, typing.List[Block]]]:
+        """The side blocks leading from the chain to the block of
+        ``block_hash``, oldest first, along with the number of blocks of the
+        chain they follow.  ``position`` gives the position of a block in
+        the chain by its hash.  :const:`None` if the branch does not lead
+        back to the chain.
+
+        """
+        blocks = []
+        while block_hash in self.side:
+            block = self.side[block_hash]
+            blocks.append(block)
+            block_hash = block.previous_hash
+        fork = position(block_hash)
+        if fork is None:
+            return None
+        blocks.reverse()
+        return fork + 1, blocks
+
+    @hot_path
+    def add_orphan(self, block: Block) -> None:
+        self.orphans[block.hash] = block
+        self.by_parent.setdefault(block.previous_hash, {})[block.hash] = None
+        while len(self.orphans) > self.max_orphans:
+            self.remove_orphan(next(iter(self.orphans)))
+
+    @hot_path
+    def remove_orphan(self, block_hash: bytes) -> typing.Optional[Block]:
+        block = self.orphans.pop(block_hash, None)
+        if block is not None:
+            children = self.by_parent[block.previous_hash]
+            del children[block_hash]
+            if not children:
+                del self.by_parent[block.previous_hash]
+        return block
+
+    @hot_path
+    def adopt(self, parent_hash: bytes) -> typing.List[Block]:
+        """Takes the orphans waiting for the block of ``parent_hash``."""
+        return [
+            self.remove_orphan(block_hash)
+            for block_hash in list(self.by_parent.get(parent_hash, ()))
+        ]
@@ -0,0 +1,40 @@
+"""Runtime type checking switch.
+
+Every function is type checked at runtime by :func:`typeguard.typechecked`
+by default.  That is too costly for functions on hot paths such as
+:meth:`BlockChain.valid_proof <uaena.block_chain.BlockChain.valid_proof>`,
+which runs millions of times per mined block, so those are decorated with
+:func:`hot_path` instead.  Setting the ``UAENA_TYPECHECK`` environment
+variable to ``boundary`` before :mod:`uaena` is imported leaves them
+unchecked, and types are only checked at the API boundary.
+
+"""
+import os
+import typing
+
+from typeguard import typechecked
+
+#: Check the types of every function.
+TYPECHECK_ALL = 'all'
+#: Check the types of the functions at the API boundary only.
+TYPECHECK_BOUNDARY = 'boundary'
+TYPECHECK_MODES = frozenset({TYPECHECK_ALL, TYPECHECK_BOUNDARY})
+
+TYPECHECK = os.environ.get('UAENA_TYPECHECK', TYPECHECK_ALL)
+if TYPECHECK not in TYPECHECK_MODES:
+    raise ValueError(
+        f'UAENA_TYPECHECK must be one of {sorted(TYPECHECK_MODES)}, '
+        f'not {TYPECHECK!r}'
+    )
+
+F = typing.TypeVar('F', bound=typing.Callable[..., typing.Any])
+
+
+def hot_path(function: F) -> F:
+    """Type checks ``function`` like :func:`typeguard.typechecked`, unless
+    only the API boundary is checked.
+
+    """
+    if TYPECHECK == TYPECHECK_BOUNDARY:
+        return function
+    return typechecked(function)
@@ -0,0 +1,79 @@
+import struct
+import typing
+
+from .block import Block
+from .typecheck import hot_path
+
+#: Media type of a sequence of block frames.  A block is sent in its
+#: :meth:`~uaena.block.Block.encode` form, which keeps hashes and addresses as
+#: raw bytes and amounts as their exact decimal strings, so it decodes to the
+#: very block its JSON serialization does, at about half the size.
+BLOCKS_MIMETYPE = 'application/x-uaena-blocks'
+#: Media type of a part of a chain: :const:`CHAIN_HEADER`, followed by block
+#: frames.
+CHAIN_MIMETYPE = 'application/x-uaena-chain'
+#: A frame is the length of the encoded block, followed by it.
+FRAME_HEADER = struct.Struct('>I')
+#: The length of the whole chain, and the position to continue from, which
+#: is the length of the chain at its end.
+CHAIN_HEADER = struct.Struct('>QQ')
+
+
+@hot_path
+def encode_blocks(blocks: typing.Iterable[Block]) -> typing.Iterator[bytes]:
+    """Frames of ``blocks``, one block at a time."""
+    for block in blocks:
+        encoded = block.encode()
+        yield FRAME_HEADER.pack(len(encoded)) + encoded
+
+
+@hot_path
+def decode_blocks(data: bytes, offset: int=0) -> typing.List[Block]:
+    """Reads the block frames from ``offset`` to the end of ``data``.
+
+    Raises :exc:`ValueError` if they are malformed.
+
+    """
+    blocks = []
+    while offset < len(data):
+        if offset + FRAME_HEADER.size > len(data):
+            raise ValueError('Truncated block frame')
+        length, = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        if offset + length > len(data):
+            raise ValueError('Truncated block frame')
+        blocks.append(Block.decode(data[offset:offset + length]))
+        offset += length
+    return blocks
+
+
+@hot_path
+def encode_chain(
+    length: int,
+    next_position: typing.Optional[int],
+    blocks: typing.Iterable[Block],
+) -> typing.Iterator[bytes]:
+    """The binary counterpart of a ``/chain/`` response."""
+    yield CHAIN_HEADER.pack(
+        length, length if next_position is None else next_position,
+    )
+    yield from encode_blocks(blocks)
+
+
+@hot_path
+def decode_chain(
+    data: bytes,
+) -> typing.Tuple[int, typing.Optional[int], typing.List[Block]]:
+    """Reads what :func:`encode_chain` writes: the length of the chain, the
+    position to continue from (:const:`None` at its end) and the blocks.
+
+    """
+    if len(data) < CHAIN_HEADER.size:
+        raise ValueError('Truncated chain')
+    length, next_position = CHAIN_HEADER.unpack_from(data)
+    blocks = decode_blocks(data, CHAIN_HEADER.size)
+    return (
+        length,
+        None if next_position >= length else next_position,
+        blocks,
+    )